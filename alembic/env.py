@@ -18,6 +18,7 @@ from app.models.network import Network
 from app.models.network_version import NetworkVersion
 from app.models.node import Node
 from app.models.edge import Edge
+from app.models.ingest_job import IngestJob
 
 # This is the Alembic Config object
 config = context.config
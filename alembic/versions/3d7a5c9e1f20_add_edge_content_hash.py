@@ -0,0 +1,59 @@
+"""add edge content hash and version change counts
+
+Revision ID: 3d7a5c9e1f20
+Revises: 9c1f3e2b7a41
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7a5c9e1f20'
+down_revision: Union[str, None] = '9c1f3e2b7a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('edges', sa.Column('content_hash', sa.String(length=32), nullable=True))
+    op.add_column('network_versions', sa.Column('edges_added', sa.Integer(), nullable=True))
+    op.add_column('network_versions', sa.Column('edges_removed', sa.Integer(), nullable=True))
+    op.add_column('network_versions', sa.Column('edges_modified', sa.Integer(), nullable=True))
+    op.add_column('network_versions', sa.Column('edges_unchanged', sa.Integer(), nullable=True))
+
+    # Versions are now resolved from validity windows, so align existing
+    # edges with the creation time of the version that introduced them and
+    # the version that replaced them. Hashes are filled in lazily on update.
+    op.execute(
+        """
+        UPDATE edges e
+        SET valid_from = v.created_at
+        FROM network_versions v
+        WHERE e.version_id = v.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE edges e
+        SET valid_to = nv.created_at
+        FROM network_versions v
+        JOIN network_versions nv
+          ON nv.network_id = v.network_id
+         AND nv.version_number = v.version_number + 1
+        WHERE e.version_id = v.id AND e.valid_to IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('network_versions', 'edges_unchanged')
+    op.drop_column('network_versions', 'edges_modified')
+    op.drop_column('network_versions', 'edges_removed')
+    op.drop_column('network_versions', 'edges_added')
+    op.drop_column('edges', 'content_hash')
@@ -0,0 +1,46 @@
+"""add ingest jobs
+
+Revision ID: 9c1f3e2b7a41
+Revises: 5a9381ece345
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1f3e2b7a41'
+down_revision: Union[str, None] = '5a9381ece345'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ingest_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('customer_id', sa.Integer(), sa.ForeignKey('customers.id'), nullable=False),
+        sa.Column('network_id', sa.Integer(), sa.ForeignKey('networks.id'), nullable=True),
+        sa.Column('operation', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('features_parsed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('nodes_written', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('edges_written', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('result', postgresql.JSONB(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_ingest_jobs_id', 'ingest_jobs', ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ingest_jobs_id', table_name='ingest_jobs')
+    op.drop_table('ingest_jobs')
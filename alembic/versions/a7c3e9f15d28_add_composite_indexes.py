@@ -0,0 +1,45 @@
+"""add composite indexes for repository queries
+
+Revision ID: a7c3e9f15d28
+Revises: e4f8a2c6d1b9
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9f15d28'
+down_revision: Union[str, None] = 'e4f8a2c6d1b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_edges_network_id', 'edges', ['network_id', 'id'])
+    op.create_index(
+        'ix_edges_network_current',
+        'edges',
+        ['network_id', 'id'],
+        postgresql_where=sa.text('is_current'),
+    )
+    op.create_index('ix_nodes_network_version', 'nodes', ['network_id', 'version_id'])
+    op.create_index(
+        'ix_network_versions_network_created',
+        'network_versions',
+        ['network_id', 'created_at'],
+    )
+    op.create_index('ix_networks_customer_id', 'networks', ['customer_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_networks_customer_id', table_name='networks')
+    op.drop_index('ix_network_versions_network_created', table_name='network_versions')
+    op.drop_index('ix_nodes_network_version', table_name='nodes')
+    op.drop_index('ix_edges_network_current', table_name='edges')
+    op.drop_index('ix_edges_network_id', table_name='edges')
@@ -0,0 +1,61 @@
+"""add node and edge counts to network versions
+
+Revision ID: b52e8d4c6a13
+Revises: 3d7a5c9e1f20
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b52e8d4c6a13'
+down_revision: Union[str, None] = '3d7a5c9e1f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('network_versions', sa.Column('node_count', sa.Integer(), nullable=True))
+    op.add_column('network_versions', sa.Column('edge_count', sa.Integer(), nullable=True))
+
+    # Count the existing versions once, with the same membership rules as
+    # EdgeRepository/NodeRepository.get_by_network_version
+    op.execute(
+        """
+        WITH members AS (
+            SELECT v.id AS version_id, e.source_node_id, e.target_node_id
+            FROM network_versions v
+            JOIN edges e
+              ON e.network_id = v.network_id
+             AND e.valid_from <= v.created_at
+             AND (e.valid_to > v.created_at OR e.valid_to IS NULL)
+        )
+        UPDATE network_versions v
+        SET edge_count = (
+                SELECT count(*) FROM members m WHERE m.version_id = v.id
+            ),
+            node_count = (
+                SELECT count(*) FROM nodes n
+                WHERE n.network_id = v.network_id
+                  AND (
+                    n.version_id = v.id
+                    OR n.id IN (
+                        SELECT source_node_id FROM members m WHERE m.version_id = v.id
+                        UNION
+                        SELECT target_node_id FROM members m WHERE m.version_id = v.id
+                    )
+                  )
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('network_versions', 'edge_count')
+    op.drop_column('network_versions', 'node_count')
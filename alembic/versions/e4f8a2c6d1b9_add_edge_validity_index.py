@@ -0,0 +1,35 @@
+"""add gist index on edge validity ranges
+
+Revision ID: e4f8a2c6d1b9
+Revises: b52e8d4c6a13
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4f8a2c6d1b9'
+down_revision: Union[str, None] = 'b52e8d4c6a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # btree_gist provides the GiST operator class for the integer network_id
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.create_index(
+        'ix_edges_network_validity',
+        'edges',
+        [sa.text('network_id'), sa.text('tstzrange(valid_from, valid_to)')],
+        postgresql_using='gist',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_edges_network_validity', table_name='edges')
@@ -1,13 +1,15 @@
 from fastapi import Depends, Header, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 
-from app.db.session import get_session
+from app.db.session import get_session, get_session_factory
 from app.models.customer import Customer
 from app.repositories.customer import CustomerRepository
 from app.repositories.edge import EdgeRepository
+from app.repositories.job import IngestJobRepository
 from app.repositories.network import NetworkRepository
 from app.repositories.node import NodeRepository
 from app.services.customer import CustomerService
+from app.services.job import IngestJobService
 from app.services.network import NetworkService
 
 
@@ -27,6 +29,10 @@ def get_edge_repository() -> EdgeRepository:
     return EdgeRepository()
 
 
+def get_ingest_job_repository() -> IngestJobRepository:
+    return IngestJobRepository()
+
+
 def get_customer_service(
     repository: CustomerRepository = Depends(get_customer_repository),
 ) -> CustomerService:
@@ -43,6 +49,18 @@ def get_network_service(
     )
 
 
+def get_ingest_job_service(
+    repository: IngestJobRepository = Depends(get_ingest_job_repository),
+    network_service: NetworkService = Depends(get_network_service),
+    session_factory: sessionmaker = Depends(get_session_factory),
+) -> IngestJobService:
+    return IngestJobService(
+        repository=repository,
+        network_service=network_service,
+        session_factory=session_factory,
+    )
+
+
 def get_current_customer(
     db: Session = Depends(get_session),
     x_api_key: str = Header(...),
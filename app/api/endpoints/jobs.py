@@ -0,0 +1,35 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.api.dependencies import get_current_customer, get_ingest_job_service
+from app.db.session import get_session
+from app.models.customer import Customer as CustomerModel
+from app.schemas.job import IngestJob
+from app.services.job import IngestJobService
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=IngestJob)
+def get_job(
+    *,
+    db: Session = Depends(get_session),
+    job_id: int,
+    service: IngestJobService = Depends(get_ingest_job_service),
+    current_customer: CustomerModel = Depends(get_current_customer)
+) -> Any:
+    job = service.get(db=db, id=job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+
+    if job.customer_id != current_customer.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access to this job is forbidden",
+        )
+
+    return job
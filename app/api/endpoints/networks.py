@@ -1,34 +1,358 @@
+import io
+import tempfile
 from datetime import datetime
-from typing import Any, List, Optional
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple, Type
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+import numpy as np
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Path,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.background import BackgroundTask
 
-from app.api.dependencies import get_current_customer, get_network_service
-from app.db.session import get_session
+from app.api.dependencies import (
+    get_current_customer,
+    get_ingest_job_service,
+    get_network_service,
+)
+from app.core.config import settings
+from app.db.session import get_session, get_session_factory
 from app.models.customer import Customer as CustomerModel
+from app.schemas.isochrone import Isochrone
+from app.schemas.job import IngestJob
+from app.schemas.matrix import Matrix, MatrixQuery
+from app.schemas.nearest import NearestQuery, NearestResult
 from app.schemas.network import (
     Network,
+    NetworkBase,
     NetworkCreate,
     NetworkUpdate,
     NetworkWithVersion,
 )
+from app.schemas.route import Route
+from app.services.job import IngestJobService
 from app.services.network import NetworkService
+from app.utils.arrow import ARROW_STREAM_MEDIA_TYPE, matrix_ipc
+from app.utils.geojson import (
+    parse_bbox,
+    parse_fields,
+    parse_waypoint,
+    polygon_ewkt,
+    zoom_tolerance,
+)
+from app.utils.http import accepted_encodings, etag_matches
+from app.utils.snapshot import SNAPSHOT_ENCODINGS
+from app.utils.topojson import DEFAULT_QUANTIZATION
 
 router = APIRouter()
 
+# Request bodies with these content types are raw GeoJSON FeatureCollections
+# that are spooled and parsed incrementally instead of validated as JSON models.
+STREAMING_CONTENT_TYPES = ("application/geo+json", "application/octet-stream")
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MAX_TILE_ZOOM = 24
+
+# PostGIS encodes polylines with 32-bit integers, which larger precisions
+# can overflow
+MAX_POLYLINE_PRECISION = 6
+
+# GeoJSON features, features with encoded polyline geometries, TopoJSON or
+# an Arrow IPC stream
+FeatureFormat = Literal["geojson", "polyline"]
+ExportFormat = Literal["geojson", "polyline", "topojson", "arrow"]
+EXPORT_MEDIA_TYPES = {
+    "geojson": "application/geo+json",
+    "polyline": "application/json",
+    "topojson": "application/json",
+    "arrow": ARROW_STREAM_MEDIA_TYPE,
+}
+
+# Distance matrices as JSON, a NumPy .npz archive or an Arrow IPC stream
+MatrixFormat = Literal["json", "npz", "arrow"]
+MATRIX_MEDIA_TYPES = {
+    "json": "application/json",
+    "npz": "application/octet-stream",
+    "arrow": ARROW_STREAM_MEDIA_TYPE,
+}
+
+# Travel speed in km/h that turns isochrone minutes into metres by default
+ISOCHRONE_SPEED = 50.0
+
+# Reads of a specific version whose content never changes. Networks belong to
+# one customer, so only the client's own cache may store them.
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def _upload_openapi(schema: Type[BaseModel]) -> Dict[str, Any]:
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": schema.model_json_schema()},
+                "application/geo+json": {
+                    "schema": {
+                        "type": "object",
+                        "description": "GeoJSON FeatureCollection, parsed as a "
+                        "stream. Name and description are passed as query "
+                        "parameters.",
+                    }
+                },
+            },
+        }
+    }
+
+
+def _is_streaming_upload(request: Request) -> bool:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    return content_type in STREAMING_CONTENT_TYPES
+
+
+async def _parse_body(request: Request, schema: Type[BaseModel]) -> BaseModel:
+    try:
+        return schema.model_validate_json(await request.body())
+    except ValidationError as exc:
+        errors = exc.errors(include_url=False)
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in errors]
+        )
+
+
+def _job_accepted(job: IngestJob) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=jsonable_encoder(job),
+        headers={"Location": f"/api/jobs/{job.id}"},
+    )
+
+
+async def _spool_body(request: Request) -> tempfile.SpooledTemporaryFile:
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_SPOOL_MAX_SIZE)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def _spatial_filter(bbox: Optional[str], intersects: Optional[str]) -> Dict[str, Any]:
+    """Parse the bbox/intersects query parameters into service keyword arguments"""
+    try:
+        return {
+            "bbox": parse_bbox(bbox) if bbox else None,
+            "polygon": polygon_ewkt(intersects) if intersects else None,
+        }
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+def _projection(
+    fields: Optional[str],
+    geometry: bool,
+    simplify: Optional[float] = None,
+    zoom: Optional[int] = None,
+    precision: Optional[int] = None,
+    format: str = "geojson",
+) -> Dict[str, Any]:
+    """
+    Parse the fields/geometry/simplify/zoom/precision/format query parameters
+    into service keyword arguments
+    """
+    if simplify is not None and zoom is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="simplify and zoom cannot be combined",
+        )
+    if format == "polyline" and (precision or 0) > MAX_POLYLINE_PRECISION:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"polyline precision must be at most {MAX_POLYLINE_PRECISION}",
+        )
+    if format == "topojson" and not geometry:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="topojson always includes geometries",
+        )
+    if format in ("topojson", "arrow") and precision is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"precision does not apply to {format}",
+        )
+    try:
+        return {
+            "fields": parse_fields(fields) if fields is not None else None,
+            "geometry": geometry,
+            "tolerance": zoom_tolerance(zoom) if zoom is not None else simplify,
+            "precision": precision,
+            "polyline": format == "polyline",
+        }
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+def _conditional_read(
+    request: Request,
+    service: NetworkService,
+    db: Session,
+    network_id: int,
+    version: Optional[int],
+    timestamp: Optional[datetime],
+    per_version: bool = False,
+    encoding: Optional[str] = None,
+) -> Tuple[Dict[str, str], Optional[Response]]:
+    """
+    Caching headers for a read of network edges, and the 304 response to
+    return instead when the client's If-None-Match matches. Runs before any
+    edge is queried. Reads that may be served compressed pass the chosen
+    `encoding`, which gets its own ETag.
+    """
+    etag = service.get_etag(
+        db=db,
+        network_id=network_id,
+        version_id=version,
+        timestamp=timestamp,
+        params=[
+            request.url.path,
+            *sorted(request.query_params.multi_items()),
+            encoding,
+        ],
+        per_version=per_version,
+    )
+    if etag is None:
+        return {}, None
+
+    immutable = per_version and version is not None
+    headers = {
+        "ETag": etag,
+        "Cache-Control": (
+            IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        ),
+        "Vary": "Accept-Encoding, X-API-Key" if encoding else "X-API-Key",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return headers, Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+    return headers, None
+
+
+def _closing(chunks: Iterator[Any], session: Session) -> Iterator[Any]:
+    try:
+        yield from chunks
+    finally:
+        session.close()
+
+
+def _matrix_content(matrix: Dict[str, Any], format: str) -> Any:
+    """The body of a distance matrix response in `format`"""
+    distances = matrix["distances"]
+    if format == "npz":
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            distances=distances,
+            origin_node_ids=np.asarray(matrix["origin_node_ids"], dtype=np.int64),
+            destination_node_ids=np.asarray(
+                matrix["destination_node_ids"], dtype=np.int64
+            ),
+            version=np.int64(matrix["version"]),
+        )
+        return buffer.getvalue()
+    if format == "arrow":
+        return matrix_ipc(
+            matrix["origin_node_ids"],
+            matrix["destination_node_ids"],
+            distances,
+            metadata={
+                "network_id": str(matrix["network_id"]),
+                "version": str(matrix["version"]),
+            },
+        )
+    return {
+        **matrix,
+        "distances": np.where(np.isinf(distances), None, distances).tolist(),
+    }
+
 
 @router.post(
-    "/", response_model=NetworkWithVersion, status_code=status.HTTP_201_CREATED
+    "/",
+    response_model=NetworkWithVersion,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": IngestJob}},
+    openapi_extra=_upload_openapi(NetworkCreate),
 )
-def create_network(
+async def create_network(
     *,
+    request: Request,
     db: Session = Depends(get_session),
-    network_in: NetworkCreate,
+    name: Optional[str] = Query(None, description="Network name (streaming uploads)"),
+    description: Optional[str] = Query(
+        None, description="Network description (streaming uploads)"
+    ),
+    background: bool = Query(
+        False, description="Run the ingest as a job and return 202 Accepted"
+    ),
     service: NetworkService = Depends(get_network_service),
-    current_customer: CustomerModel = Depends(get_current_customer)
+    job_service: IngestJobService = Depends(get_ingest_job_service),
+    current_customer: CustomerModel = Depends(get_current_customer),
 ) -> Any:
-    network = service.create(db=db, obj_in=network_in, customer_id=current_customer.id)
+    try:
+        if _is_streaming_upload(request):
+            if not name:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="The name query parameter is required for streaming uploads",
+                )
+            network_in = NetworkBase(name=name, description=description)
+            if background:
+                job = await run_in_threadpool(
+                    job_service.submit_create,
+                    db=db,
+                    customer_id=current_customer.id,
+                    obj_in=network_in,
+                    stream=await _spool_body(request),
+                )
+                return _job_accepted(job)
+            with await _spool_body(request) as stream:
+                network = await run_in_threadpool(
+                    service.create_from_stream,
+                    db=db,
+                    obj_in=network_in,
+                    stream=stream,
+                    customer_id=current_customer.id,
+                )
+        else:
+            network_in = await _parse_body(request, NetworkCreate)
+            if background:
+                job = await run_in_threadpool(
+                    job_service.submit_create,
+                    db=db,
+                    customer_id=current_customer.id,
+                    obj_in=network_in,
+                )
+                return _job_accepted(job)
+            network = await run_in_threadpool(
+                service.create,
+                db=db,
+                obj_in=network_in,
+                customer_id=current_customer.id,
+            )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    job_service.submit_hierarchy(network_id=network.id, version_number=network.version)
+    job_service.submit_snapshot(network_id=network.id, version_number=network.version)
     return network
 
 
@@ -39,7 +363,7 @@ def get_networks(
     skip: int = 0,
     limit: int = 100,
     service: NetworkService = Depends(get_network_service),
-    current_customer: CustomerModel = Depends(get_current_customer)
+    current_customer: CustomerModel = Depends(get_current_customer),
 ) -> Any:
     networks = service.get_multi(
         db=db, customer_id=current_customer.id, skip=skip, limit=limit
@@ -53,7 +377,7 @@ def get_network(
     db: Session = Depends(get_session),
     network_id: int,
     service: NetworkService = Depends(get_network_service),
-    current_customer: CustomerModel = Depends(get_current_customer)
+    current_customer: CustomerModel = Depends(get_current_customer),
 ) -> Any:
     network = service.get(db=db, id=network_id)
     if not network:
@@ -71,16 +395,29 @@ def get_network(
     return network
 
 
-@router.put("/{network_id}", response_model=NetworkWithVersion)
-def update_network(
+@router.put(
+    "/{network_id}",
+    response_model=NetworkWithVersion,
+    responses={status.HTTP_202_ACCEPTED: {"model": IngestJob}},
+    openapi_extra=_upload_openapi(NetworkUpdate),
+)
+async def update_network(
     *,
+    request: Request,
     db: Session = Depends(get_session),
     network_id: int,
-    network_in: NetworkUpdate,
+    name: Optional[str] = Query(None, description="Network name (streaming uploads)"),
+    description: Optional[str] = Query(
+        None, description="Network description (streaming uploads)"
+    ),
+    background: bool = Query(
+        False, description="Run the ingest as a job and return 202 Accepted"
+    ),
     service: NetworkService = Depends(get_network_service),
-    current_customer: CustomerModel = Depends(get_current_customer)
+    job_service: IngestJobService = Depends(get_ingest_job_service),
+    current_customer: CustomerModel = Depends(get_current_customer),
 ) -> Any:
-    network = service.get(db=db, id=network_id)
+    network = await run_in_threadpool(service.get, db=db, id=network_id)
     if not network:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Network not found"
@@ -92,23 +429,91 @@ def update_network(
             detail="Access to this network is forbidden",
         )
 
-    updated_network = service.update(db=db, network_id=network_id, obj_in=network_in)
+    try:
+        if _is_streaming_upload(request):
+            network_in = NetworkUpdate(name=name, description=description)
+            if background:
+                job = await run_in_threadpool(
+                    job_service.submit_update,
+                    db=db,
+                    customer_id=current_customer.id,
+                    network_id=network_id,
+                    obj_in=network_in,
+                    stream=await _spool_body(request),
+                )
+                return _job_accepted(job)
+            with await _spool_body(request) as stream:
+                updated_network = await run_in_threadpool(
+                    service.update_from_stream,
+                    db=db,
+                    network_id=network_id,
+                    obj_in=network_in,
+                    stream=stream,
+                )
+        else:
+            network_in = await _parse_body(request, NetworkUpdate)
+            if background:
+                job = await run_in_threadpool(
+                    job_service.submit_update,
+                    db=db,
+                    customer_id=current_customer.id,
+                    network_id=network_id,
+                    obj_in=network_in,
+                )
+                return _job_accepted(job)
+            updated_network = await run_in_threadpool(
+                service.update, db=db, network_id=network_id, obj_in=network_in
+            )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    job_service.submit_hierarchy(
+        network_id=updated_network.id, version_number=updated_network.version
+    )
+    job_service.submit_snapshot(
+        network_id=updated_network.id, version_number=updated_network.version
+    )
     return updated_network
 
 
 @router.get("/{network_id}/edges", response_model=dict)
 def get_network_edges(
     *,
+    request: Request,
     db: Session = Depends(get_session),
     network_id: int,
     version: Optional[int] = Query(None, description="Specific version to retrieve"),
     timestamp: Optional[datetime] = Query(
         None, description="Timestamp for point-in-time retrieval"
     ),
+    bbox: Optional[str] = Query(
+        None, description="Only edges overlapping minx,miny,maxx,maxy (WGS84)"
+    ),
+    intersects: Optional[str] = Query(
+        None, description="Only edges intersecting a GeoJSON Polygon/MultiPolygon"
+    ),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated feature properties to return"
+    ),
+    geometry: bool = Query(True, description="Include edge geometries"),
+    simplify: Optional[float] = Query(
+        None, gt=0, description="Simplify geometries to this tolerance (degrees)"
+    ),
+    zoom: Optional[int] = Query(
+        None, ge=0, le=MAX_TILE_ZOOM, description="Simplify for this map zoom level"
+    ),
+    precision: Optional[int] = Query(
+        None, ge=0, le=15, description="Decimal places of coordinates"
+    ),
+    format: FeatureFormat = Query(
+        "geojson", description="geojson, or polyline for encoded polylines"
+    ),
     cursor: Optional[str] = Query(None, description="Pagination cursor"),
     limit: int = Query(100, ge=1, le=1000, description="Number of items per page"),
+    include_total: bool = Query(
+        True, description="Include total_count; false skips it entirely"
+    ),
     service: NetworkService = Depends(get_network_service),
-    current_customer: CustomerModel = Depends(get_current_customer)
+    current_customer: CustomerModel = Depends(get_current_customer),
 ) -> Any:
     network = service.get(db=db, id=network_id)
     if not network:
@@ -122,14 +527,34 @@ def get_network_edges(
             detail="Access to this network is forbidden",
         )
 
+    area = _spatial_filter(bbox, intersects)
+    projection = _projection(fields, geometry, simplify, zoom, precision, format)
+    headers, not_modified = _conditional_read(
+        request, service, db, network_id, version, timestamp
+    )
+    if not_modified:
+        return not_modified
+
     if limit is not None or cursor is not None:
         edges = service.get_paginated_edges_by_version(
-            db=db, network_id=network_id, version_id=version, cursor=cursor, limit=limit
+            db=db,
+            network_id=network_id,
+            version_id=version,
+            cursor=cursor,
+            limit=limit,
+            include_total=include_total,
+            timestamp=timestamp,
+            **area,
+            **projection,
         )
     else:
-        print("got here")
         edges = service.get_edges_by_version(
-            db=db, network_id=network_id, version_id=version, timestamp=timestamp
+            db=db,
+            network_id=network_id,
+            version_id=version,
+            timestamp=timestamp,
+            **area,
+            **projection,
         )
 
     if not edges:
@@ -138,4 +563,459 @@ def get_network_edges(
             detail="No edges found for the specified criteria",
         )
 
-    return edges
+    # The FeatureCollection is already encoded (by PostGIS), pass it through
+    return Response(content=edges, media_type="application/json", headers=headers)
+
+
+@router.get(
+    "/{network_id}/edges/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}}
+    },
+)
+def export_network_edges(
+    *,
+    request: Request,
+    db: Session = Depends(get_session),
+    network_id: int,
+    version: Optional[int] = Query(None, description="Specific version to retrieve"),
+    timestamp: Optional[datetime] = Query(
+        None, description="Timestamp for point-in-time retrieval"
+    ),
+    bbox: Optional[str] = Query(
+        None, description="Only edges overlapping minx,miny,maxx,maxy (WGS84)"
+    ),
+    intersects: Optional[str] = Query(
+        None, description="Only edges intersecting a GeoJSON Polygon/MultiPolygon"
+    ),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated feature properties to return"
+    ),
+    geometry: bool = Query(True, description="Include edge geometries"),
+    simplify: Optional[float] = Query(
+        None, gt=0, description="Simplify geometries to this tolerance (degrees)"
+    ),
+    zoom: Optional[int] = Query(
+        None, ge=0, le=MAX_TILE_ZOOM, description="Simplify for this map zoom level"
+    ),
+    precision: Optional[int] = Query(
+        None, ge=0, le=15, description="Decimal places of coordinates"
+    ),
+    format: ExportFormat = Query(
+        "geojson",
+        description="geojson, polyline (encoded polylines), topojson or arrow",
+    ),
+    quantization: int = Query(
+        DEFAULT_QUANTIZATION,
+        ge=2,
+        le=10**9,
+        description="Grid size of topojson coordinates",
+    ),
+    session_factory: sessionmaker = Depends(get_session_factory),
+    service: NetworkService = Depends(get_network_service),
+    current_customer: CustomerModel = Depends(get_current_customer),
+) -> Any:
+    """
+    Export all edges of a version as one GeoJSON FeatureCollection, a
+    TopoJSON Topology or an Arrow IPC stream, streamed in chunks as it is
+    read from the database.
+    """
+    network = service.get(db=db, id=network_id)
+    if not network:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Network not found"
+        )
+
+    if network.customer_id != current_customer.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access to this network is forbidden",
+        )
+
+    area = _spatial_filter(bbox, intersects)
+    projection = _projection(fields, geometry, simplify, zoom, precision, format)
+    # Whole versions are served from the pre-compressed snapshots written
+    # on ingest, when enabled
+    encoding = None
+    snapshot = None
+    if (
+        service.snapshots is not None
+        and timestamp is None
+        and not any(area.values())
+        and fields is None
+        and geometry
+        and projection["tolerance"] is None
+        and precision is None
+        and format == "geojson"
+    ):
+        encodings = accepted_encodings(
+            request.headers.get("accept-encoding"), SNAPSHOT_ENCODINGS
+        )
+        if encodings:
+            snapshot = service.get_edges_snapshot(
+                db=db, network_id=network_id, version_id=version, encodings=encodings
+            )
+        encoding = snapshot[1] if snapshot is not None else "identity"
+    headers, not_modified = _conditional_read(
+        request, service, db, network_id, version, timestamp, encoding=encoding
+    )
+    if not_modified:
+        return not_modified
+
+    if snapshot is not None:
+        path, encoding = snapshot
+        return FileResponse(
+            path,
+            media_type="application/geo+json",
+            headers={**headers, "Content-Encoding": encoding},
+        )
+
+    # The body is produced after this function returns, so the export reads
+    # through its own session rather than the request-scoped one
+    export_db = session_factory()
+    if format == "topojson":
+        chunks = service.export_topology(
+            db=export_db,
+            network_id=network_id,
+            version_id=version,
+            timestamp=timestamp,
+            **area,
+            fields=projection["fields"],
+            tolerance=projection["tolerance"],
+            quantization=quantization,
+        )
+    elif format == "arrow":
+        chunks = service.export_arrow(
+            db=export_db,
+            network_id=network_id,
+            version_id=version,
+            timestamp=timestamp,
+            **area,
+            fields=projection["fields"],
+            geometry=geometry,
+            tolerance=projection["tolerance"],
+        )
+    else:
+        chunks = service.export_edges(
+            db=export_db,
+            network_id=network_id,
+            version_id=version,
+            timestamp=timestamp,
+            **area,
+            **projection,
+        )
+    if chunks is None:
+        export_db.close()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No edges found for the specified criteria",
+        )
+
+    # The generator closes the session once it has started; the background
+    # task also covers clients that disconnect before the first chunk
+    return StreamingResponse(
+        _closing(chunks, export_db),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=headers,
+        background=BackgroundTask(export_db.close),
+    )
+
+
+@router.get(
+    "/{network_id}/tiles/{z}/{x}/{y}.mvt",
+    response_class=Response,
+    responses={200: {"content": {MVT_MEDIA_TYPE: {}}}},
+)
+def get_network_tile(
+    *,
+    request: Request,
+    db: Session = Depends(get_session),
+    network_id: int,
+    z: int = Path(..., ge=0, le=MAX_TILE_ZOOM),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    version: Optional[int] = Query(None, description="Specific version to retrieve"),
+    timestamp: Optional[datetime] = Query(
+        None, description="Timestamp for point-in-time retrieval"
+    ),
+    service: NetworkService = Depends(get_network_service),
+    current_customer: CustomerModel = Depends(get_current_customer),
+) -> Any:
+    """Render the edges in web mercator tile z/x/y as a Mapbox Vector Tile"""
+    network = service.get(db=db, id=network_id)
+    if not network:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Network not found"
+        )
+
+    if network.customer_id != current_customer.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access to this network is forbidden",
+        )
+
+    if x >= 2**z or y >= 2**z:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tile {z}/{x}/{y} is outside the zoom level's grid",
+        )
+
+    # A tile holds no validity attributes, so it depends on its version only
+    headers, not_modified = _conditional_read(
+        request, service, db, network_id, version, timestamp, per_version=True
+    )
+    if not_modified:
+        return not_modified
+
+    tile = service.get_tile(
+        db=db,
+        network_id=network_id,
+        z=z,
+        x=x,
+        y=y,
+        version_id=version,
+        timestamp=timestamp,
+    )
+    if tile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No edges found for the specified criteria",
+        )
+
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers=headers)
+
+
+@router.post("/{network_id}/nearest", response_model=NearestResult)
+def get_network_nearest(
+    *,
+    db: Session = Depends(get_session),
+    network_id: int,
+    query_in: NearestQuery,
+    version: Optional[int] = Query(None, description="Specific version to search"),
+    timestamp: Optional[datetime] = Query(
+        None, description="Search the version that was the latest at this time"
+    ),
+    service: NetworkService = Depends(get_network_service),
+    current_customer: CustomerModel = Depends(get_current_customer),
+) -> Any:
+    """
+    Snap many points to the network at once: the nearest edge (with the
+    closest point on it) or node for each point, in order
+    """
+    network = service.get(db=db, id=network_id)
+    if not network:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Network not found"
+        )
+
+    if network.customer_id != current_customer.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access to this network is forbidden",
+        )
+
+    result = service.get_nearest(
+        db=db,
+        network_id=network_id,
+        points=query_in.points,
+        target=query_in.target,
+        version_id=version,
+        timestamp=timestamp,
+        max_distance=query_in.max_distance,
+    )
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Network version not found"
+        )
+    return result
+
+
+@router.get("/{network_id}/route", response_model=Route)
+def get_network_route(
+    *,
+    db: Session = Depends(get_session),
+    network_id: int,
+    origin: str = Query(
+        ..., alias="from", description="Start node id, or lon,lat of the start"
+    ),
+    destination: str = Query(
+        ..., alias="to", description="End node id, or lon,lat of the end"
+    ),
+    version: Optional[int] = Query(None, description="Specific version to route on"),
+    timestamp: Optional[datetime] = Query(
+        None, description="Route on the version that was the latest at this time"
+    ),
+    service: NetworkService = Depends(get_network_service),
+    current_customer: CustomerModel = Depends(get_current_customer),
+) -> Any:
+    """
+    Shortest path between two nodes, or the nodes nearest to two positions,
+    as a GeoJSON LineString with the ids of the edges it runs along
+    """
+    network = service.get(db=db, id=network_id)
+    if not network:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Network not found"
+        )
+
+    if network.customer_id != current_customer.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access to this network is forbidden",
+        )
+
+    try:
+        route = service.get_route(
+            db=db,
+            network_id=network_id,
+            origin=parse_waypoint(origin),
+            destination=parse_waypoint(destination),
+            version_id=version,
+            timestamp=timestamp,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if route is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Network version not found"
+        )
+    if route["distance"] is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No route between the given locations",
+        )
+    return route
+
+
+@router.post(
+    "/{network_id}/matrix",
+    response_model=Matrix,
+    responses={
+        200: {"content": {media_type: {} for media_type in MATRIX_MEDIA_TYPES.values()}}
+    },
+)
+def get_network_matrix(
+    *,
+    db: Session = Depends(get_session),
+    network_id: int,
+    query_in: MatrixQuery,
+    version: Optional[int] = Query(None, description="Specific version to route on"),
+    timestamp: Optional[datetime] = Query(
+        None, description="Route on the version that was the latest at this time"
+    ),
+    format: MatrixFormat = Query(
+        "json", description="json, npz (NumPy archive) or arrow (Arrow IPC stream)"
+    ),
+    service: NetworkService = Depends(get_network_service),
+    current_customer: CustomerModel = Depends(get_current_customer),
+) -> Any:
+    """
+    Shortest path lengths in metres from every origin to every destination,
+    each a node id or the node nearest to a lon/lat position
+    """
+    network = service.get(db=db, id=network_id)
+    if not network:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Network not found"
+        )
+
+    if network.customer_id != current_customer.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access to this network is forbidden",
+        )
+
+    try:
+        matrix = service.get_matrix(
+            db=db,
+            network_id=network_id,
+            origins=query_in.origins,
+            destinations=query_in.destinations,
+            version_id=version,
+            timestamp=timestamp,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if matrix is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Network version not found"
+        )
+    content = _matrix_content(matrix, format)
+    if format == "json":
+        return content
+    return Response(content=content, media_type=MATRIX_MEDIA_TYPES[format])
+
+
+@router.get("/{network_id}/isochrone", response_model=Isochrone)
+def get_network_isochrone(
+    *,
+    db: Session = Depends(get_session),
+    network_id: int,
+    origin: str = Query(
+        ..., alias="from", description="Start node id, or lon,lat of the start"
+    ),
+    distance: Optional[float] = Query(
+        None, gt=0, description="Path length to reach along the network, in metres"
+    ),
+    minutes: Optional[float] = Query(
+        None, gt=0, description="Travel time to reach at `speed`, instead of distance"
+    ),
+    speed: float = Query(ISOCHRONE_SPEED, gt=0, description="Travel speed in km/h"),
+    output: Literal["edges", "lines", "polygon"] = Query(
+        "edges",
+        description="Reached edge ids only, with their reached stretches as "
+        "a MultiLineString, or with the concave hull polygon around those",
+    ),
+    concavity: float = Query(
+        0.5, gt=0, le=1, description="Concave hull target (1 is the convex hull)"
+    ),
+    version: Optional[int] = Query(None, description="Specific version to search"),
+    timestamp: Optional[datetime] = Query(
+        None, description="Search the version that was the latest at this time"
+    ),
+    service: NetworkService = Depends(get_network_service),
+    current_customer: CustomerModel = Depends(get_current_customer),
+) -> Any:
+    """
+    Everything within a path length, or a travel time, of a node or the node
+    nearest to a position: the edges reached and optionally their shape
+    """
+    if (distance is None) == (minutes is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give exactly one of distance and minutes",
+        )
+    if minutes is not None:
+        distance = minutes * speed * 1000 / 60
+
+    network = service.get(db=db, id=network_id)
+    if not network:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Network not found"
+        )
+
+    if network.customer_id != current_customer.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access to this network is forbidden",
+        )
+
+    try:
+        isochrone = service.get_isochrone(
+            db=db,
+            network_id=network_id,
+            origin=parse_waypoint(origin),
+            max_distance=distance,
+            output=output,
+            concavity=concavity,
+            version_id=version,
+            timestamp=timestamp,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if isochrone is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Network version not found"
+        )
+    return isochrone
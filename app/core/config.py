@@ -15,6 +15,65 @@ class Settings(BaseSettings):
         "DATABASE_URL", "postgresql://postgres:postgres@db:5432/roadnetworkdb"
     )
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
+    # How nodes and edges are written on ingest: "orm", "insert" or "copy"
+    INGEST_MODE: str = os.getenv("INGEST_MODE", "copy")
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+    # Tables are analyzed after an ingest that wrote at least this many rows
+    # into them; statistics after smaller ones are left to autovacuum
+    ANALYZE_MIN_ROWS: int = int(os.getenv("ANALYZE_MIN_ROWS", "100000"))
+    # Merge edge endpoints closer than this (in coordinate units) into one node
+    SNAP_TOLERANCE: Optional[float] = (
+        float(os.getenv("SNAP_TOLERANCE")) if os.getenv("SNAP_TOLERANCE") else None
+    )
+    # Size of the in-process worker pool that runs background ingest jobs
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", "2"))
+    # Every process marks the jobs it queued as alive this often (seconds);
+    # unfinished jobs unmarked for JOB_STALE_AFTER seconds are failed
+    JOB_HEARTBEAT_INTERVAL: int = int(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+    JOB_STALE_AFTER: int = int(os.getenv("JOB_STALE_AFTER", "300"))
+    # Streaming uploads are buffered in memory up to this many bytes, then on disk
+    UPLOAD_SPOOL_MAX_SIZE: int = int(
+        os.getenv("UPLOAD_SPOOL_MAX_SIZE", str(16 * 1024 * 1024))
+    )
+
+    # Rows fetched per round trip (and features per chunk) in streaming exports
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+    # Vector tiles: coordinate extent, clipping buffer (both in tile units)
+    # and the memory budget of the in-process tile cache in bytes
+    TILE_EXTENT: int = int(os.getenv("TILE_EXTENT", "4096"))
+    TILE_BUFFER: int = int(os.getenv("TILE_BUFFER", "64"))
+    TILE_CACHE_MAX_BYTES: int = int(
+        os.getenv("TILE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    )
+
+    # Directory for pre-compressed full-network exports; empty disables them
+    SNAPSHOT_DIR: str = os.getenv("SNAPSHOT_DIR", "")
+
+    # Memory budget in bytes of the in-process cache of routing graphs
+    GRAPH_CACHE_MAX_BYTES: int = int(
+        os.getenv("GRAPH_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+    )
+
+    # Directory for contraction hierarchies of network versions, built in
+    # HIERARCHY_WORKERS background processes after ingest; empty disables them
+    HIERARCHY_DIR: str = os.getenv("HIERARCHY_DIR", "")
+    HIERARCHY_WORKERS: int = int(os.getenv("HIERARCHY_WORKERS", "1"))
+
+    # Worker processes that share the searches of a distance matrix (below 2
+    # computes matrices in the request), the most distinct origin-destination
+    # pairs computed in the request anyway, and most origins or destinations
+    MATRIX_WORKERS: int = int(os.getenv("MATRIX_WORKERS", str(os.cpu_count() or 1)))
+    MATRIX_INLINE_MAX_CELLS: int = int(os.getenv("MATRIX_INLINE_MAX_CELLS", "10000"))
+    MATRIX_MAX_LOCATIONS: int = int(os.getenv("MATRIX_MAX_LOCATIONS", "1000"))
+
+    # Memory budget in bytes of each matrix worker's own cache of routing graphs
+    MATRIX_WORKER_GRAPH_CACHE_MAX_BYTES: int = int(
+        os.getenv("MATRIX_WORKER_GRAPH_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    )
+
+    # Most points a single nearest node/edge lookup may snap
+    NEAREST_MAX_POINTS: int = int(os.getenv("NEAREST_MAX_POINTS", "10000"))
 
     class Config:
         env_file = ".env"
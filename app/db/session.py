@@ -13,6 +13,11 @@ engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def get_session_factory():
+    """For work that outlives the request, such as streamed responses"""
+    return SessionLocal
+
+
 def get_session():
     session = SessionLocal()
     try:
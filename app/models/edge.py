@@ -1,5 +1,14 @@
 from geoalchemy2 import Geometry
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    func,
+)
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
@@ -17,11 +26,31 @@ class Edge(Base):
     target_node_id = Column(Integer, ForeignKey("nodes.id"), nullable=False)
     geometry = Column(Geometry("LINESTRING", srid=4326), nullable=False)
     properties = Column(JSONB)
+    content_hash = Column(String(32), nullable=True)
     is_current = Column(Boolean, default=True)
     valid_from = Column(DateTime(timezone=True), server_default=func.now())
     valid_to = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Point-in-time and version reads match the validity window with @>.
+    # btree_gist lets the network_id equality share the GiST index.
+    __table_args__ = (
+        Index(
+            "ix_edges_network_validity",
+            network_id,
+            func.tstzrange(valid_from, valid_to),
+            postgresql_using="gist",
+        ),
+        # Keyset pages of a network's edges, and of its current edges
+        Index("ix_edges_network_id", network_id, id),
+        Index(
+            "ix_edges_network_current",
+            network_id,
+            id,
+            postgresql_where=is_current,
+        ),
+    )
+
     network = relationship("Network", back_populates="edges")
     version = relationship("NetworkVersion", back_populates="edges")
     source_node = relationship(
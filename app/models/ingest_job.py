@@ -0,0 +1,28 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base
+
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    network_id = Column(Integer, ForeignKey("networks.id"), nullable=True)
+    operation = Column(String(20), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    features_parsed = Column(Integer, nullable=False, default=0)
+    nodes_written = Column(Integer, nullable=False, default=0)
+    edges_written = Column(Integer, nullable=False, default=0)
+    result = Column(JSONB)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    customer = relationship("Customer")
+    network = relationship("Network")
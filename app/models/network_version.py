@@ -1,4 +1,12 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, UniqueConstraint, func
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base
@@ -11,9 +19,21 @@ class NetworkVersion(Base):
     network_id = Column(Integer, ForeignKey("networks.id"), nullable=False)
     version_number = Column(Integer, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Versions never change once written, so their sizes are stored with them
+    node_count = Column(Integer, nullable=True)
+    edge_count = Column(Integer, nullable=True)
+
+    # Edge changes relative to the previous version, set by updates with data
+    edges_added = Column(Integer, nullable=True)
+    edges_removed = Column(Integer, nullable=True)
+    edges_modified = Column(Integer, nullable=True)
+    edges_unchanged = Column(Integer, nullable=True)
 
     __table_args__ = (
         UniqueConstraint("network_id", "version_number", name="uix_network_version"),
+        # The unique constraint's index also serves the latest version lookup
+        # (scanned backwards); this one serves lookups by point in time
+        Index("ix_network_versions_network_created", "network_id", "created_at"),
     )
 
     network = relationship("Network", back_populates="versions")
@@ -3,6 +3,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     UniqueConstraint,
@@ -33,6 +34,7 @@ class Node(Base):
             "version_id",
             name="uix_node_network_external_version",
         ),
+        Index("ix_nodes_network_version", "network_id", "version_id"),
     )
 
     network = relationship("Network", back_populates="nodes")
@@ -1,11 +1,30 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import insert, text
 from sqlalchemy.orm import Session
 
 from app.db.base import Base
 
+BULK_METHODS = ("copy", "insert")
+
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
@@ -56,3 +75,79 @@ class BaseRepository(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db.delete(obj)
         db.commit()
         return obj
+
+    def bulk_insert(
+        self,
+        db: Session,
+        *,
+        rows: Iterable[Dict[str, Any]],
+        columns: Sequence[str],
+        method: str = "copy",
+        batch_size: int = 5000
+    ) -> int:
+        """
+        Insert rows in batches with COPY or multi-row INSERT statements.
+        Geometries are expected as EWKT strings. Nothing is committed.
+        Returns the number of rows written.
+        """
+        if method not in BULK_METHODS:
+            raise ValueError(f"Unknown bulk insert method: {method}")
+
+        db.flush()
+        rows = iter(rows)
+        written = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            if method == "copy":
+                self._copy_batch(db, batch, columns)
+            else:
+                db.execute(
+                    insert(self.model),
+                    [{column: row.get(column) for column in columns} for row in batch],
+                )
+            written += len(batch)
+        return written
+
+    def analyze(self, db: Session) -> None:
+        """Refresh planner statistics after a bulk load"""
+        db.execute(text(f"ANALYZE {self.model.__tablename__}"))
+
+    def _copy_batch(
+        self, db: Session, batch: List[Dict[str, Any]], columns: Sequence[str]
+    ) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow([_copy_value(row.get(column)) for column in columns])
+        buffer.seek(0)
+
+        sql = (
+            f"COPY {self.model.__tablename__} ({', '.join(columns)}) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+        cursor = db.connection().connection.cursor()
+        try:
+            if hasattr(cursor, "copy_expert"):
+                # psycopg2
+                cursor.copy_expert(sql, buffer)
+            else:
+                # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
+
+
+def _copy_value(value: Any) -> Optional[str]:
+    """Convert a Python value to its COPY csv text form (None becomes NULL)"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
@@ -1,15 +1,182 @@
 import base64
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from geoalchemy2.shape import from_shape
+import numpy as np
+from geoalchemy2 import Geography
+from geoalchemy2.shape import from_shape, to_shape
 from shapely.geometry import LineString
-from sqlalchemy import func, or_
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    DateTime,
+    Float,
+    Integer,
+    String,
+    Text,
+    any_,
+    case,
+    cast,
+    func,
+    literal,
+    literal_column,
+    null,
+    select,
+    true,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
 
 from app.models.edge import Edge
+from app.models.network_version import NetworkVersion
 from app.repositories.base import BaseRepository
 from app.schemas.edge import EdgeCreate, EdgeUpdate
+from app.utils.geojson import WGS84_SRID, BBox, edge_content_hash, linestring_ewkt
+
+EDGE_COPY_COLUMNS = (
+    "network_id",
+    "version_id",
+    "external_id",
+    "source_node_id",
+    "target_node_id",
+    "geometry",
+    "properties",
+    "content_hash",
+    "is_current",
+    "valid_from",
+)
+
+
+# Decimal places of encoded polylines, as in Google's format
+POLYLINE_PRECISION = 5
+
+# The edge's own attributes, as named in the API's feature properties
+EDGE_ATTRIBUTES = {
+    "id": Edge.id,
+    "external_id": Edge.external_id,
+    "source_node_id": Edge.source_node_id,
+    "target_node_id": Edge.target_node_id,
+    "is_current": Edge.is_current,
+    "valid_from": Edge.valid_from,
+    "valid_to": Edge.valid_to,
+}
+
+
+def edge_feature_json(
+    fields: Optional[Sequence[str]] = None,
+    geometry: bool = True,
+    tolerance: Optional[float] = None,
+    precision: Optional[int] = None,
+    polyline: bool = False,
+) -> ColumnElement:
+    """
+    An edge as GeoJSON Feature text, encoded by PostGIS. By default stored
+    properties are merged over the edge's own attributes, as in the API's
+    feature format. With `fields` the properties hold only those names, read
+    from the edge's columns for its own attributes and from the stored
+    properties otherwise; without `geometry` the geometry is null. Columns
+    that are not asked for are never read.
+
+    Geometries are simplified to `tolerance` (in degrees) with
+    ST_SimplifyPreserveTopology, which keeps both endpoints on their nodes,
+    and written with `precision` decimals instead of full precision. With
+    `polyline` the geometry is an EncodedPolyline object holding the line
+    as a Google encoded polyline string, `precision` (default 5) decimals.
+    """
+    geometry_json = null()
+    if geometry and polyline:
+        digits = precision if precision is not None else POLYLINE_PRECISION
+        geometry_json = func.json_build_object(
+            "type",
+            "EncodedPolyline",
+            "precision",
+            digits,
+            "polyline",
+            func.ST_AsEncodedPolyline(_edge_shape(tolerance), digits),
+        )
+    elif geometry:
+        geometry_json = edge_geometry_json(tolerance, precision)
+
+    return cast(
+        func.json_build_object(
+            "type",
+            "Feature",
+            "geometry",
+            geometry_json,
+            "properties",
+            edge_properties_json(fields),
+        ),
+        Text,
+    )
+
+
+def edge_properties_json(fields: Optional[Sequence[str]] = None) -> ColumnElement:
+    """An edge's feature properties as JSONB (see edge_feature_json)"""
+    if fields is None:
+        return _jsonb_object(EDGE_ATTRIBUTES.items()).op("||")(
+            func.coalesce(Edge.properties, literal_column("'{}'::jsonb"))
+        )
+    return _jsonb_object((name, _field_json(name)) for name in fields)
+
+
+def _field_json(name: str) -> ColumnElement:
+    """A named field, with stored properties shadowing attributes as above"""
+    if name not in EDGE_ATTRIBUTES:
+        return Edge.properties[name]
+    return case(
+        (Edge.properties.has_key(name), Edge.properties[name]),
+        else_=func.to_jsonb(EDGE_ATTRIBUTES[name]),
+    )
+
+
+def edge_geometry_json(
+    tolerance: Optional[float] = None, precision: Optional[int] = None
+) -> ColumnElement:
+    """An edge's geometry as GeoJSON (see edge_feature_json)"""
+    digits = precision if precision is not None else 15
+    return cast(func.ST_AsGeoJSON(_edge_shape(tolerance), digits), JSON)
+
+
+# SQL types of stored properties by JSON type; other values are JSON text
+PROPERTY_TYPES = {"number": Float, "boolean": Boolean, "string": Text}
+
+
+def edge_property_value(name: str, kind: str) -> ColumnElement:
+    """
+    A stored property as a SQL scalar of `kind`: a JSON type named in
+    PROPERTY_TYPES, whose values of any other JSON type read as null, or
+    "json" for the value's JSON text. Edges without the property read the
+    attribute of its name, if any, as edge_properties_json does.
+    """
+    value = _field_json(name)
+    if kind not in PROPERTY_TYPES:
+        return cast(value, Text)
+    return case(
+        (func.jsonb_typeof(value) == kind, cast(value.astext, PROPERTY_TYPES[kind])),
+        else_=null(),
+    )
+
+
+def _edge_shape(tolerance: Optional[float] = None) -> ColumnElement:
+    if tolerance:
+        return func.ST_SimplifyPreserveTopology(Edge.geometry, tolerance)
+    return Edge.geometry
+
+
+def _jsonb_object(items: Iterable[Tuple[str, Any]]) -> ColumnElement:
+    return func.jsonb_build_object(
+        *(part for name, value in items for part in (literal(name, String), value))
+    )
+
+
+# Rows ranked by index distance before the nearest one is picked by its
+# distance on the spheroid, which may order them differently
+NEAREST_CANDIDATES = 8
+
+WEB_MERCATOR_SRID = 3857
+# Width of the EPSG:3857 world square in metres
+WEB_MERCATOR_WIDTH = 2 * 20037508.342789244
 
 
 class EdgeRepository(BaseRepository[Edge, EdgeCreate, EdgeUpdate]):
@@ -25,10 +192,12 @@ class EdgeRepository(BaseRepository[Edge, EdgeCreate, EdgeUpdate]):
         source_node_id: int,
         target_node_id: int,
         feature: Dict,
-        external_id: str
+        external_id: str,
+        valid_from: Optional[datetime] = None
     ) -> Edge:
         coordinates = feature["geometry"]["coordinates"]
         line = LineString(coordinates)
+        properties = feature.get("properties", {})
 
         db_edge = Edge(
             network_id=network_id,
@@ -37,14 +206,55 @@ class EdgeRepository(BaseRepository[Edge, EdgeCreate, EdgeUpdate]):
             source_node_id=source_node_id,
             target_node_id=target_node_id,
             geometry=from_shape(line, srid=4326),
-            properties=feature.get("properties", {}),
+            properties=properties,
+            content_hash=edge_content_hash(coordinates, properties),
             is_current=True,
-            valid_from=datetime.now(timezone.utc),
+            valid_from=valid_from or datetime.now(timezone.utc),
         )
         db.add(db_edge)
         db.flush() 
         return db_edge
 
+    def bulk_create_from_geojson(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        version_id: int,
+        edges: Iterable[Tuple[str, Dict, int, int]],
+        valid_from: datetime,
+        method: str = "copy",
+        batch_size: int = 5000
+    ) -> int:
+        """
+        Write (external_id, feature, source_node_id, target_node_id) tuples in
+        bulk. Returns the number of edges written.
+        """
+        rows = (
+            {
+                "network_id": network_id,
+                "version_id": version_id,
+                "external_id": str(external_id),
+                "source_node_id": source_node_id,
+                "target_node_id": target_node_id,
+                "geometry": linestring_ewkt(feature["geometry"]["coordinates"]),
+                "properties": feature.get("properties", {}),
+                "content_hash": edge_content_hash(
+                    feature["geometry"]["coordinates"], feature.get("properties")
+                ),
+                "is_current": True,
+                "valid_from": valid_from,
+            }
+            for external_id, feature, source_node_id, target_node_id in edges
+        )
+        return self.bulk_insert(
+            db,
+            rows=rows,
+            columns=EDGE_COPY_COLUMNS,
+            method=method,
+            batch_size=batch_size,
+        )
+
     def get_by_external_id(
         self, db: Session, *, network_id: int, external_id: str
     ) -> Optional[Edge]:
@@ -69,6 +279,69 @@ class EdgeRepository(BaseRepository[Edge, EdgeCreate, EdgeUpdate]):
             db.flush()
         return db_edge
 
+    def retire(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        timestamp: datetime,
+        edge_ids: Optional[Sequence[int]] = None,
+        external_ids: Optional[Sequence[str]] = None
+    ) -> int:
+        """
+        Close the validity of current edges in a single UPDATE: every current
+        edge of the network, or only those matching `edge_ids` or
+        `external_ids`. Edges that only became valid at `timestamp` are left
+        alone. Returns the number of edges retired.
+        """
+        query = db.query(Edge).filter(
+            Edge.network_id == network_id,
+            Edge.is_current == True,
+            Edge.valid_from < timestamp,
+        )
+        if edge_ids is not None:
+            query = query.filter(
+                Edge.id == any_(literal(list(edge_ids), ARRAY(Integer)))
+            )
+        if external_ids is not None:
+            query = query.filter(
+                Edge.external_id
+                == any_(literal([str(i) for i in external_ids], ARRAY(String)))
+            )
+        return query.update(
+            {Edge.is_current: False, Edge.valid_to: timestamp},
+            synchronize_session=False,
+        )
+
+    def get_current_hashes(
+        self, db: Session, *, network_id: int
+    ) -> List[Tuple[int, str, str]]:
+        """
+        Return (id, external_id, content_hash) for the current edges of a
+        network, hashing edges written before content hashes existed.
+        """
+        unhashed = (
+            db.query(Edge)
+            .filter(
+                Edge.network_id == network_id,
+                Edge.is_current == True,
+                Edge.content_hash.is_(None),
+            )
+            .all()
+        )
+        for edge in unhashed:
+            edge.content_hash = edge_content_hash(
+                to_shape(edge.geometry).coords, edge.properties
+            )
+        if unhashed:
+            db.flush()
+
+        return (
+            db.query(Edge.id, Edge.external_id, Edge.content_hash)
+            .filter(Edge.network_id == network_id, Edge.is_current == True)
+            .all()
+        )
+
     def get_current_by_network(self, db: Session, *, network_id: int) -> List[Edge]:
         return (
             db.query(Edge)
@@ -79,10 +352,15 @@ class EdgeRepository(BaseRepository[Edge, EdgeCreate, EdgeUpdate]):
     def get_by_network_version(
         self, db: Session, *, network_id: int, version_id: int
     ) -> List[Edge]:
+        return db.query(Edge).filter(*version_criteria(network_id, version_id)).all()
+
+    def count_by_network_version(
+        self, db: Session, *, network_id: int, version_id: int
+    ) -> int:
         return (
-            db.query(Edge)
-            .filter(Edge.network_id == network_id, Edge.version_id == version_id)
-            .all()
+            db.query(func.count(Edge.id))
+            .filter(*version_criteria(network_id, version_id))
+            .scalar()
         )
 
     def get_by_timestamp(
@@ -90,13 +368,271 @@ class EdgeRepository(BaseRepository[Edge, EdgeCreate, EdgeUpdate]):
     ) -> List[Edge]:
         return (
             db.query(Edge)
+            .filter(Edge.network_id == network_id, valid_at(timestamp))
+            .all()
+        )
+
+    def get_graph_arrays(
+        self, db: Session, *, network_id: int, version_id: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The ids, source node ids, target node ids and lengths in metres of a
+        version's edges as NumPy arrays in id order. Each column is
+        aggregated into one array in the database, so no row objects are
+        built.
+        """
+        length = func.ST_Length(cast(Edge.geometry, Geography(srid=WGS84_SRID)))
+        row = (
+            db.query(
+                *(
+                    func.array_agg(aggregate_order_by(column, Edge.id))
+                    for column in (
+                        Edge.id,
+                        Edge.source_node_id,
+                        Edge.target_node_id,
+                        length,
+                    )
+                )
+            )
+            .filter(*version_criteria(network_id, version_id))
+            .one()
+        )
+        ids, sources, targets, lengths = (values or [] for values in row)
+        return (
+            np.asarray(ids, dtype=np.int64),
+            np.asarray(sources, dtype=np.int64),
+            np.asarray(targets, dtype=np.int64),
+            np.asarray(lengths, dtype=np.float64),
+        )
+
+    def get_lines(
+        self, db: Session, *, network_id: int, ids: Sequence[int]
+    ) -> Dict[int, Tuple[int, List[Tuple[float, float]]]]:
+        """Map edge ids to their (source node id, coordinates)"""
+        rows = (
+            db.query(Edge.id, Edge.source_node_id, Edge.geometry)
             .filter(
                 Edge.network_id == network_id,
-                Edge.valid_from <= timestamp,
-                or_(Edge.valid_to > timestamp, Edge.valid_to.is_(None)),
+                Edge.id == any_(literal([int(i) for i in ids], ARRAY(Integer))),
             )
             .all()
         )
+        return {
+            edge_id: (source_node_id, list(to_shape(geometry).coords))
+            for edge_id, source_node_id, geometry in rows
+        }
+
+    def get_reached_geometry(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        stretches: Sequence[Tuple[int, int, float]],
+        concavity: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        GeoJSON MultiLineString of stretches of edges, each an (edge id, node
+        id it starts at, fraction of the edge) triple cut from that end of
+        the edge's line, or with `concavity` their concave hull (see
+        ST_ConcaveHull: 1 is the convex hull, lower values follow the lines
+        more closely). Stretches are passed as arrays and unnested, so one
+        query builds the geometry. Fractions are taken of the line's planar
+        length. Returns None for no stretches.
+        """
+        if not stretches:
+            return None
+        stretch = (
+            func.unnest(
+                literal([int(s[0]) for s in stretches], ARRAY(Integer)),
+                literal([int(s[1]) for s in stretches], ARRAY(Integer)),
+                literal([float(s[2]) for s in stretches], ARRAY(Float)),
+            )
+            .table_valued("edge_id", "node_id", "fraction")
+            .render_derived("stretch")
+        )
+        line = case(
+            (stretch.c.fraction >= 1.0, Edge.geometry),
+            (
+                Edge.source_node_id == stretch.c.node_id,
+                func.ST_LineSubstring(Edge.geometry, 0.0, stretch.c.fraction),
+            ),
+            else_=func.ST_LineSubstring(Edge.geometry, 1.0 - stretch.c.fraction, 1.0),
+        )
+        shape = func.ST_Multi(func.ST_Collect(line))
+        if concavity is not None:
+            shape = func.ST_ConcaveHull(shape, concavity)
+        return (
+            db.query(cast(func.ST_AsGeoJSON(shape), JSON))
+            .select_from(stretch)
+            .join(Edge, Edge.id == stretch.c.edge_id)
+            .filter(Edge.network_id == network_id)
+            .scalar()
+        )
+
+    def stream_features(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        geometry: bool = True,
+        tolerance: Optional[float] = None,
+        precision: Optional[int] = None,
+        polyline: bool = False,
+        batch_size: int = 1000
+    ) -> Iterator[str]:
+        """
+        Iterate over the edges of a version, of a point in time, or the current
+        edges as GeoJSON Feature text encoded by PostGIS (see
+        edge_feature_json), ordered by id and optionally limited to a bounding
+        box or polygon (see spatial_criteria). Rows are fetched `batch_size`
+        at a time through a server-side cursor, so memory use does not depend
+        on the network size.
+        """
+        feature = edge_feature_json(fields, geometry, tolerance, precision, polyline)
+        query = db.query(feature).filter(
+            *selection_criteria(network_id, version_id, timestamp),
+            *spatial_criteria(bbox, polygon),
+        )
+        return (feature for (feature,) in _stream(query, batch_size))
+
+    def stream_shapes(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        tolerance: Optional[float] = None,
+        batch_size: int = 1000
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        (geometry, properties) JSON text pairs of the edges selected as in
+        stream_features, for encoders that lay features out themselves
+        """
+        query = db.query(
+            cast(edge_geometry_json(tolerance), Text),
+            cast(edge_properties_json(fields), Text),
+        ).filter(
+            *selection_criteria(network_id, version_id, timestamp),
+            *spatial_criteria(bbox, polygon),
+        )
+        return _stream(query, batch_size)
+
+    def get_property_types(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None,
+        names: Optional[Sequence[str]] = None
+    ) -> Dict[str, List[str]]:
+        """
+        The stored property names of the edges selected as in stream_features
+        (or only those of `names`), each with the JSON types of its values
+        """
+        entries = (
+            func.jsonb_each(Edge.properties)
+            .table_valued("key", "value")
+            .lateral("property")
+        )
+        query = (
+            db.query(
+                entries.c.key,
+                func.array_agg(func.jsonb_typeof(entries.c.value).distinct()),
+            )
+            .select_from(Edge)
+            .join(entries, true())
+            .filter(
+                *selection_criteria(network_id, version_id, timestamp),
+                *spatial_criteria(bbox, polygon),
+            )
+        )
+        if names is not None:
+            query = query.filter(
+                entries.c.key == any_(literal(list(names), ARRAY(Text)))
+            )
+        rows = query.group_by(entries.c.key).order_by(entries.c.key).all()
+        return {name: sorted(types) for name, types in rows}
+
+    def stream_row_batches(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None,
+        attributes: Sequence[str] = tuple(EDGE_ATTRIBUTES),
+        geometry: bool = True,
+        tolerance: Optional[float] = None,
+        properties: Optional[Dict[str, str]] = None,
+        batch_size: int = 1000
+    ) -> Iterator[List[Tuple]]:
+        """
+        The edges selected as in stream_features as lists of up to
+        `batch_size` plain rows, for columnar encoders. Each row holds the
+        named edge `attributes`, then the WKB geometry (simplified to
+        `tolerance`) if `geometry` is set, then the stored `properties`, a
+        mapping of names to kinds (see edge_property_value).
+        """
+        columns = [EDGE_ATTRIBUTES[name] for name in attributes]
+        if geometry:
+            columns.append(func.ST_AsBinary(_edge_shape(tolerance)))
+        columns += [
+            edge_property_value(name, kind) for name, kind in (properties or {}).items()
+        ]
+        result = db.execute(
+            select(*columns)
+            .where(
+                *selection_criteria(network_id, version_id, timestamp),
+                *spatial_criteria(bbox, polygon),
+            )
+            .order_by(Edge.id)
+            .execution_options(yield_per=batch_size)
+        )
+        return ([tuple(row) for row in partition] for partition in result.partitions())
+
+    def get_extent(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None
+    ) -> Optional[BBox]:
+        """
+        Bounding box of the edges selected as in stream_features, or None if
+        no edge is selected
+        """
+        extent = func.ST_Extent(Edge.geometry)
+        row = (
+            db.query(
+                func.ST_XMin(extent),
+                func.ST_YMin(extent),
+                func.ST_XMax(extent),
+                func.ST_YMax(extent),
+            )
+            .filter(
+                *selection_criteria(network_id, version_id, timestamp),
+                *spatial_criteria(bbox, polygon),
+            )
+            .one()
+        )
+        return None if row[0] is None else tuple(row)
 
     def get_paginated_edges_by_network_version(
         self,
@@ -105,29 +641,270 @@ class EdgeRepository(BaseRepository[Edge, EdgeCreate, EdgeUpdate]):
         network_id: int,
         version_id: int,
         cursor: Optional[str] = None,
-        limit: int = 100
-    ) -> Tuple[List[Edge], Optional[str], int]:
-        query = db.query(Edge).filter(
-            Edge.network_id == network_id, Edge.version_id == version_id
+        limit: int = 100,
+        count: bool = True
+    ) -> Tuple[List[Edge], Optional[str], Optional[int]]:
+        query = db.query(Edge).filter(*version_criteria(network_id, version_id))
+        edges, next_cursor, total_count = _page(query, cursor, limit, count)
+        return edges, next_cursor, total_count
+
+    def get_paginated_features(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        geometry: bool = True,
+        tolerance: Optional[float] = None,
+        precision: Optional[int] = None,
+        polyline: bool = False,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        count: bool = True
+    ) -> Tuple[List[str], Optional[str], Optional[int]]:
+        """
+        A page of the edges selected and encoded as in stream_features. Pages
+        are keyed on the edge id within the filtered set.
+        """
+        query = db.query(
+            Edge.id,
+            edge_feature_json(fields, geometry, tolerance, precision, polyline),
+        ).filter(
+            *selection_criteria(network_id, version_id, timestamp),
+            *spatial_criteria(bbox, polygon),
+        )
+        rows, next_cursor, total_count = _page(query, cursor, limit, count)
+        return [feature for _, feature in rows], next_cursor, total_count
+
+    def get_nearest(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        version_id: int,
+        points: Sequence[Tuple[float, float]],
+        max_distance: Optional[float] = None
+    ) -> List[Tuple]:
+        """
+        For each (lon, lat) of `points`, in order, the nearest edge of a
+        version as (id, external_id, x, y, distance, fraction): the closest
+        point on the edge, its distance in metres and its position along the
+        edge (0-1). All values are None where no edge lies within
+        `max_distance` metres. Answered in one query (see nearest_query).
+        """
+        point, location, nearest = nearest_query(
+            Edge, version_criteria(network_id, version_id), points, max_distance
+        )
+        closest = func.ST_ClosestPoint(nearest.c.geometry, location)
+        return [
+            tuple(row)
+            for row in db.execute(
+                select(
+                    nearest.c.id,
+                    nearest.c.external_id,
+                    func.ST_X(closest),
+                    func.ST_Y(closest),
+                    nearest.c.distance,
+                    func.ST_LineLocatePoint(nearest.c.geometry, location),
+                )
+                .select_from(point)
+                .outerjoin(nearest, true())
+                .order_by(point.c.ordinality)
+            )
+        ]
+
+    def get_tile(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        z: int,
+        x: int,
+        y: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        extent: int = 4096,
+        buffer: int = 64
+    ) -> bytes:
+        """
+        Encode the edges selected as in stream_features that fall in web
+        mercator tile z/x/y as a Mapbox Vector Tile with a single "edges"
+        layer. Edge properties are written as feature attributes.
+        """
+        envelope = func.ST_TileEnvelope(z, x, y)
+        # Also select edges within `buffer` of the tile, so lines crossing
+        # its border are drawn up to the clipping margin
+        margin = WEB_MERCATOR_WIDTH / 2**z * buffer / extent
+        tile = (
+            select(
+                func.ST_AsMVTGeom(
+                    func.ST_Transform(Edge.geometry, WEB_MERCATOR_SRID),
+                    envelope,
+                    extent,
+                    buffer,
+                    True,
+                ).label("geom"),
+                Edge.id,
+                Edge.external_id,
+                Edge.source_node_id,
+                Edge.target_node_id,
+                Edge.properties,
+            )
+            .where(
+                *selection_criteria(network_id, version_id, timestamp),
+                Edge.geometry.op("&&")(
+                    func.ST_Transform(func.ST_Expand(envelope, margin), WGS84_SRID)
+                ),
+            )
+            .subquery("tile")
         )
+        data = db.execute(
+            select(
+                func.ST_AsMVT(literal_column("tile.*"), "edges", extent, "geom", "id")
+            ).select_from(tile)
+        ).scalar()
+        return bytes(data) if data is not None else b""
 
-        total_count = query.count()
 
-        if cursor:
-            try:
-                edge_id = int(base64.b64decode(cursor.encode()).decode())
-                query = query.filter(Edge.id > edge_id)
-            except:
-                pass
+def nearest_query(
+    model,
+    criteria: tuple,
+    points: Sequence[Tuple[float, float]],
+    max_distance: Optional[float] = None,
+    candidates: int = NEAREST_CANDIDATES,
+) -> tuple:
+    """
+    Set-based nearest neighbour search: `points` are passed as two arrays
+    and unnested into a "point" table (x, y, ordinality), and a lateral
+    subquery finds each point's nearest `model` row matching `criteria`.
+    The `candidates` closest rows by the GiST index's <-> ordering are
+    ranked by their distance on the spheroid in metres. Returns the point
+    table, the point's location as a geometry and the "nearest" subquery
+    (id, external_id, geometry, distance), to be outer-joined on true.
+    """
+    xs = [float(x) for x, _ in points]
+    ys = [float(y) for _, y in points]
+    point = (
+        func.unnest(literal(xs, ARRAY(Float)), literal(ys, ARRAY(Float)))
+        .table_valued("x", "y", with_ordinality="ordinality")
+        .render_derived("point")
+    )
+    location = func.ST_SetSRID(func.ST_MakePoint(point.c.x, point.c.y), WGS84_SRID)
+    candidate = (
+        select(model.id, model.external_id, model.geometry)
+        .where(*criteria)
+        .order_by(model.geometry.op("<->")(location))
+        .limit(candidates)
+        .subquery("candidate")
+    )
+    distance = func.ST_Distance(
+        cast(candidate.c.geometry, Geography(srid=WGS84_SRID)),
+        cast(location, Geography(srid=WGS84_SRID)),
+    )
+    nearest = select(
+        candidate.c.id,
+        candidate.c.external_id,
+        candidate.c.geometry,
+        distance.label("distance"),
+    )
+    if max_distance is not None:
+        nearest = nearest.where(distance <= float(max_distance))
+    return point, location, nearest.order_by(distance).limit(1).lateral("nearest")
 
-        edges = query.order_by(Edge.id).limit(limit + 1).all()
 
-        has_more = len(edges) > limit
-        if has_more:
-            edges = edges[:-1]  
+def _stream(query, batch_size: int):
+    """
+    Iterate over the rows of a query over edges in id order, fetched
+    `batch_size` at a time through a server-side cursor
+    """
+    return iter(query.order_by(Edge.id).execution_options(yield_per=batch_size))
 
-        next_cursor = None
-        if has_more and edges:
-            next_cursor = base64.b64encode(str(edges[-1].id).encode()).decode()
 
-        return edges, next_cursor, total_count
+def _page(
+    query, cursor: Optional[str], limit: int, count: bool = True
+) -> Tuple[list, Optional[str], Optional[int]]:
+    """
+    Keyset-paginate a query over edges (or rows starting with an edge id).
+    The total row count is only queried when `count` is set.
+    """
+    total_count = None
+    if count:
+        total_count = query.with_entities(func.count(Edge.id)).scalar()
+
+    if cursor:
+        try:
+            edge_id = int(base64.b64decode(cursor.encode()).decode())
+            query = query.filter(Edge.id > edge_id)
+        except:
+            pass
+
+    rows = query.order_by(Edge.id).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[:-1]
+
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = base64.b64encode(str(rows[-1].id).encode()).decode()
+
+    return rows, next_cursor, total_count
+
+
+def valid_at(timestamp) -> ColumnElement:
+    """
+    Edges whose validity window [valid_from, valid_to) contains `timestamp`,
+    a datetime or a SQL expression. Written as a range containment so that
+    it matches the ix_edges_network_validity GiST index.
+    """
+    if isinstance(timestamp, datetime):
+        timestamp = cast(timestamp, DateTime(timezone=True))
+    return func.tstzrange(Edge.valid_from, Edge.valid_to).op("@>")(timestamp)
+
+
+def version_criteria(network_id: int, version_id: int) -> tuple:
+    """
+    Filter criteria for the edges that belong to a network version. Edges
+    are shared between versions until they change, so membership is the
+    edge's validity window containing the version's creation time.
+    """
+    created_at = (
+        select(NetworkVersion.created_at)
+        .where(NetworkVersion.id == version_id)
+        .scalar_subquery()
+    )
+    return (Edge.network_id == network_id, valid_at(created_at))
+
+
+def selection_criteria(
+    network_id: int,
+    version_id: Optional[int] = None,
+    timestamp: Optional[datetime] = None,
+) -> tuple:
+    """Edges of a version, else valid at `timestamp`, else the current edges"""
+    if version_id is not None:
+        return version_criteria(network_id, version_id)
+    if timestamp is not None:
+        return (Edge.network_id == network_id, valid_at(timestamp))
+    return (Edge.network_id == network_id, Edge.is_current == True)
+
+
+def spatial_criteria(
+    bbox: Optional[BBox] = None, polygon: Optional[str] = None
+) -> tuple:
+    """
+    Edges whose bounding box overlaps `bbox` (minx, miny, maxx, maxy) and
+    that intersect the EWKT `polygon`. Both are answered from the GiST index
+    on edges.geometry.
+    """
+    criteria = ()
+    if bbox is not None:
+        envelope = func.ST_MakeEnvelope(*bbox, WGS84_SRID)
+        criteria += (Edge.geometry.op("&&")(envelope),)
+    if polygon is not None:
+        criteria += (func.ST_Intersects(Edge.geometry, func.ST_GeomFromEWKT(polygon)),)
+    return criteria
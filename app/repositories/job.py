@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.ingest_job import IngestJob
+from app.repositories.base import BaseRepository
+from app.schemas.job import IngestJobCreate, IngestJobUpdate
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+UNFINISHED_STATUSES = (JOB_PENDING, JOB_RUNNING)
+
+
+class IngestJobRepository(BaseRepository[IngestJob, IngestJobCreate, IngestJobUpdate]):
+    def __init__(self):
+        super().__init__(IngestJob)
+
+    def create(self, db: Session, *, obj_in: IngestJobCreate) -> IngestJob:
+        db_job = IngestJob(**obj_in.model_dump(), status=JOB_PENDING)
+        db.add(db_job)
+        db.commit()
+        db.refresh(db_job)
+        return db_job
+
+    def update_progress(self, db: Session, *, id: int, **counts: int) -> None:
+        """Set any of features_parsed, nodes_written and edges_written"""
+        self._set(db, id=id, values=counts)
+
+    def mark_running(self, db: Session, *, id: int) -> None:
+        self._set(db, id=id, values={"status": JOB_RUNNING})
+
+    def mark_succeeded(self, db: Session, *, id: int, result: Dict[str, Any]) -> None:
+        self._set(
+            db,
+            id=id,
+            values={
+                "status": JOB_SUCCEEDED,
+                "network_id": result.get("id"),
+                "result": result,
+                "finished_at": datetime.now(timezone.utc),
+            },
+        )
+
+    def mark_failed(self, db: Session, *, id: int, error: str) -> None:
+        self._set(
+            db,
+            id=id,
+            values={
+                "status": JOB_FAILED,
+                "error": error,
+                "finished_at": datetime.now(timezone.utc),
+            },
+        )
+
+    def touch(self, db: Session, *, ids: Sequence[int]) -> None:
+        """Mark unfinished jobs as still being worked on"""
+        db.query(IngestJob).filter(
+            IngestJob.id.in_(ids), IngestJob.status.in_(UNFINISHED_STATUSES)
+        ).update({"updated_at": func.now()}, synchronize_session=False)
+        db.commit()
+
+    def fail_unfinished(
+        self, db: Session, *, error: str, stale_after: timedelta
+    ) -> int:
+        """
+        Mark the pending or running jobs not updated for `stale_after` as
+        failed; returns how many
+        """
+        count = (
+            db.query(IngestJob)
+            .filter(
+                IngestJob.status.in_(UNFINISHED_STATUSES),
+                IngestJob.updated_at < func.now() - stale_after,
+            )
+            .update(
+                {
+                    "status": JOB_FAILED,
+                    "error": error,
+                    "finished_at": datetime.now(timezone.utc),
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        return count
+
+    def _set(self, db: Session, *, id: int, values: Dict[str, Any]) -> None:
+        db.query(IngestJob).filter(IngestJob.id == id).update(
+            values, synchronize_session=False
+        )
+        db.commit()
@@ -1,11 +1,13 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.models.network import Network
 from app.models.network_version import NetworkVersion
 from app.repositories.base import BaseRepository
-from app.schemas.network import NetworkCreate, NetworkUpdate
+from app.schemas.network import NetworkBase, NetworkCreate, NetworkUpdate
 
 
 class NetworkRepository(BaseRepository[Network, NetworkCreate, NetworkUpdate]):
@@ -24,16 +26,18 @@ class NetworkRepository(BaseRepository[Network, NetworkCreate, NetworkUpdate]):
         )
 
     def create_with_version(
-        self, db: Session, *, obj_in: NetworkCreate, customer_id: int
+        self, db: Session, *, obj_in: NetworkBase, customer_id: int
     ) -> Network:
         network_data = obj_in.model_dump(exclude={"data"})
         db_network = Network(**network_data, customer_id=customer_id)
         db.add(db_network)
         db.flush()
 
+        # Flushed, not committed: the network only appears once its nodes and
+        # edges are committed with it
         db_version = NetworkVersion(network_id=db_network.id, version_number=1)
         db.add(db_version)
-        db.commit()
+        db.flush()
         db.refresh(db_network)
         return db_network
 
@@ -47,14 +51,73 @@ class NetworkRepository(BaseRepository[Network, NetworkCreate, NetworkUpdate]):
             .first()
         )
 
+    def get_version(
+        self, db: Session, *, network_id: int, version_number: int
+    ) -> Optional[NetworkVersion]:
+        return (
+            db.query(NetworkVersion)
+            .filter(
+                NetworkVersion.network_id == network_id,
+                NetworkVersion.version_number == version_number,
+            )
+            .first()
+        )
+
+    def get_version_at(
+        self, db: Session, *, network_id: int, timestamp: datetime
+    ) -> Optional[NetworkVersion]:
+        """The version that was the latest one at `timestamp`"""
+        return (
+            db.query(NetworkVersion)
+            .filter(
+                NetworkVersion.network_id == network_id,
+                NetworkVersion.created_at <= timestamp,
+            )
+            .order_by(NetworkVersion.created_at.desc())
+            .first()
+        )
+
+    def lock(self, db: Session, *, id: int) -> None:
+        """
+        Lock a network's row until the transaction ends, so that versions of
+        the network are written one at a time
+        """
+        db.query(Network.id).filter(Network.id == id).with_for_update().one()
+
     def create_new_version(self, db: Session, *, network_id: int) -> NetworkVersion:
         latest_version = self.get_latest_version(db, network_id=network_id)
         new_version_num = latest_version.version_number + 1 if latest_version else 1
 
+        # Flushed, not committed: the version appears once its nodes, edges
+        # and counts are committed with it. It is stamped when it is created
+        # rather than when the session's transaction began.
         db_version = NetworkVersion(
-            network_id=network_id, version_number=new_version_num
+            network_id=network_id,
+            version_number=new_version_num,
+            created_at=func.clock_timestamp(),
         )
         db.add(db_version)
-        db.commit()
+        db.flush()
         db.refresh(db_version)
         return db_version
+
+    def record_counts(
+        self, db: Session, *, version: NetworkVersion, node_count: int, edge_count: int
+    ) -> NetworkVersion:
+        version.node_count = node_count
+        version.edge_count = edge_count
+        db.add(version)
+        db.flush()
+        return version
+
+    def record_changes(
+        self, db: Session, *, version: NetworkVersion, changes: Dict[str, int]
+    ) -> NetworkVersion:
+        """Store {added, removed, modified, unchanged} edge counts on a version"""
+        version.edges_added = changes["added"]
+        version.edges_removed = changes["removed"]
+        version.edges_modified = changes["modified"]
+        version.edges_unchanged = changes["unchanged"]
+        db.add(version)
+        db.flush()
+        return version
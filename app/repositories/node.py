@@ -1,13 +1,26 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
+import numpy as np
 from geoalchemy2.shape import from_shape
 from shapely.geometry import Point
-from sqlalchemy import func
+from sqlalchemy import func, or_, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.orm import Session
 
+from app.models.edge import Edge
 from app.models.node import Node
 from app.repositories.base import BaseRepository
+from app.repositories.edge import nearest_query, version_criteria
 from app.schemas.node import NodeCreate, NodeUpdate
+from app.utils.geojson import point_ewkt
+
+NODE_COPY_COLUMNS = (
+    "network_id",
+    "version_id",
+    "external_id",
+    "geometry",
+    "properties",
+)
 
 
 class NodeRepository(BaseRepository[Node, NodeCreate, NodeUpdate]):
@@ -37,6 +50,47 @@ class NodeRepository(BaseRepository[Node, NodeCreate, NodeUpdate]):
         db.flush()
         return db_node
 
+    def bulk_create_from_geojson(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        version_id: int,
+        nodes: Iterable[Tuple[str, Dict]],
+        method: str = "copy",
+        batch_size: int = 5000
+    ) -> Dict[str, int]:
+        """
+        Write (external_id, feature) pairs in bulk and resolve their database
+        ids with a single query. Returns {external_id: node_id}.
+        """
+        rows = (
+            {
+                "network_id": network_id,
+                "version_id": version_id,
+                "external_id": str(external_id),
+                "geometry": point_ewkt(feature["geometry"]["coordinates"]),
+                "properties": feature.get("properties", {}),
+            }
+            for external_id, feature in nodes
+        )
+        self.bulk_insert(
+            db,
+            rows=rows,
+            columns=NODE_COPY_COLUMNS,
+            method=method,
+            batch_size=batch_size,
+        )
+        return self.get_id_map(db, network_id=network_id, version_id=version_id)
+
+    def get_id_map(
+        self, db: Session, *, network_id: int, version_id: int
+    ) -> Dict[str, int]:
+        rows = db.query(Node.external_id, Node.id).filter(
+            Node.network_id == network_id, Node.version_id == version_id
+        )
+        return {external_id: node_id for external_id, node_id in rows}
+
     def get_by_external_id(
         self, db: Session, *, network_id: int, version_id: int, external_id: str
     ) -> Optional[Node]:
@@ -54,7 +108,103 @@ class NodeRepository(BaseRepository[Node, NodeCreate, NodeUpdate]):
         self, db: Session, *, network_id: int, version_id: int
     ) -> List[Node]:
         return (
-            db.query(Node)
-            .filter(Node.network_id == network_id, Node.version_id == version_id)
+            db.query(Node).filter(*self._version_criteria(network_id, version_id)).all()
+        )
+
+    def count_by_network_version(
+        self, db: Session, *, network_id: int, version_id: int
+    ) -> int:
+        return (
+            db.query(func.count(Node.id))
+            .filter(*self._version_criteria(network_id, version_id))
+            .scalar()
+        )
+
+    def get_locations_by_network_version(
+        self, db: Session, *, network_id: int, version_id: int
+    ) -> List[Tuple[int, float, float, Optional[Dict]]]:
+        """Return (id, x, y, properties) for every node of a network version"""
+        return (
+            db.query(
+                Node.id,
+                func.ST_X(Node.geometry),
+                func.ST_Y(Node.geometry),
+                Node.properties,
+            )
+            .filter(*self._version_criteria(network_id, version_id))
             .all()
         )
+
+    def get_coordinate_arrays(
+        self, db: Session, *, network_id: int, version_id: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The ids, longitudes and latitudes of a version's nodes as NumPy arrays
+        in id order, aggregated in the database
+        """
+        row = (
+            db.query(
+                *(
+                    func.array_agg(aggregate_order_by(column, Node.id))
+                    for column in (
+                        Node.id,
+                        func.ST_X(Node.geometry),
+                        func.ST_Y(Node.geometry),
+                    )
+                )
+            )
+            .filter(*self._version_criteria(network_id, version_id))
+            .one()
+        )
+        ids, xs, ys = (values or [] for values in row)
+        return (
+            np.asarray(ids, dtype=np.int64),
+            np.asarray(xs, dtype=np.float64),
+            np.asarray(ys, dtype=np.float64),
+        )
+
+    def get_nearest(
+        self,
+        db: Session,
+        *,
+        network_id: int,
+        version_id: int,
+        points: Sequence[Tuple[float, float]],
+        max_distance: Optional[float] = None
+    ) -> List[Tuple]:
+        """
+        For each (lon, lat) of `points`, in order, the nearest node of a
+        version as (id, external_id, x, y, distance), the distance in metres.
+        All values are None where no node lies within `max_distance` metres.
+        """
+        point, _, nearest = nearest_query(
+            Node, self._version_criteria(network_id, version_id), points, max_distance
+        )
+        return [
+            tuple(row)
+            for row in db.execute(
+                select(
+                    nearest.c.id,
+                    nearest.c.external_id,
+                    func.ST_X(nearest.c.geometry),
+                    func.ST_Y(nearest.c.geometry),
+                    nearest.c.distance,
+                )
+                .select_from(point)
+                .outerjoin(nearest, true())
+                .order_by(point.c.ordinality)
+            )
+        ]
+
+    def _version_criteria(self, network_id: int, version_id: int) -> tuple:
+        # A version holds the nodes it created and the nodes its edges use,
+        # which may have been created by an earlier version
+        edges = version_criteria(network_id, version_id)
+        return (
+            Node.network_id == network_id,
+            or_(
+                Node.version_id == version_id,
+                Node.id.in_(select(Edge.source_node_id).where(*edges)),
+                Node.id.in_(select(Edge.target_node_id).where(*edges)),
+            ),
+        )
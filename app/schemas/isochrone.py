@@ -0,0 +1,16 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class Isochrone(BaseModel):
+    network_id: int
+    version: int
+    # The node searched from and the path length reached from it in metres
+    node_id: int
+    distance: float
+    # Edges reached in full or in part, in id order
+    edge_ids: List[int]
+    # GeoJSON MultiLineString of the reached stretches of the edges, or the
+    # concave hull around them; null when only edge ids were asked for
+    geometry: Optional[Dict[str, Any]] = None
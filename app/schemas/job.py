@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.schemas.network import NetworkWithVersion
+
+
+class IngestJobBase(BaseModel):
+    operation: str
+    network_id: Optional[int] = None
+
+
+class IngestJobCreate(IngestJobBase):
+    customer_id: int
+
+
+class IngestJobUpdate(BaseModel):
+    network_id: Optional[int] = None
+    status: Optional[str] = None
+
+
+class IngestJobInDBBase(IngestJobBase):
+    id: int
+    customer_id: int
+    status: str
+    features_parsed: int
+    nodes_written: int
+    edges_written: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    model_config = {"from_attributes": True}
+
+
+class IngestJob(IngestJobInDBBase):
+    result: Optional[NetworkWithVersion] = None
@@ -0,0 +1,40 @@
+from typing import List, Optional, Tuple, Union
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.core.config import settings
+
+# A node id, or a lon/lat position snapped to the nearest node
+Location = Union[int, Tuple[float, float]]
+
+
+class MatrixQuery(BaseModel):
+    origins: List[Location] = Field(
+        ..., min_length=1, max_length=settings.MATRIX_MAX_LOCATIONS
+    )
+    destinations: List[Location] = Field(
+        ..., min_length=1, max_length=settings.MATRIX_MAX_LOCATIONS
+    )
+
+    @field_validator("origins", "destinations")
+    @classmethod
+    def validate_locations(cls, locations: List[Location]):
+        for location in locations:
+            if isinstance(location, tuple):
+                lon, lat = location
+                if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+                    raise ValueError(
+                        f"Point ({lon}, {lat}) is not a WGS84 lon/lat pair"
+                    )
+        return locations
+
+
+class Matrix(BaseModel):
+    network_id: int
+    version: int
+    # Nodes the origins and destinations were resolved to, in order
+    origin_node_ids: List[int]
+    destination_node_ids: List[int]
+    # Path lengths in metres, one row per origin; null where a destination
+    # cannot be reached
+    distances: List[List[Optional[float]]]
@@ -0,0 +1,40 @@
+from typing import List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.core.config import settings
+
+
+class NearestQuery(BaseModel):
+    points: List[Tuple[float, float]] = Field(
+        ..., min_length=1, max_length=settings.NEAREST_MAX_POINTS
+    )
+    target: Literal["edge", "node"] = "edge"
+    max_distance: Optional[float] = Field(None, gt=0)
+
+    @field_validator("points")
+    @classmethod
+    def validate_points(cls, points: List[Tuple[float, float]]):
+        for lon, lat in points:
+            if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+                raise ValueError(f"Point ({lon}, {lat}) is not a WGS84 lon/lat pair")
+        return points
+
+
+class NearestMatch(BaseModel):
+    id: int
+    external_id: Optional[str] = None
+    # Closest point of the edge, or the node's location, as lon/lat
+    location: Tuple[float, float]
+    # In metres, measured on the spheroid
+    distance: float
+    # Position of `location` along the edge, from 0 (source) to 1 (target)
+    fraction: Optional[float] = None
+
+
+class NearestResult(BaseModel):
+    network_id: int
+    version: Optional[int] = None
+    target: Literal["edge", "node"]
+    # One entry per query point, in order; null where nothing is in range
+    matches: List[Optional[NearestMatch]]
@@ -32,7 +32,15 @@ class Network(NetworkInDBBase):
     pass
 
 
+class VersionChanges(BaseModel):
+    added: int
+    removed: int
+    modified: int
+    unchanged: int
+
+
 class NetworkWithVersion(Network):
     version: int
     node_count: int
     edge_count: int
+    changes: Optional[VersionChanges] = None
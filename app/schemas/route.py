@@ -0,0 +1,15 @@
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+
+
+class Route(BaseModel):
+    network_id: int
+    version: int
+    # Length of the path in metres, measured on the spheroid
+    distance: float
+    # Nodes and edges along the path, from origin to destination
+    node_ids: List[int]
+    edge_ids: List[int]
+    # GeoJSON LineString of the edges' geometries joined in travel order
+    geometry: Dict[str, Any]
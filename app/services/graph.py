@@ -0,0 +1,44 @@
+from typing import Callable, Dict
+
+from app.utils.cache import LRUCache
+from app.utils.graph import Graph
+
+
+class GraphCache:
+    """
+    Routing graphs of network versions, keyed by (network_id,
+    version_number) and evicted least recently used first once their
+    arrays take more than `max_bytes`
+    """
+
+    def __init__(self, max_bytes: int):
+        self._graphs = LRUCache(max_bytes=max_bytes, sizeof=lambda graph: graph.nbytes)
+
+    def __len__(self) -> int:
+        return len(self._graphs)
+
+    def get_or_build(
+        self, network_id: int, version_number: int, build: Callable[[], Graph]
+    ) -> Graph:
+        """Return the cached graph of a version, building and storing it on a miss"""
+        return self._graphs.get_or_create((network_id, version_number), build)
+
+    def invalidate(self, network_id: int) -> int:
+        """Drop every graph of a network; returns how many"""
+        return self._graphs.invalidate(lambda key: key[0] == network_id)
+
+    def clear(self) -> None:
+        self._graphs.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit rate, bytes used and the counts behind them"""
+        stats = self._graphs.stats()
+        return {
+            "graphs": stats["entries"],
+            "bytes": stats["size"],
+            "max_bytes": stats["max_bytes"],
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "evictions": stats["evictions"],
+            "hit_rate": stats["hit_rate"],
+        }
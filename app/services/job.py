@@ -0,0 +1,312 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from typing import IO, Callable, Optional, Set
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+
+# Spawned hierarchy workers import only this module; every model must be
+# registered before the mappers are configured
+from app.models.customer import Customer  # noqa: F401
+from app.repositories.edge import EdgeRepository
+from app.repositories.job import IngestJobRepository
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.schemas.job import IngestJob, IngestJobCreate
+from app.schemas.network import (
+    NetworkBase,
+    NetworkCreate,
+    NetworkUpdate,
+    NetworkWithVersion,
+)
+from app.services.network import NetworkService
+
+logger = logging.getLogger(__name__)
+
+# Runs (db, progress) and returns the finished network
+IngestOperation = Callable[[Session, Callable[..., None]], Optional[NetworkWithVersion]]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_hierarchy_executor: Optional[ProcessPoolExecutor] = None
+_snapshot_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Process-wide worker pool shared by all ingest jobs"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.INGEST_WORKERS, thread_name_prefix="ingest"
+        )
+    return _executor
+
+
+def get_hierarchy_executor() -> ProcessPoolExecutor:
+    """
+    Process-wide worker processes that build contraction hierarchies.
+    Contraction is CPU-bound Python, so it runs outside the API process
+    where it would hold the GIL for minutes.
+    """
+    global _hierarchy_executor
+    if _hierarchy_executor is None:
+        _hierarchy_executor = ProcessPoolExecutor(
+            max_workers=settings.HIERARCHY_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _hierarchy_executor
+
+
+def get_snapshot_executor() -> ThreadPoolExecutor:
+    """
+    Process-wide worker thread that writes export snapshots, one at a time,
+    so ingests do not wait for a full export to be compressed
+    """
+    global _snapshot_executor
+    if _snapshot_executor is None:
+        _snapshot_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="snapshot"
+        )
+    return _snapshot_executor
+
+
+def build_hierarchy(network_id: int, version_number: int) -> bool:
+    """Build the contraction hierarchy of a version in a worker process"""
+    db = SessionLocal()
+    try:
+        service = NetworkService(
+            NetworkRepository(), NodeRepository(), EdgeRepository()
+        )
+        return service.build_hierarchy(
+            db=db, network_id=network_id, version_number=version_number
+        )
+    except Exception:
+        logger.exception(
+            "Contraction hierarchy of network %s version %s failed",
+            network_id,
+            version_number,
+        )
+        return False
+    finally:
+        db.close()
+
+
+# Error of the jobs whose process stopped before they finished
+ORPHANED_JOB_ERROR = "Interrupted by a restart of the API"
+
+# Ids of the jobs queued or running in this process
+_active_jobs: Set[int] = set()
+_active_jobs_lock = threading.Lock()
+
+
+def fail_orphaned_jobs(session_factory: sessionmaker = SessionLocal) -> int:
+    """
+    Mark this process's unfinished jobs as alive, and fail the pending or
+    running jobs no process has marked for JOB_STALE_AFTER seconds. Jobs
+    only run in the worker pool of the process that queued them and their
+    uploads are gone with it, so they can neither finish nor be requeued.
+    Returns how many jobs were failed.
+    """
+    with _active_jobs_lock:
+        active = list(_active_jobs)
+    repository = IngestJobRepository()
+    db = session_factory()
+    try:
+        if active:
+            repository.touch(db, ids=active)
+        count = repository.fail_unfinished(
+            db,
+            error=ORPHANED_JOB_ERROR,
+            stale_after=timedelta(seconds=settings.JOB_STALE_AFTER),
+        )
+    finally:
+        db.close()
+    if count:
+        logger.warning("Marked %s interrupted ingest jobs as failed", count)
+    return count
+
+
+def monitor_jobs(session_factory: sessionmaker, stop: threading.Event) -> None:
+    """Run fail_orphaned_jobs every JOB_HEARTBEAT_INTERVAL seconds until `stop`"""
+    while True:
+        try:
+            fail_orphaned_jobs(session_factory)
+        except Exception:
+            logger.exception("Ingest job heartbeat failed")
+        if stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+            return
+
+
+class IngestJobService:
+    def __init__(
+        self,
+        repository: IngestJobRepository,
+        network_service: NetworkService,
+        session_factory: sessionmaker = SessionLocal,
+        executor: Optional[ThreadPoolExecutor] = None,
+        hierarchy_executor: Optional[Executor] = None,
+        snapshot_executor: Optional[Executor] = None,
+    ):
+        self.repository = repository
+        self.network_service = network_service
+        self.session_factory = session_factory
+        self.executor = executor or get_executor()
+        self.hierarchy_executor = hierarchy_executor
+        self.snapshot_executor = snapshot_executor
+
+    def get(self, db: Session, id: int) -> Optional[IngestJob]:
+        return self.repository.get(db=db, id=id)
+
+    def submit_create(
+        self,
+        db: Session,
+        customer_id: int,
+        obj_in: NetworkBase,
+        stream: Optional[IO[bytes]] = None,
+    ) -> IngestJob:
+        """
+        Queue a network creation. `obj_in` is a NetworkCreate for JSON uploads,
+        or the network details of a raw `stream` upload. The job takes ownership
+        of the stream and closes it when it finishes.
+        """
+
+        def operation(job_db: Session, progress: Callable[..., None]):
+            if stream is not None:
+                return self.network_service.create_from_stream(
+                    db=job_db,
+                    obj_in=obj_in,
+                    stream=stream,
+                    customer_id=customer_id,
+                    progress=progress,
+                )
+            return self.network_service.create(
+                db=job_db, obj_in=obj_in, customer_id=customer_id, progress=progress
+            )
+
+        return self._submit(
+            db,
+            IngestJobCreate(operation="create", customer_id=customer_id),
+            operation,
+            stream,
+        )
+
+    def submit_update(
+        self,
+        db: Session,
+        customer_id: int,
+        network_id: int,
+        obj_in: NetworkUpdate,
+        stream: Optional[IO[bytes]] = None,
+    ) -> IngestJob:
+        """Queue a network update; see submit_create for the stream contract"""
+
+        def operation(job_db: Session, progress: Callable[..., None]):
+            if stream is not None:
+                return self.network_service.update_from_stream(
+                    db=job_db,
+                    network_id=network_id,
+                    obj_in=obj_in,
+                    stream=stream,
+                    progress=progress,
+                )
+            return self.network_service.update(
+                db=job_db, network_id=network_id, obj_in=obj_in, progress=progress
+            )
+
+        return self._submit(
+            db,
+            IngestJobCreate(
+                operation="update", customer_id=customer_id, network_id=network_id
+            ),
+            operation,
+            stream,
+        )
+
+    def submit_hierarchy(self, network_id: int, version_number: int) -> None:
+        """
+        Queue building the contraction hierarchy of a newly ingested version,
+        if hierarchies are enabled. Routing uses it once it is written.
+        """
+        if not settings.HIERARCHY_DIR:
+            return
+        executor = self.hierarchy_executor or get_hierarchy_executor()
+        executor.submit(build_hierarchy, network_id, version_number)
+
+    def submit_snapshot(self, network_id: int, version_number: int) -> None:
+        """
+        Queue writing the export snapshot of a newly ingested version, if
+        snapshots are enabled. Exports are streamed until it is written.
+        """
+        if not settings.SNAPSHOT_DIR:
+            return
+        executor = self.snapshot_executor or get_snapshot_executor()
+        executor.submit(self._write_snapshot, network_id, version_number)
+
+    def _write_snapshot(self, network_id: int, version_number: int) -> None:
+        db = self.session_factory()
+        try:
+            self.network_service.write_edges_snapshot(
+                db=db, network_id=network_id, version_number=version_number
+            )
+        except Exception:
+            logger.exception(
+                "Snapshot of network %s version %s failed", network_id, version_number
+            )
+        finally:
+            db.close()
+
+    def _submit(
+        self,
+        db: Session,
+        job_in: IngestJobCreate,
+        operation: IngestOperation,
+        stream: Optional[IO[bytes]],
+    ) -> IngestJob:
+        db_job = self.repository.create(db=db, obj_in=job_in)
+        job = IngestJob.model_validate(db_job)
+        with _active_jobs_lock:
+            _active_jobs.add(job.id)
+        self.executor.submit(self._run, job.id, operation, stream)
+        return job
+
+    def _run(
+        self,
+        job_id: int,
+        operation: IngestOperation,
+        stream: Optional[IO[bytes]],
+    ) -> None:
+        # Job status is written through its own session so progress is visible
+        # while the ingest transaction is still open.
+        status_db = self.session_factory()
+        job_db = self.session_factory()
+
+        def progress(**counts: int) -> None:
+            self.repository.update_progress(status_db, id=job_id, **counts)
+
+        try:
+            self.repository.mark_running(status_db, id=job_id)
+            result = operation(job_db, progress)
+            if result is None:
+                raise ValueError("Network not found")
+            self.repository.mark_succeeded(
+                status_db, id=job_id, result=result.model_dump(mode="json")
+            )
+        except Exception as exc:
+            logger.exception("Ingest job %s failed", job_id)
+            job_db.rollback()
+            status_db.rollback()
+            self.repository.mark_failed(status_db, id=job_id, error=str(exc))
+        else:
+            self.submit_hierarchy(result.id, result.version)
+            self.submit_snapshot(result.id, result.version)
+        finally:
+            with _active_jobs_lock:
+                _active_jobs.discard(job_id)
+            job_db.close()
+            status_db.close()
+            if stream is not None:
+                stream.close()
@@ -0,0 +1,140 @@
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Hashable, Optional, Sequence, Union
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.cache import LRUCache
+from app.utils.contraction import Hierarchy
+from app.utils.graph import Graph
+from app.utils.routing import distance_matrix
+
+# Searches run on the version's contraction hierarchy where one is built,
+# else on its routing graph
+Router = Union[Graph, Hierarchy]
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+# Routers of the versions a worker process has searched, by (network_id,
+# version_number): hierarchies memory-mapped from disk, and graphs as
+# received from the first task that needed them. Every worker holds its own
+# graphs, so their budget is separate from the request process's
+_hierarchies = LRUCache(max_bytes=64, sizeof=lambda _: 1)
+_graphs = LRUCache(
+    max_bytes=settings.MATRIX_WORKER_GRAPH_CACHE_MAX_BYTES,
+    sizeof=lambda graph: graph.nbytes,
+)
+
+
+def get_matrix_executor() -> Optional[ProcessPoolExecutor]:
+    """
+    Process-wide worker processes that compute distance matrices, or None
+    if MATRIX_WORKERS is below 2 and matrices are computed in the request
+    """
+    global _executor
+    if _executor is None and settings.MATRIX_WORKERS > 1:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.MATRIX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def search_rows(
+    router: Router, sources: Sequence[int], targets: Sequence[int]
+) -> np.ndarray:
+    """Distance matrix rows of `sources`"""
+    if isinstance(router, Hierarchy):
+        return router.distance_matrix(sources, targets)
+    return distance_matrix(router, sources, targets)
+
+
+def matrix_rows(
+    key: Hashable,
+    sources: Sequence[int],
+    targets: Sequence[int],
+    path: Optional[str] = None,
+    router: Optional[Router] = None,
+) -> Optional[np.ndarray]:
+    """
+    Distance matrix rows of `sources` in a worker process, searched on the
+    router sent along, else on the version's hierarchy opened from `path`
+    or its graph kept from an earlier task. Returns None if the worker has
+    neither, so the caller sends the router.
+    """
+    if router is None:
+        router = _worker_router(key, path)
+        if router is None:
+            return None
+    elif isinstance(router, Graph):
+        _graphs.put(key, router)
+    return search_rows(router, sources, targets)
+
+
+def _worker_router(key: Hashable, path: Optional[str]) -> Optional[Router]:
+    if path is None:
+        return _graphs.get(key)
+    hierarchy = _hierarchies.get(key)
+    if hierarchy is None:
+        try:
+            hierarchy = Hierarchy.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            # Pruned since the request opened it
+            return None
+        _hierarchies.put(key, hierarchy)
+    return hierarchy
+
+
+def compute_matrix(
+    router: Router,
+    sources: Sequence[int],
+    targets: Sequence[int],
+    executor: Optional[Executor] = None,
+    workers: int = 1,
+    key: Optional[Hashable] = None,
+    path: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Shortest path lengths between graph nodes, inf where a target cannot be
+    reached. Repeated nodes are searched once. With an executor and the
+    (network_id, version_number) `key` of a committed version, matrices of
+    more than MATRIX_INLINE_MAX_CELLS distinct pairs are split into one
+    block of rows per worker and searched in parallel. Tasks carry only
+    the key, node ids and the `path` of the version's hierarchy, which the
+    workers memory-map; a graph is only sent to a worker that lacks it.
+    """
+    unique_sources, source_rows = np.unique(
+        np.asarray(sources, dtype=np.int64), return_inverse=True
+    )
+    unique_targets, target_columns = np.unique(
+        np.asarray(targets, dtype=np.int64), return_inverse=True
+    )
+    source_list = unique_sources.tolist()
+    target_list = unique_targets.tolist()
+
+    blocks = 1
+    cells = len(source_list) * len(target_list)
+    if executor is not None and key is not None:
+        if cells > settings.MATRIX_INLINE_MAX_CELLS:
+            blocks = min(workers, len(source_list))
+    if blocks > 1:
+        chunks = [chunk.tolist() for chunk in np.array_split(unique_sources, blocks)]
+        futures = [
+            executor.submit(matrix_rows, key, chunk, target_list, path)
+            for chunk in chunks
+        ]
+        rows = [future.result() for future in futures]
+        retries = {
+            i: executor.submit(
+                matrix_rows, key, chunks[i], target_list, path, router=router
+            )
+            for i, block in enumerate(rows)
+            if block is None
+        }
+        for i, future in retries.items():
+            rows[i] = future.result()
+        matrix = np.vstack(rows)
+    else:
+        matrix = search_rows(router, source_list, target_list)
+    return matrix[np.ix_(source_rows.ravel(), target_columns.ravel())]
@@ -1,22 +1,92 @@
 # app/services/network.py
+import json
+import tempfile
 import uuid
+from collections import defaultdict
+from concurrent.futures import Executor
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Container,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
-from geoalchemy2.shape import from_shape, to_shape
+from geoalchemy2.shape import from_shape
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.network_version import NetworkVersion
-from app.repositories.edge import EdgeRepository
+from app.repositories.edge import EDGE_ATTRIBUTES, EdgeRepository
 from app.repositories.network import NetworkRepository
 from app.repositories.node import NodeRepository
 from app.schemas.network import (
     Network,
+    NetworkBase,
     NetworkCreate,
     NetworkUpdate,
     NetworkWithVersion,
+    VersionChanges,
+)
+from app.services.graph import GraphCache
+from app.services.matrix import compute_matrix, get_matrix_executor
+from app.utils.arrow import (
+    ATTRIBUTE_JSON_TYPES,
+    edge_schema,
+    ipc_stream,
+    property_kind,
 )
-from app.utils.geojson import extract_nodes_and_edges
+from app.utils.cache import LRUCache
+from app.utils.contraction import Hierarchy, HierarchyStore, contract
+from app.utils.geojson import (
+    BBox,
+    Waypoint,
+    edge_content_hash,
+    extract_nodes_and_edges,
+    extract_nodes_from_stream,
+    iter_edges_from_stream,
+    match_existing_nodes,
+    validate_feature_collection_stream,
+)
+from app.utils.graph import Graph
+from app.utils.http import make_etag
+from app.utils.routing import reachable, shortest_path
+from app.utils.snapshot import SNAPSHOT_ENCODINGS, SnapshotStore
+from app.utils.topojson import DEFAULT_QUANTIZATION, encode_arc, quantize_transform
+
+INGEST_MODES = ("orm", "insert", "copy")
+
+# What an isochrone returns besides the reached edge ids: nothing, their
+# reached stretches as lines, or the concave hull polygon around those
+ISOCHRONE_OUTPUTS = ("edges", "lines", "polygon")
+
+# Shared by every service instance; versions are immutable, so tiles are
+# keyed by version and never need invalidating
+TILE_CACHE = LRUCache(max_bytes=settings.TILE_CACHE_MAX_BYTES)
+
+# Routing graphs of complete versions, shared by every service instance
+GRAPH_CACHE = GraphCache(max_bytes=settings.GRAPH_CACHE_MAX_BYTES)
+
+# Compressed full-network exports, when SNAPSHOT_DIR is set
+SNAPSHOT_STORE = SnapshotStore(settings.SNAPSHOT_DIR) if settings.SNAPSHOT_DIR else None
+
+# Contraction hierarchies for fast routing, when HIERARCHY_DIR is set
+HIERARCHY_STORE = (
+    HierarchyStore(settings.HIERARCHY_DIR) if settings.HIERARCHY_DIR else None
+)
+
+# Edge properties held in memory while a TopoJSON export writes its arcs
+TOPOLOGY_SPOOL_BYTES = 8 * 1024 * 1024
+
+# Receives features_parsed, nodes_written and edges_written counts as keywords
+Progress = Callable[..., None]
 
 
 class NetworkService:
@@ -25,10 +95,25 @@ class NetworkService:
         network_repo: NetworkRepository,
         node_repo: NodeRepository,
         edge_repo: EdgeRepository,
+        ingest_mode: Optional[str] = None,
+        tile_cache: Optional[LRUCache] = None,
+        snapshots: Optional[SnapshotStore] = None,
+        graph_cache: Optional[GraphCache] = None,
+        hierarchies: Optional[HierarchyStore] = None,
+        matrix_executor: Optional[Executor] = None,
     ):
         self.network_repo = network_repo
         self.node_repo = node_repo
         self.edge_repo = edge_repo
+        self.ingest_mode = ingest_mode or settings.INGEST_MODE
+        if self.ingest_mode not in INGEST_MODES:
+            raise ValueError(f"Unknown ingest mode: {self.ingest_mode}")
+        self.tile_cache = tile_cache if tile_cache is not None else TILE_CACHE
+        self.snapshots = snapshots if snapshots is not None else SNAPSHOT_STORE
+        self.graph_cache = graph_cache if graph_cache is not None else GRAPH_CACHE
+        self.hierarchies = hierarchies if hierarchies is not None else HIERARCHY_STORE
+        # The shared worker processes are started on the first matrix
+        self.matrix_executor = matrix_executor
 
     def get(self, db: Session, id: int) -> Optional[Network]:
         return self.network_repo.get(db=db, id=id)
@@ -39,149 +124,325 @@ class NetworkService:
         )
 
     def create(
-        self, db: Session, obj_in: NetworkCreate, customer_id: int
+        self,
+        db: Session,
+        obj_in: NetworkCreate,
+        customer_id: int,
+        progress: Optional[Progress] = None,
     ) -> NetworkWithVersion:
+        nodes_data, edges_data = extract_nodes_and_edges(
+            obj_in.data, snap_tolerance=settings.SNAP_TOLERANCE
+        )
+        _report(progress, features_parsed=len(obj_in.data.get("features", [])))
+
         db_network = self.network_repo.create_with_version(
             db=db, obj_in=obj_in, customer_id=customer_id
         )
 
         version = self.network_repo.get_latest_version(db=db, network_id=db_network.id)
 
-        geojson_data = obj_in.data
-        nodes_data, edges_data = extract_nodes_and_edges(geojson_data)
+        node_count, edge_count = self._write_nodes_and_edges(
+            db=db,
+            network_id=db_network.id,
+            version_id=version.id,
+            nodes=nodes_data.items(),
+            edges=_edge_rows(edges_data),
+            valid_from=version.created_at,
+            progress=progress,
+        )
+        self.network_repo.record_counts(
+            db=db, version=version, node_count=node_count, edge_count=edge_count
+        )
+        self._commit_version(db, nodes_written=node_count, edges_written=edge_count)
 
-        node_map = {} 
-        for node_id, node_feature in nodes_data.items():
-            db_node = self.node_repo.create_from_geojson(
-                db=db,
-                network_id=db_network.id,
-                version_id=version.id,
-                feature=node_feature,
-                external_id=node_id,
-            )
-            node_map[node_id] = db_node.id
+        return self._with_version(
+            db_network, version, node_count=node_count, edge_count=edge_count
+        )
 
-        for edge_id, edge_data in edges_data.items():
-            edge_feature, source_id, target_id = edge_data
+    def create_from_stream(
+        self,
+        db: Session,
+        obj_in: NetworkBase,
+        stream: BinaryIO,
+        customer_id: int,
+        progress: Optional[Progress] = None,
+    ) -> NetworkWithVersion:
+        """
+        Create a network from a raw GeoJSON FeatureCollection stream. The
+        whole stream is parsed before anything is written, so a malformed
+        body leaves no network behind.
+        """
+        validate_feature_collection_stream(stream)
+        nodes_data, node_coordinates, feature_count = extract_nodes_from_stream(
+            stream, snap_tolerance=settings.SNAP_TOLERANCE
+        )
+        _report(progress, features_parsed=feature_count)
 
-            if source_id in node_map and target_id in node_map:
-                self.edge_repo.create_from_geojson(
-                    db=db,
-                    network_id=db_network.id,
-                    version_id=version.id,
-                    source_node_id=node_map[source_id],
-                    target_node_id=node_map[target_id],
-                    feature=edge_feature,
-                    external_id=edge_id,
-                )
+        db_network = self.network_repo.create_with_version(
+            db=db, obj_in=obj_in, customer_id=customer_id
+        )
 
-        db.commit()
+        version = self.network_repo.get_latest_version(db=db, network_id=db_network.id)
 
-        node_count = len(nodes_data)
-        edge_count = len(edges_data)
+        node_count, edge_count = self._write_nodes_and_edges(
+            db=db,
+            network_id=db_network.id,
+            version_id=version.id,
+            nodes=nodes_data.items(),
+            edges=iter_edges_from_stream(
+                stream, node_coordinates, snap_tolerance=settings.SNAP_TOLERANCE
+            ),
+            valid_from=version.created_at,
+            progress=progress,
+        )
+        self.network_repo.record_counts(
+            db=db, version=version, node_count=node_count, edge_count=edge_count
+        )
+        self._commit_version(db, nodes_written=node_count, edges_written=edge_count)
 
-        return NetworkWithVersion(
-            id=db_network.id,
-            name=db_network.name,
-            description=db_network.description,
-            customer_id=db_network.customer_id,
-            created_at=db_network.created_at,
-            updated_at=db_network.updated_at,
-            version=version.version_number,
-            node_count=node_count,
-            edge_count=edge_count,
+        return self._with_version(
+            db_network, version, node_count=node_count, edge_count=edge_count
         )
 
     def update(
-        self, db: Session, network_id: int, obj_in: NetworkUpdate
+        self,
+        db: Session,
+        network_id: int,
+        obj_in: NetworkUpdate,
+        progress: Optional[Progress] = None,
     ) -> NetworkWithVersion:
         db_network = self.network_repo.get(db=db, id=network_id)
         if not db_network:
             return None
 
-        if obj_in.name or obj_in.description:
-            update_data = obj_in.model_dump(
-                exclude={"data"}, exclude_unset=True
-            )
-            db_network = self.network_repo.update(
-                db=db, db_obj=db_network, obj_in=update_data
+        if obj_in.data:
+            nodes_data, edges_data = extract_nodes_and_edges(
+                obj_in.data, snap_tolerance=settings.SNAP_TOLERANCE
             )
+            _report(progress, features_parsed=len(obj_in.data.get("features", [])))
+
+        db_network = self._update_details(db=db, db_network=db_network, obj_in=obj_in)
 
         if not obj_in.data:
             current_version = self.network_repo.get_latest_version(
                 db=db, network_id=network_id
             )
-            node_count = len(
-                self.node_repo.get_by_network_version(
-                    db=db, network_id=network_id, version_id=current_version.id
-                )
-            )
-            edge_count = len(
-                self.edge_repo.get_by_network_version(
-                    db=db, network_id=network_id, version_id=current_version.id
-                )
+            node_count, edge_count = self._version_counts(
+                db=db, network_id=network_id, version=current_version
             )
 
-            return NetworkWithVersion(
-                id=db_network.id,
-                name=db_network.name,
-                description=db_network.description,
-                customer_id=db_network.customer_id,
-                created_at=db_network.created_at,
-                updated_at=db_network.updated_at,
-                version=current_version.version_number,
+            return self._with_version(
+                db_network,
+                current_version,
                 node_count=node_count,
                 edge_count=edge_count,
             )
 
+        new_version, node_count, edge_count, changes = self._write_new_version(
+            db=db,
+            network_id=network_id,
+            nodes_data=nodes_data,
+            edges=_edge_rows(edges_data),
+            progress=progress,
+        )
+
+        return self._with_version(
+            db_network,
+            new_version,
+            node_count=node_count,
+            edge_count=edge_count,
+            changes=changes,
+        )
+
+    def update_from_stream(
+        self,
+        db: Session,
+        network_id: int,
+        obj_in: NetworkUpdate,
+        stream: BinaryIO,
+        progress: Optional[Progress] = None,
+    ) -> NetworkWithVersion:
+        """
+        Create a new network version from a raw GeoJSON FeatureCollection
+        stream. The stream is parsed before the network's details change.
+        """
+        db_network = self.network_repo.get(db=db, id=network_id)
+        if not db_network:
+            return None
+
+        validate_feature_collection_stream(stream)
+        nodes_data, node_coordinates, feature_count = extract_nodes_from_stream(
+            stream, snap_tolerance=settings.SNAP_TOLERANCE
+        )
+        _report(progress, features_parsed=feature_count)
+
+        db_network = self._update_details(db=db, db_network=db_network, obj_in=obj_in)
+
+        new_version, node_count, edge_count, changes = self._write_new_version(
+            db=db,
+            network_id=network_id,
+            nodes_data=nodes_data,
+            edges=iter_edges_from_stream(
+                stream, node_coordinates, snap_tolerance=settings.SNAP_TOLERANCE
+            ),
+            progress=progress,
+        )
+
+        return self._with_version(
+            db_network,
+            new_version,
+            node_count=node_count,
+            edge_count=edge_count,
+            changes=changes,
+        )
+
+    def _update_details(self, db: Session, db_network, obj_in: NetworkUpdate):
+        if obj_in.name or obj_in.description:
+            update_data = obj_in.model_dump(exclude={"data"}, exclude_unset=True)
+            db_network = self.network_repo.update(
+                db=db, db_obj=db_network, obj_in=update_data
+            )
+        return db_network
+
+    def _write_new_version(
+        self,
+        db: Session,
+        network_id: int,
+        nodes_data: Dict[str, Dict],
+        edges: Iterable[Tuple[str, Dict, str, str]],
+        progress: Optional[Progress] = None,
+    ) -> Tuple[NetworkVersion, int, int, Dict[str, int]]:
+        """
+        Create the next version from the diff against the current one. Edges
+        whose geometry and properties are unchanged, and whose end nodes are
+        reused, stay valid and are shared with the new version; only added
+        and modified edges are written and only removed and modified edges
+        are retired. Nodes at the location of an existing node with the same
+        properties are reused, except for nodes no edge uses, which would not
+        be part of the version unless written again. Returns the version,
+        its node and edge counts and its change counts.
+        """
+        # Concurrent updates of the network wait here until this version is
+        # committed, then diff against it
+        self.network_repo.lock(db=db, id=network_id)
         previous_version = self.network_repo.get_latest_version(
             db=db, network_id=network_id
         )
         new_version = self.network_repo.create_new_version(db=db, network_id=network_id)
+        # Superseded versions are rarely routed on, so their graphs make room
+        self.graph_cache.invalidate(network_id)
+
+        reused_nodes = {}
+        if previous_version:
+            reused_nodes = match_existing_nodes(
+                nodes_data,
+                self.node_repo.get_locations_by_network_version(
+                    db=db, network_id=network_id, version_id=previous_version.id
+                ),
+                snap_tolerance=settings.SNAP_TOLERANCE,
+            )
 
-        geojson_data = obj_in.data
-        nodes_data, edges_data = extract_nodes_and_edges(geojson_data)
+        diff = _EdgeDiff(
+            self.edge_repo.get_current_hashes(db=db, network_id=network_id)
+        )
+        # End nodes of the version's edges; edges whose ends are not nodes
+        # would be dropped by the writer, so they are left out of the diff
+        used_nodes = set()
 
-        current_time = datetime.now(timezone.utc)
+        def valid(rows):
+            for row in rows:
+                ends = (row[2], row[3])
+                if ends[0] in nodes_data and ends[1] in nodes_data:
+                    used_nodes.update(ends)
+                    yield row
 
-        existing_edges = self.edge_repo.get_current_by_network(
-            db=db, network_id=network_id
+        nodes_written, written = self._write_nodes_and_edges(
+            db=db,
+            network_id=network_id,
+            version_id=new_version.id,
+            nodes=(
+                (node_id, feature)
+                for node_id, feature in nodes_data.items()
+                if node_id not in reused_nodes
+            ),
+            edges=diff.changed(valid(edges), reused_nodes),
+            valid_from=new_version.created_at,
+            node_ids=reused_nodes,
+            progress=progress,
         )
-        for edge in existing_edges:
-            self.edge_repo.mark_as_outdated(
-                db=db, edge_id=edge.id, timestamp=current_time
+        isolated = [node_id for node_id in reused_nodes if node_id not in used_nodes]
+        if isolated:
+            isolated_written, _ = self._write_nodes_and_edges(
+                db=db,
+                network_id=network_id,
+                version_id=new_version.id,
+                nodes=((node_id, nodes_data[node_id]) for node_id in isolated),
+                edges=(),
+                valid_from=new_version.created_at,
             )
+            nodes_written += isolated_written
+            _report(progress, nodes_written=nodes_written)
+        node_count = nodes_written + len(reused_nodes) - len(isolated)
 
-        node_map = {}
-        for node_id, node_feature in nodes_data.items():
-            db_node = self.node_repo.create_from_geojson(
+        retired_ids = diff.retired_ids()
+        if retired_ids:
+            # Nothing carried over: retire the whole network without an id list
+            self.edge_repo.retire(
                 db=db,
                 network_id=network_id,
-                version_id=new_version.id,
-                feature=node_feature,
-                external_id=node_id,
+                timestamp=new_version.created_at,
+                edge_ids=retired_ids if diff.unchanged else None,
             )
-            node_map[node_id] = db_node.id
 
-        for edge_id, edge_data in edges_data.items():
-            edge_feature, source_id, target_id = edge_data
+        changes = diff.counts()
+        edge_count = diff.unchanged + written
+        self.network_repo.record_changes(db=db, version=new_version, changes=changes)
+        self.network_repo.record_counts(
+            db=db,
+            version=new_version,
+            node_count=node_count,
+            edge_count=edge_count,
+        )
+        self._commit_version(db, nodes_written=nodes_written, edges_written=written)
+        return new_version, node_count, edge_count, changes
 
-            if source_id in node_map and target_id in node_map:
-                self.edge_repo.create_from_geojson(
-                    db=db,
-                    network_id=network_id,
-                    version_id=new_version.id,
-                    source_node_id=node_map[source_id],
-                    target_node_id=node_map[target_id],
-                    feature=edge_feature,
-                    external_id=edge_id,
-                )
+    def _version_counts(
+        self, db: Session, network_id: int, version: NetworkVersion
+    ) -> Tuple[int, int]:
+        """
+        Stored node and edge counts of a version. A version whose write has
+        not been committed yet has none stored, so it is counted instead.
+        """
+        if version.node_count is not None and version.edge_count is not None:
+            return version.node_count, version.edge_count
+        node_count = self.node_repo.count_by_network_version(
+            db=db, network_id=network_id, version_id=version.id
+        )
+        edge_count = self.edge_repo.count_by_network_version(
+            db=db, network_id=network_id, version_id=version.id
+        )
+        return node_count, edge_count
 
+    def _commit_version(
+        self, db: Session, nodes_written: int, edges_written: int
+    ) -> None:
+        db.commit()
+        # ANALYZE reads a sample of the whole table; smaller loads are left
+        # to autovacuum
+        if nodes_written >= settings.ANALYZE_MIN_ROWS:
+            self.node_repo.analyze(db)
+        if edges_written >= settings.ANALYZE_MIN_ROWS:
+            self.edge_repo.analyze(db)
         db.commit()
 
-        node_count = len(nodes_data)
-        edge_count = len(edges_data)
-
+    def _with_version(
+        self,
+        db_network,
+        version: NetworkVersion,
+        node_count: int,
+        edge_count: int,
+        changes: Optional[Dict[str, int]] = None,
+    ) -> NetworkWithVersion:
         return NetworkWithVersion(
             id=db_network.id,
             name=db_network.name,
@@ -189,10 +450,90 @@ class NetworkService:
             customer_id=db_network.customer_id,
             created_at=db_network.created_at,
             updated_at=db_network.updated_at,
-            version=new_version.version_number,
+            version=version.version_number,
             node_count=node_count,
             edge_count=edge_count,
+            changes=VersionChanges(**changes) if changes else None,
+        )
+
+    def _write_nodes_and_edges(
+        self,
+        db: Session,
+        network_id: int,
+        version_id: int,
+        nodes: Iterable[Tuple[str, Dict]],
+        edges: Iterable[Tuple[str, Dict, str, str]],
+        valid_from: datetime,
+        node_ids: Optional[Dict[str, int]] = None,
+        progress: Optional[Progress] = None,
+    ) -> Tuple[int, int]:
+        """
+        Persist (node_id, feature) and (edge_id, feature, source_id, target_id)
+        rows for a version without committing. Edges may also reference the
+        already stored nodes in `node_ids`. Returns the numbers of nodes and
+        edges written.
+        """
+        edges = _counted(edges, progress, every=settings.INGEST_BATCH_SIZE)
+        node_ids = node_ids or {}
+
+        if self.ingest_mode == "orm":
+            node_map = dict(node_ids)
+            for node_id, node_feature in nodes:
+                db_node = self.node_repo.create_from_geojson(
+                    db=db,
+                    network_id=network_id,
+                    version_id=version_id,
+                    feature=node_feature,
+                    external_id=node_id,
+                )
+                node_map[node_id] = db_node.id
+            _report(progress, nodes_written=len(node_map) - len(node_ids))
+
+            edge_count = 0
+            for edge_id, edge_feature, source_id, target_id in edges:
+                if source_id in node_map and target_id in node_map:
+                    self.edge_repo.create_from_geojson(
+                        db=db,
+                        network_id=network_id,
+                        version_id=version_id,
+                        source_node_id=node_map[source_id],
+                        target_node_id=node_map[target_id],
+                        feature=edge_feature,
+                        external_id=edge_id,
+                        valid_from=valid_from,
+                    )
+                    edge_count += 1
+
+            _report(progress, edges_written=edge_count)
+            return len(node_map) - len(node_ids), edge_count
+
+        written_nodes = self.node_repo.bulk_create_from_geojson(
+            db=db,
+            network_id=network_id,
+            version_id=version_id,
+            nodes=nodes,
+            method=self.ingest_mode,
+            batch_size=settings.INGEST_BATCH_SIZE,
+        )
+        _report(progress, nodes_written=len(written_nodes))
+        node_map = {str(node_id): db_id for node_id, db_id in node_ids.items()}
+        node_map.update(written_nodes)
+        edge_rows = (
+            (edge_id, edge_feature, node_map[str(source_id)], node_map[str(target_id)])
+            for edge_id, edge_feature, source_id, target_id in edges
+            if str(source_id) in node_map and str(target_id) in node_map
+        )
+        edge_count = self.edge_repo.bulk_create_from_geojson(
+            db=db,
+            network_id=network_id,
+            version_id=version_id,
+            edges=edge_rows,
+            valid_from=valid_from,
+            method=self.ingest_mode,
+            batch_size=settings.INGEST_BATCH_SIZE,
         )
+        _report(progress, edges_written=edge_count)
+        return len(written_nodes), edge_count
 
     def get_edges_by_version(
         self,
@@ -200,70 +541,676 @@ class NetworkService:
         network_id: int,
         version_id: Optional[int] = None,
         timestamp: Optional[datetime] = None,
-    ) -> Dict[str, Any]:
-        """Get network edges by version or timestamp"""
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        geometry: bool = True,
+        tolerance: Optional[float] = None,
+        precision: Optional[int] = None,
+        polyline: bool = False,
+    ) -> Optional[str]:
+        """Get network edges by version or timestamp as FeatureCollection JSON"""
+        chunks = self.export_edges(
+            db=db,
+            network_id=network_id,
+            version_id=version_id,
+            timestamp=timestamp,
+            bbox=bbox,
+            polygon=polygon,
+            fields=fields,
+            geometry=geometry,
+            tolerance=tolerance,
+            precision=precision,
+            polyline=polyline,
+        )
+        return "".join(chunks) if chunks is not None else None
+
+    def export_edges(
+        self,
+        db: Session,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        geometry: bool = True,
+        tolerance: Optional[float] = None,
+        precision: Optional[int] = None,
+        polyline: bool = False,
+    ) -> Optional[Iterator[str]]:
+        """
+        Streaming counterpart of get_edges_by_version: returns the same
+        FeatureCollection as an iterator of JSON text chunks, reading edges
+        through a server-side cursor. `bbox` and `polygon` (EWKT) limit the
+        edges to an area; `fields`, `geometry`, `tolerance`, `precision` and
+        `polyline` shape each feature (see edge_feature_json). Returns None if
+        the network or version does not exist.
+        """
+        read = self._resolve_export(db, network_id, version_id, timestamp)
+        if read is None:
+            return None
+        selection, header = read
+
+        features = self.edge_repo.stream_features(
+            db=db,
+            **selection,
+            bbox=bbox,
+            polygon=polygon,
+            fields=fields,
+            geometry=geometry,
+            tolerance=tolerance,
+            precision=precision,
+            polyline=polyline,
+            batch_size=settings.EXPORT_BATCH_SIZE,
+        )
+        return _feature_collection_chunks(
+            {"type": "FeatureCollection", **header},
+            features,
+            per_chunk=settings.EXPORT_BATCH_SIZE,
+        )
+
+    def export_topology(
+        self,
+        db: Session,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        tolerance: Optional[float] = None,
+        quantization: int = DEFAULT_QUANTIZATION,
+    ) -> Optional[Iterator[str]]:
+        """
+        The edges export_edges would return, as a streamed TopoJSON Topology.
+        Each edge is one arc, quantized to a `quantization` grid over the
+        extent of the selected edges and delta-encoded; the "edges" object
+        holds one LineString per arc with the edge's properties, whose
+        source_node_id and target_node_id keep the node topology. Returns None
+        if the network or version does not exist.
+        """
+        read = self._resolve_export(db, network_id, version_id, timestamp)
+        if read is None:
+            return None
+        selection, header = read
+
+        extent = self.edge_repo.get_extent(
+            db=db, **selection, bbox=bbox, polygon=polygon
+        )
+        transform = quantize_transform(extent, quantization)
+        shapes = self.edge_repo.stream_shapes(
+            db=db,
+            **selection,
+            bbox=bbox,
+            polygon=polygon,
+            fields=fields,
+            tolerance=tolerance,
+            batch_size=settings.EXPORT_BATCH_SIZE,
+        )
+        header = {
+            "type": "Topology",
+            **header,
+            "bbox": list(extent) if extent else None,
+            "transform": transform,
+        }
+        return _topology_chunks(
+            header, shapes, transform, per_chunk=settings.EXPORT_BATCH_SIZE
+        )
+
+    def export_arrow(
+        self,
+        db: Session,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        geometry: bool = True,
+        tolerance: Optional[float] = None,
+    ) -> Optional[Iterator[bytes]]:
+        """
+        The edges export_edges would return, as an Arrow IPC stream with one
+        record batch per EXPORT_BATCH_SIZE edges: the edge's own attributes,
+        its WKB geometry and a "properties.<name>" column per stored property
+        (see edge_schema). `fields` limits the columns to those names, which
+        as in export_edges read a stored property over the attribute of the
+        same name. Returns None if the network or version does not exist.
+        """
+        read = self._resolve_export(db, network_id, version_id, timestamp)
+        if read is None:
+            return None
+        selection, header = read
+
+        property_types = {}
+        if fields is None or fields:
+            property_types = self.edge_repo.get_property_types(
+                db=db, **selection, bbox=bbox, polygon=polygon, names=fields
+            )
+        if fields is None:
+            attributes = list(EDGE_ATTRIBUTES)
+            names = list(property_types)
+        else:
+            attributes = [
+                name
+                for name in fields
+                if name in EDGE_ATTRIBUTES and name not in property_types
+            ]
+            # Properties no selected edge has are still given (null) columns
+            names = [name for name in fields if name not in attributes]
+        # Edges without a shadowing property fall back to the attribute, so
+        # its values are typed along with the stored ones
+        properties = {
+            name: property_kind(
+                [*property_types.get(name, ()), ATTRIBUTE_JSON_TYPES.get(name, "null")]
+            )
+            for name in names
+        }
+
+        batches = self.edge_repo.stream_row_batches(
+            db=db,
+            **selection,
+            bbox=bbox,
+            polygon=polygon,
+            attributes=attributes,
+            geometry=geometry,
+            tolerance=tolerance,
+            properties=properties,
+            batch_size=settings.EXPORT_BATCH_SIZE,
+        )
+        metadata = {key: json.dumps(value) for key, value in header.items()}
+        return ipc_stream(
+            edge_schema(attributes, geometry, properties, metadata), batches
+        )
+
+    def get_nearest(
+        self,
+        db: Session,
+        network_id: int,
+        points: Sequence[Tuple[float, float]],
+        target: str = "edge",
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        max_distance: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Snap (lon, lat) `points` to the nearest edge or node (`target`) of a
+        version, of the version that was the latest at `timestamp`, or of the
+        latest version, with one set-based query for all points. Returns None
+        if the network or version does not exist.
+        """
         network = self.network_repo.get(db=db, id=network_id)
         if not network:
             return None
 
-        if version_id:
-            version = (
-                db.query(NetworkVersion)
-                .filter(
-                    NetworkVersion.network_id == network_id,
-                    NetworkVersion.version_number == version_id,
-                )
-                .first()
+        version = self._read_version(db, network_id, version_id, timestamp)
+        if version_id and version is None:
+            return None
+
+        matches = [None] * len(points)
+        if version is not None:
+            repo = self.edge_repo if target == "edge" else self.node_repo
+            rows = repo.get_nearest(
+                db=db,
+                network_id=network_id,
+                version_id=version.id,
+                points=points,
+                max_distance=max_distance,
             )
+            matches = [_nearest_match(row) for row in rows]
 
-            if not version:
-                return None
+        return {
+            "network_id": network_id,
+            "version": version.version_number if version else None,
+            "target": target,
+            "matches": matches,
+        }
 
-            edges = self.edge_repo.get_by_network_version(
-                db=db, network_id=network_id, version_id=version.id
+    def get_graph(
+        self,
+        db: Session,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> Optional[Graph]:
+        """
+        Routing graph of a version, of the version that was the latest at
+        `timestamp`, or of the latest version, built from the version's
+        edge and node columns. Graphs of committed versions are served from
+        the graph cache. Returns None if the network or version does not
+        exist.
+        """
+        network = self.network_repo.get(db=db, id=network_id)
+        if not network:
+            return None
+
+        version = self._read_version(db, network_id, version_id, timestamp)
+        if version is None:
+            return None
+        return self._version_graph(db, network_id, version)
+
+    def _version_graph(
+        self, db: Session, network_id: int, version: NetworkVersion
+    ) -> Graph:
+        def build() -> Graph:
+            return self._build_graph(db, network_id, version)
+
+        # As with tiles, only versions with stored counts are complete
+        if version.edge_count is None:
+            return build()
+        return self.graph_cache.get_or_build(network_id, version.version_number, build)
+
+    def _build_graph(
+        self, db: Session, network_id: int, version: NetworkVersion
+    ) -> Graph:
+        edge_ids, sources, targets, lengths = self.edge_repo.get_graph_arrays(
+            db=db, network_id=network_id, version_id=version.id
+        )
+        node_ids, lon, lat = self.node_repo.get_coordinate_arrays(
+            db=db, network_id=network_id, version_id=version.id
+        )
+        return Graph.from_arrays(
+            node_ids,
+            lon,
+            lat,
+            edge_ids,
+            sources,
+            targets,
+            lengths,
+            version=version.version_number,
+        )
+
+    def get_route(
+        self,
+        db: Session,
+        network_id: int,
+        origin: Waypoint,
+        destination: Waypoint,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Shortest path between two nodes, each given by id or by a lon/lat
+        position snapped to the nearest node, on the routing graph of a
+        version resolved as in get_graph. Uses the version's contraction
+        hierarchy where one has been built, else A* on the graph. The route
+        has no distance or geometry if the nodes are not connected. Returns
+        None if the network or version does not exist; raises ValueError
+        for a node that is not part of the version.
+        """
+        network = self.network_repo.get(db=db, id=network_id)
+        if not network:
+            return None
+
+        version = self._read_version(db, network_id, version_id, timestamp)
+        if version is None:
+            return None
+
+        graph = self._version_graph(db, network_id, version)
+        source, target = self._graph_nodes(
+            db, network_id, version, graph, [origin, destination]
+        )
+        route = {
+            "network_id": network_id,
+            "version": version.version_number,
+            "distance": None,
+            "node_ids": [],
+            "edge_ids": [],
+            "geometry": None,
+        }
+        hierarchy = self._version_hierarchy(network_id, version, graph)
+        if hierarchy is not None:
+            path = hierarchy.shortest_path(source, target)
+        else:
+            path = shortest_path(graph, source, target)
+        if path is None:
+            return route
+
+        distance, nodes, edges = path
+        node_ids = graph.node_ids[nodes].tolist()
+        edge_ids = graph.edge_ids[edges].tolist()
+        lines = self.edge_repo.get_lines(db=db, network_id=network_id, ids=edge_ids)
+        coordinates = []
+        for tail, edge_id in zip(node_ids, edge_ids):
+            source_node_id, line = lines[edge_id]
+            if tail != source_node_id:
+                line = line[::-1]
+            coordinates.extend(line[1:] if coordinates else line)
+        if not coordinates:
+            # Origin and destination are the same node
+            position = (float(graph.lon[source]), float(graph.lat[source]))
+            coordinates = [position, position]
+
+        route.update(
+            distance=distance,
+            node_ids=node_ids,
+            edge_ids=edge_ids,
+            geometry={
+                "type": "LineString",
+                "coordinates": [list(position) for position in coordinates],
+            },
+        )
+        return route
+
+    def get_matrix(
+        self,
+        db: Session,
+        network_id: int,
+        origins: Sequence[Waypoint],
+        destinations: Sequence[Waypoint],
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Shortest path lengths from every origin to every destination, located
+        as in get_route, as a float64 array with one row per origin and inf
+        where a destination cannot be reached. The searches run on the
+        version's contraction hierarchy where one has been built, in the
+        matrix worker processes if there are any. Returns None if the network
+        or version does not exist; raises ValueError for a node that is not
+        part of the version.
+        """
+        network = self.network_repo.get(db=db, id=network_id)
+        if not network:
+            return None
+
+        version = self._read_version(db, network_id, version_id, timestamp)
+        if version is None:
+            return None
+
+        graph = self._version_graph(db, network_id, version)
+        nodes = self._graph_nodes(
+            db, network_id, version, graph, [*origins, *destinations]
+        )
+        sources, targets = nodes[: len(origins)], nodes[len(origins) :]
+        hierarchy = self._version_hierarchy(network_id, version, graph)
+        distances = compute_matrix(
+            hierarchy if hierarchy is not None else graph,
+            sources,
+            targets,
+            executor=self.matrix_executor or get_matrix_executor(),
+            workers=settings.MATRIX_WORKERS,
+            # Workers keep routers by version, so only complete ones qualify
+            key=(
+                (network_id, version.version_number)
+                if version.edge_count is not None
+                else None
+            ),
+            path=(
+                self.hierarchies.path(network_id, version.version_number)
+                if hierarchy is not None
+                else None
+            ),
+        )
+        return {
+            "network_id": network_id,
+            "version": version.version_number,
+            "origin_node_ids": graph.node_ids[sources].tolist(),
+            "destination_node_ids": graph.node_ids[targets].tolist(),
+            "distances": distances,
+        }
+
+    def get_isochrone(
+        self,
+        db: Session,
+        network_id: int,
+        origin: Waypoint,
+        max_distance: float,
+        output: str = "edges",
+        concavity: float = 0.5,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        The edges within `max_distance` metres along the network of a node,
+        located as in get_route, by a Dijkstra search on the cached routing
+        graph that stops at that distance. With `output` "lines" the
+        reached stretches of the edges are returned as a MultiLineString;
+        with "polygon", their concave hull (see get_reached_geometry).
+        Returns None if the network or version does not exist; raises
+        ValueError for a node that is not part of the version.
+        """
+        if output not in ISOCHRONE_OUTPUTS:
+            raise ValueError(f"Unknown isochrone output: {output}")
+
+        network = self.network_repo.get(db=db, id=network_id)
+        if not network:
+            return None
+
+        version = self._read_version(db, network_id, version_id, timestamp)
+        if version is None:
+            return None
+
+        graph = self._version_graph(db, network_id, version)
+        (source,) = self._graph_nodes(db, network_id, version, graph, [origin])
+        _, stretches = reachable(graph, source, max_distance)
+        edge_ids = graph.edge_ids[[edge for edge, _, _ in stretches]]
+        isochrone = {
+            "network_id": network_id,
+            "version": version.version_number,
+            "node_id": int(graph.node_ids[source]),
+            "distance": max_distance,
+            "edge_ids": sorted(set(edge_ids.tolist())),
+            "geometry": None,
+        }
+        if output != "edges":
+            node_ids = graph.node_ids[[node for _, node, _ in stretches]]
+            isochrone["geometry"] = self.edge_repo.get_reached_geometry(
+                db=db,
+                network_id=network_id,
+                stretches=list(
+                    zip(
+                        edge_ids.tolist(),
+                        node_ids.tolist(),
+                        [fraction for _, _, fraction in stretches],
+                    )
+                ),
+                concavity=concavity if output == "polygon" else None,
             )
-            timestamp = version.created_at
-        elif timestamp:
-            edges = self.edge_repo.get_by_timestamp(
+        return isochrone
+
+    def build_hierarchy(
+        self, db: Session, network_id: int, version_number: int
+    ) -> bool:
+        """
+        Contract the routing graph of a committed version into a hierarchy
+        on disk, and delete the hierarchies of the network's older versions.
+        Returns False if hierarchies are disabled, or if the version does
+        not exist or is still being written.
+        """
+        if self.hierarchies is None:
+            return False
+
+        version = self.network_repo.get_version(
+            db=db, network_id=network_id, version_number=version_number
+        )
+        if version is None or version.edge_count is None:
+            return False
+
+        if not self.hierarchies.exists(network_id, version_number):
+            # Built in a hierarchy worker process, whose graph cache no
+            # request would ever read
+            graph = self._build_graph(db, network_id, version)
+            self.hierarchies.write(network_id, version_number, contract(graph))
+        self.hierarchies.prune(network_id, before=version_number)
+        return True
+
+    def _version_hierarchy(
+        self, network_id: int, version: NetworkVersion, graph: Graph
+    ) -> Optional[Hierarchy]:
+        if self.hierarchies is None or version.edge_count is None:
+            return None
+        hierarchy = self.hierarchies.get(network_id, version.version_number)
+        if hierarchy is None or hierarchy.node_count != graph.node_count:
+            return None
+        return hierarchy
+
+    def _graph_nodes(
+        self,
+        db: Session,
+        network_id: int,
+        version: NetworkVersion,
+        graph: Graph,
+        waypoints: Sequence[Waypoint],
+    ) -> List[int]:
+        """
+        Graph node indexes of waypoints. Positions are snapped to their
+        nearest node of the version with one query.
+        """
+        positions = [waypoint for waypoint in waypoints if isinstance(waypoint, tuple)]
+        snapped = iter(
+            self.node_repo.get_nearest(
+                db=db, network_id=network_id, version_id=version.id, points=positions
+            )
+            if positions
+            else ()
+        )
+        node_ids = [
+            next(snapped)[0] if isinstance(waypoint, tuple) else waypoint
+            for waypoint in waypoints
+        ]
+        indexes = graph.node_index(
+            [-1 if node_id is None else node_id for node_id in node_ids]
+        ).tolist()
+        for waypoint, index in zip(waypoints, indexes):
+            if index < 0 and isinstance(waypoint, tuple):
+                raise ValueError(f"No routable node near {waypoint[0]},{waypoint[1]}")
+            if index < 0:
+                raise ValueError(f"Node {waypoint} is not part of the network version")
+        return indexes
+
+    def _read_version(
+        self,
+        db: Session,
+        network_id: int,
+        version_id: Optional[int],
+        timestamp: Optional[datetime],
+    ) -> Optional[NetworkVersion]:
+        """
+        The version numbered `version_id`, else the one that was the latest
+        at `timestamp`, else the latest version; None if there is none
+        """
+        if version_id:
+            return self.network_repo.get_version(
+                db=db, network_id=network_id, version_number=version_id
+            )
+        if timestamp:
+            return self.network_repo.get_version_at(
                 db=db, network_id=network_id, timestamp=timestamp
             )
-        else:
-            edges = self.edge_repo.get_current_by_network(db=db, network_id=network_id)
+        return self.network_repo.get_latest_version(db=db, network_id=network_id)
+
+    def _resolve_export(
+        self,
+        db: Session,
+        network_id: int,
+        version_id: Optional[int],
+        timestamp: Optional[datetime],
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        The edge repository selection (version_id/timestamp keywords) and the
+        network_id/version/timestamp header of an export, or None if the
+        network or version does not exist
+        """
+        network = self.network_repo.get(db=db, id=network_id)
+        if not network:
+            return None
+
+        version = None
+        header_timestamp = timestamp
+        if version_id:
+            version = self.network_repo.get_version(
+                db=db, network_id=network_id, version_number=version_id
+            )
+            if not version:
+                return None
+            timestamp = header_timestamp = version.created_at
+        elif not timestamp:
             latest_version = self.network_repo.get_latest_version(
                 db=db, network_id=network_id
             )
             version_id = latest_version.version_number if latest_version else None
-            timestamp = datetime.now(datetime.timezone.utc)()
-
-        features = []
-        for edge in edges:
-            geom = to_shape(edge.geometry)
-            feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "LineString",
-                    "coordinates": [list(coord) for coord in geom.coords],
-                },
-                "properties": {
-                    "id": edge.id,
-                    "external_id": edge.external_id,
-                    "source_node_id": edge.source_node_id,
-                    "target_node_id": edge.target_node_id,
-                    "is_current": edge.is_current,
-                    "valid_from": edge.valid_from.isoformat(),
-                    "valid_to": edge.valid_to.isoformat() if edge.valid_to else None,
-                    **edge.properties,
-                },
-            }
-            features.append(feature)
+            timestamp = datetime.now(timezone.utc)
+            # Report the version's creation time, so the body of a read of
+            # the latest version is the same on every request
+            header_timestamp = (
+                latest_version.created_at if latest_version else timestamp
+            )
 
-        return {
-            "type": "FeatureCollection",
+        selection = {
+            "network_id": network_id,
+            "version_id": version.id if version else None,
+            "timestamp": None if version else timestamp,
+        }
+        header = {
             "network_id": network_id,
             "version": version_id,
-            "timestamp": timestamp.isoformat() if timestamp else None,
-            "features": features,
+            "timestamp": header_timestamp.isoformat() if header_timestamp else None,
         }
+        return selection, header
+
+    def get_edges_snapshot(
+        self,
+        db: Session,
+        network_id: int,
+        version_id: Optional[int] = None,
+        encodings: Sequence[str] = tuple(SNAPSHOT_ENCODINGS),
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Path and Content-Encoding of the compressed snapshot of export_edges
+        for a version, or for the latest version, as written by
+        write_edges_snapshot. Returns None if snapshots are disabled, none of
+        `encodings` is stored, or the version does not exist or is still
+        being written.
+        """
+        if self.snapshots is None or not encodings:
+            return None
+        latest = self.network_repo.get_latest_version(db=db, network_id=network_id)
+        if latest is None or latest.edge_count is None:
+            return None
+        version = latest
+        if version_id:
+            version = self.network_repo.get_version(
+                db=db, network_id=network_id, version_number=version_id
+            )
+        if version is None or version.edge_count is None:
+            return None
+        key = _snapshot_key(network_id, version.version_number, latest.version_number)
+        return self.snapshots.get(key, encodings)
+
+    def write_edges_snapshot(
+        self, db: Session, network_id: int, version_number: int
+    ) -> bool:
+        """
+        Compress export_edges of a newly committed latest version into a
+        snapshot, in the background after its ingest. Snapshots are keyed like
+        get_etag: a newer version changes the is_current and valid_to
+        attributes of older edges, so the network's snapshots taken before
+        this version are deleted. Returns False if snapshots are disabled,
+        or if the version is still being written or no longer the latest.
+        """
+        if self.snapshots is None:
+            return False
+        latest = self.network_repo.get_latest_version(db=db, network_id=network_id)
+        if (
+            latest is None
+            or latest.edge_count is None
+            or latest.version_number != version_number
+        ):
+            return False
+
+        key = _snapshot_key(network_id, version_number, version_number)
+        if self.snapshots.get(key, tuple(SNAPSHOT_ENCODINGS)) is None:
+            chunks = self.export_edges(
+                db=db, network_id=network_id, version_id=version_number
+            )
+            self.snapshots.write(key, chunks)
+        self.snapshots.prune(
+            f"network-{network_id}-",
+            keep=lambda name: _snapshot_latest(name) >= version_number,
+        )
+        return True
 
     def get_paginated_edges_by_version(
         self,
@@ -272,67 +1219,326 @@ class NetworkService:
         version_id: Optional[int] = None,
         cursor: Optional[str] = None,
         limit: int = 100,
-    ) -> Dict[str, Any]:
-        """Get paginated network edges by version"""
+        include_total: bool = True,
+        timestamp: Optional[datetime] = None,
+        bbox: Optional[BBox] = None,
+        polygon: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        geometry: bool = True,
+        tolerance: Optional[float] = None,
+        precision: Optional[int] = None,
+        polyline: bool = False,
+    ) -> Optional[str]:
+        """
+        Get paginated network edges by version, or at a point in time, as
+        FeatureCollection JSON, optionally limited to `bbox` or `polygon`
+        (EWKT). total_count is the version's stored edge count for whole
+        versions and is counted otherwise; it is left out (null) when
+        `include_total` is not set.
+        """
         network = self.network_repo.get(db=db, id=network_id)
         if not network:
             return None
 
+        version = None
         if version_id:
-            version = (
-                db.query(NetworkVersion)
-                .filter(
-                    NetworkVersion.network_id == network_id,
-                    NetworkVersion.version_number == version_id,
-                )
-                .first()
+            version = self.network_repo.get_version(
+                db=db, network_id=network_id, version_number=version_id
             )
 
             if not version:
                 return None
-        else:
+        elif not timestamp:
             version = self.network_repo.get_latest_version(db=db, network_id=network_id)
             version_id = version.version_number if version else None
 
-        (
-            edges,
-            next_cursor,
-            total_count,
-        ) = self.edge_repo.get_paginated_edges_by_network_version(
+        stored_total = version is not None and bbox is None and polygon is None
+        features, next_cursor, total_count = self.edge_repo.get_paginated_features(
             db=db,
             network_id=network_id,
-            version_id=version.id,
+            version_id=version.id if version else None,
+            timestamp=None if version else timestamp,
+            bbox=bbox,
+            polygon=polygon,
+            fields=fields,
+            geometry=geometry,
+            tolerance=tolerance,
+            precision=precision,
+            polyline=polyline,
             cursor=cursor,
             limit=limit,
+            count=include_total and not stored_total,
         )
+        if include_total and stored_total:
+            _, total_count = self._version_counts(
+                db=db, network_id=network_id, version=version
+            )
 
-        features = []
-        for edge in edges:
-            geom = to_shape(edge.geometry)
-            feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "LineString",
-                    "coordinates": [list(coord) for coord in geom.coords],
-                },
-                "properties": {
-                    "id": edge.id,
-                    "external_id": edge.external_id,
-                    "source_node_id": edge.source_node_id,
-                    "target_node_id": edge.target_node_id,
-                    "is_current": edge.is_current,
-                    "valid_from": edge.valid_from.isoformat(),
-                    "valid_to": edge.valid_to.isoformat() if edge.valid_to else None,
-                    **edge.properties,
-                },
-            }
-            features.append(feature)
-
-        return {
+        header = {
             "type": "FeatureCollection",
             "network_id": network_id,
             "version": version_id,
-            "features": features,
             "next_cursor": next_cursor,
             "total_count": total_count,
         }
+        if version is None and timestamp:
+            header["timestamp"] = timestamp.isoformat()
+        return "".join(
+            _feature_collection_chunks(header, features, per_chunk=max(limit, 1))
+        )
+
+    def get_etag(
+        self,
+        db: Session,
+        network_id: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+        params: Iterable[Any] = (),
+        per_version: bool = False,
+    ) -> Optional[str]:
+        """
+        Strong ETag for a read of a network's edges at a version, at a point
+        in time or of the latest version, varying with `params`.
+
+        The is_current and valid_to attributes of an older version's edges
+        change when a newer version retires them, so the ETag also covers the
+        latest version unless the response depends on the edges' geometry and
+        properties only (`per_version`). Returns None if the version does not
+        exist, or while a version is still being written.
+        """
+        latest = self.network_repo.get_latest_version(db=db, network_id=network_id)
+        if latest is None or latest.edge_count is None:
+            return None
+
+        if version_id:
+            version = self.network_repo.get_version(
+                db=db, network_id=network_id, version_number=version_id
+            )
+        elif timestamp:
+            version = self.network_repo.get_version_at(
+                db=db, network_id=network_id, timestamp=timestamp
+            )
+        else:
+            version = latest
+        if version is None or version.edge_count is None:
+            return None
+
+        return make_etag(
+            network_id,
+            version.version_number,
+            None if per_version else latest.version_number,
+            list(params),
+        )
+
+    def get_tile(
+        self,
+        db: Session,
+        network_id: int,
+        z: int,
+        x: int,
+        y: int,
+        version_id: Optional[int] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> Optional[bytes]:
+        """
+        Mapbox Vector Tile z/x/y of a version, of the version that was the
+        latest at `timestamp`, or of the latest version. Tiles of committed
+        versions never change and are served from the tile cache. Returns None
+        if the network or version does not exist.
+        """
+        network = self.network_repo.get(db=db, id=network_id)
+        if not network:
+            return None
+
+        version = self._read_version(db, network_id, version_id, timestamp)
+        if version_id and version is None:
+            return None
+        if version is None:
+            # The network had no edges yet at `timestamp`
+            return b""
+
+        def render() -> bytes:
+            return self.edge_repo.get_tile(
+                db=db,
+                network_id=network_id,
+                version_id=version.id,
+                z=z,
+                x=x,
+                y=y,
+                extent=settings.TILE_EXTENT,
+                buffer=settings.TILE_BUFFER,
+            )
+
+        # Counts are stored in the transaction that writes the version's
+        # edges, so a version without them may still be incomplete
+        if version.edge_count is None:
+            return render()
+        return self.tile_cache.get_or_create((network_id, version.id, z, x, y), render)
+
+
+def _feature_collection_chunks(
+    header: Dict[str, Any], features: Iterable[str], per_chunk: int
+) -> Iterator[str]:
+    """
+    Encode a FeatureCollection incrementally from pre-encoded Feature JSON,
+    `per_chunk` features at a time
+    """
+    yield json.dumps(header)[:-1] + ', "features": ['
+    yield from _joined(features, per_chunk)
+    yield "]}"
+
+
+def _topology_chunks(
+    header: Dict[str, Any],
+    shapes: Iterable[Tuple[str, str]],
+    transform: Dict[str, List[float]],
+    per_chunk: int,
+) -> Iterator[str]:
+    """
+    Encode a Topology incrementally from (geometry, properties) JSON text,
+    `per_chunk` edges at a time. Arcs are written as they are read, while
+    the properties wait in a temporary file (spilling to disk past
+    TOPOLOGY_SPOOL_BYTES) until the arcs are complete.
+    """
+    with tempfile.SpooledTemporaryFile(
+        max_size=TOPOLOGY_SPOOL_BYTES, mode="w+", encoding="utf-8"
+    ) as spool:
+
+        def arcs() -> Iterator[str]:
+            for geometry, properties in shapes:
+                # JSON text never holds a raw newline, so one line per edge
+                spool.write(properties + "\n")
+                arc = encode_arc(json.loads(geometry)["coordinates"], transform)
+                yield json.dumps(arc, separators=(",", ":"))
+
+        def geometries() -> Iterator[str]:
+            spool.seek(0)
+            for index, properties in enumerate(spool):
+                yield (
+                    f'{{"type":"LineString","arcs":[{index}],'
+                    f'"properties":{properties.rstrip()}}}'
+                )
+
+        yield json.dumps(header)[:-1] + ', "arcs": ['
+        yield from _joined(arcs(), per_chunk)
+        yield '], "objects": {"edges": {"type": "GeometryCollection", "geometries": ['
+        yield from _joined(geometries(), per_chunk)
+        yield "]}}}"
+
+
+def _joined(items: Iterable[str], per_chunk: int) -> Iterator[str]:
+    """Comma-join JSON text `per_chunk` items at a time"""
+    separator = ""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= per_chunk:
+            yield separator + ",".join(chunk)
+            separator = ","
+            chunk = []
+    if chunk:
+        yield separator + ",".join(chunk)
+
+
+def _nearest_match(row: Tuple) -> Optional[Dict[str, Any]]:
+    """A nearest edge or node row of the repositories as a NearestMatch"""
+    match_id, external_id, x, y, distance, *fraction = row
+    if match_id is None:
+        return None
+    return {
+        "id": match_id,
+        "external_id": external_id,
+        "location": (x, y),
+        "distance": distance,
+        "fraction": fraction[0] if fraction else None,
+    }
+
+
+def _edge_rows(edges_data: Dict[str, Tuple]) -> Iterator[Tuple[str, Dict, str, str]]:
+    for edge_id, (edge_feature, source_id, target_id) in edges_data.items():
+        yield edge_id, edge_feature, source_id, target_id
+
+
+def _report(progress: Optional[Progress], **counts: int) -> None:
+    if progress:
+        progress(**counts)
+
+
+def _counted(
+    rows: Iterable[Tuple], progress: Optional[Progress], every: int
+) -> Iterator[Tuple]:
+    """
+    Pass rows through, reporting edges_written each time a further `every`
+    rows have been handed to the writer (i.e. the previous batch is stored).
+    """
+    for count, row in enumerate(rows):
+        if progress and count and count % every == 0:
+            progress(edges_written=count)
+        yield row
+
+
+def _snapshot_key(network_id: int, version_number: int, latest_number: int) -> str:
+    return f"network-{network_id}-v{version_number}-l{latest_number}"
+
+
+def _snapshot_latest(key: str) -> int:
+    """The latest version number a snapshot key was taken at"""
+    return int(key.rpartition("-l")[2])
+
+
+class _EdgeDiff:
+    """
+    Match incoming edges against the current edges of a network by content
+    hash. Each current edge can be matched once; whatever is left unmatched
+    once the incoming edges are consumed is retired.
+    """
+
+    def __init__(self, current: Iterable[Tuple[int, str, str]]):
+        self._current_by_hash: Dict[str, List[int]] = defaultdict(list)
+        self._external_ids: Dict[int, str] = {}
+        for edge_id, external_id, content_hash in current:
+            self._current_by_hash[content_hash].append(edge_id)
+            self._external_ids[edge_id] = external_id
+        self._changed_external_ids: List[str] = []
+        self.unchanged = 0
+
+    def changed(
+        self,
+        edges: Iterable[Tuple[str, Dict, str, str]],
+        reused_nodes: Container[str] = (),
+    ) -> Iterator[Tuple[str, Dict, str, str]]:
+        """
+        Yield the incoming edges that have no identical current edge. An
+        identical edge whose end nodes are not both in `reused_nodes` is
+        changed too: the current edge still uses the replaced nodes.
+        """
+        for edge in edges:
+            edge_id, feature, source_id, target_id = edge
+            content_hash = edge_content_hash(
+                feature["geometry"]["coordinates"], feature.get("properties")
+            )
+            matches = self._current_by_hash.get(content_hash)
+            if matches and source_id in reused_nodes and target_id in reused_nodes:
+                matches.pop()
+                self.unchanged += 1
+            else:
+                self._changed_external_ids.append(str(edge_id))
+                yield edge
+
+    def retired_ids(self) -> List[int]:
+        return [edge_id for ids in self._current_by_hash.values() for edge_id in ids]
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Modified edges are changed edges whose external id was retired; the
+        rest of the changed and retired edges are added and removed.
+        """
+        retired = self.retired_ids()
+        retired_external_ids = {self._external_ids[edge_id] for edge_id in retired}
+        modified = len(retired_external_ids.intersection(self._changed_external_ids))
+        return {
+            "added": len(self._changed_external_ids) - modified,
+            "removed": len(retired) - modified,
+            "modified": modified,
+            "unchanged": self.unchanged,
+        }
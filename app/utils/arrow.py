@@ -0,0 +1,144 @@
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# End-of-stream marker of the Arrow IPC streaming format
+IPC_END_OF_STREAM = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+# Arrow types of the edge's own attributes (see EDGE_ATTRIBUTES)
+ATTRIBUTE_TYPES = {
+    "id": pa.int64(),
+    "external_id": pa.string(),
+    "source_node_id": pa.int64(),
+    "target_node_id": pa.int64(),
+    "is_current": pa.bool_(),
+    "valid_from": pa.timestamp("us", tz="UTC"),
+    "valid_to": pa.timestamp("us", tz="UTC"),
+}
+
+# JSON types of the edge's own attributes as to_jsonb writes them, which
+# stored properties of the same name are typed together with
+ATTRIBUTE_JSON_TYPES = {
+    "id": "number",
+    "external_id": "string",
+    "source_node_id": "number",
+    "target_node_id": "number",
+    "is_current": "boolean",
+    "valid_from": "string",
+    "valid_to": "string",
+}
+
+# Arrow types of stored properties by kind (see property_kind)
+PROPERTY_TYPES = {
+    "number": pa.float64(),
+    "boolean": pa.bool_(),
+    "string": pa.string(),
+    "json": pa.string(),
+}
+
+# WKB geometries in WGS84 longitude/latitude, as GeoArrow describes them
+GEOMETRY_FIELD = pa.field(
+    "geometry",
+    pa.binary(),
+    metadata={
+        "ARROW:extension:name": "geoarrow.wkb",
+        "ARROW:extension:metadata": json.dumps({"crs": "OGC:CRS84"}),
+    },
+)
+
+
+def property_kind(json_types: Sequence[str]) -> str:
+    """
+    The column kind of a property whose values have `json_types` (as named
+    by jsonb_typeof): the one scalar type they share, ignoring nulls, or
+    "json" for JSON text
+    """
+    types = set(json_types) - {"null"}
+    if len(types) == 1 and next(iter(types)) in ("number", "boolean", "string"):
+        return types.pop()
+    return "json"
+
+
+def edge_schema(
+    attributes: Sequence[str],
+    geometry: bool,
+    properties: Dict[str, str],
+    metadata: Optional[Dict[str, str]] = None,
+) -> pa.Schema:
+    """
+    Schema of rows laid out as EdgeRepository.stream_row_batches returns
+    them. Stored properties are flattened into "properties.<name>" columns.
+    """
+    fields = [pa.field(name, ATTRIBUTE_TYPES[name]) for name in attributes]
+    if geometry:
+        fields.append(GEOMETRY_FIELD)
+    for name, kind in properties.items():
+        field_metadata = (
+            {"ARROW:extension:name": "arrow.json"} if kind == "json" else None
+        )
+        fields.append(
+            pa.field(
+                f"properties.{name}", PROPERTY_TYPES[kind], metadata=field_metadata
+            )
+        )
+    return pa.schema(fields, metadata=metadata)
+
+
+def ipc_stream(schema: pa.Schema, batches: Iterable[List[Tuple]]) -> Iterator[bytes]:
+    """Encode lists of rows as an Arrow IPC stream, one record batch per list"""
+    yield schema.serialize().to_pybytes()
+    for rows in batches:
+        if not rows:
+            continue
+        columns = zip(*rows)
+        batch = pa.record_batch(
+            [
+                pa.array(column, type=field.type)
+                for column, field in zip(columns, schema)
+            ],
+            schema=schema,
+        )
+        yield batch.serialize().to_pybytes()
+    yield IPC_END_OF_STREAM
+
+
+def matrix_ipc(
+    origin_node_ids: Sequence[int],
+    destination_node_ids: Sequence[int],
+    distances: np.ndarray,
+    metadata: Optional[Dict[str, str]] = None,
+) -> bytes:
+    """
+    Encode a distance matrix as an Arrow IPC stream with one row per origin:
+    its node id and a fixed-size list of its distances, in the order of
+    the destination node ids stored in the schema metadata. Infinite
+    distances (unreachable destinations) are null.
+    """
+    values = distances.ravel()
+    schema = pa.schema(
+        [
+            pa.field("origin_node_id", pa.int64()),
+            pa.field("distances", pa.list_(pa.float64(), len(destination_node_ids))),
+        ],
+        metadata={
+            **(metadata or {}),
+            "destination_node_ids": json.dumps(list(destination_node_ids)),
+        },
+    )
+    batch = pa.record_batch(
+        [
+            pa.array(origin_node_ids, type=pa.int64()),
+            pa.FixedSizeListArray.from_arrays(
+                pa.array(values, mask=np.isinf(values)), len(destination_node_ids)
+            ),
+        ],
+        schema=schema,
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
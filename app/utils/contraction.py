@@ -0,0 +1,431 @@
+import heapq
+import math
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.cache import LRUCache
+from app.utils.graph import Graph
+from app.utils.routing import Path
+
+# Nodes a witness search may settle before it gives up and adds the
+# shortcut it was looking for a detour around
+WITNESS_SETTLE_LIMIT = 64
+
+# Arrays of a hierarchy, each stored as "<name>.npy"
+HIERARCHY_ARRAYS = (
+    "node_ids",
+    "rank",
+    "indptr",
+    "indices",
+    "weights",
+    "middle",
+    "edges",
+)
+
+# (length, middle node or -1, graph edge position or -1) of an arc
+_Arc = Tuple[float, int, int]
+
+
+class Hierarchy:
+    """
+    Contraction hierarchy of a routing graph, numbering nodes as the graph
+    does. Each node keeps only its arcs to higher-ranked nodes, in CSR form
+    like Graph: original edges, with their position in graph.edge_ids in
+    `edges`, and shortcuts, which stand for the two arcs through the lower
+    ranked node in `middle` (-1 for original edges). Arcs run both ways, so
+    a query searches upward from both ends and meets at the highest-ranked
+    node of the shortest path.
+    """
+
+    def __init__(
+        self,
+        node_ids: np.ndarray,
+        rank: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        weights: np.ndarray,
+        middle: np.ndarray,
+        edges: np.ndarray,
+    ):
+        self.node_ids = node_ids
+        self.rank = rank
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.middle = middle
+        self.edges = edges
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in HIERARCHY_ARRAYS:
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "Hierarchy":
+        """Open a saved hierarchy, memory-mapping its arrays by default"""
+        return cls(
+            **{
+                name: np.load(
+                    os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode
+                )
+                for name in HIERARCHY_ARRAYS
+            }
+        )
+
+    def shortest_path(self, source: int, target: int) -> Optional[Path]:
+        """
+        Shortest path between two graph nodes, as routing.shortest_path
+        returns it, by a bidirectional upward search. Returns None if
+        `target` cannot be reached.
+        """
+        if source == target:
+            return 0.0, [source], []
+
+        indptr, indices, weights = self.indptr, self.indices, self.weights
+        distance = ({source: 0.0}, {target: 0.0})
+        # Node -> (previous node, arc) of each search
+        previous = ({source: (-1, -1)}, {target: (-1, -1)})
+        settled = (set(), set())
+        heaps = ([(0.0, source)], [(0.0, target)])
+        best, meeting = math.inf, -1
+        while heaps[0] or heaps[1]:
+            forward = heaps[0] and (not heaps[1] or heaps[0][0] <= heaps[1][0])
+            side = 0 if forward else 1
+            d, node = heapq.heappop(heaps[side])
+            # The smaller of both searches' next distances: neither can
+            # improve on the best meeting any more
+            if d >= best:
+                break
+            if node in settled[side]:
+                continue
+            settled[side].add(node)
+            other = distance[1 - side].get(node)
+            if other is not None and d + other < best:
+                best, meeting = d + other, node
+            start, end = indptr.item(node), indptr.item(node + 1)
+            heads = indices[start:end].tolist()
+            lengths = weights[start:end].tolist()
+            # Stall on demand: a node reached more cheaply through a higher
+            # ranked neighbour is not on a shortest upward path
+            if any(
+                distance[side].get(head, math.inf) + weight < d
+                for head, weight in zip(heads, lengths)
+            ):
+                continue
+            for arc, (head, weight) in enumerate(zip(heads, lengths), start):
+                length = d + weight
+                if length < distance[side].get(head, math.inf):
+                    distance[side][head] = length
+                    previous[side][head] = (node, arc)
+                    heapq.heappush(heaps[side], (length, head))
+        if meeting < 0:
+            return None
+
+        # Arcs from the source up to the meeting node, then down to the target
+        arcs = []
+        node = meeting
+        while node != source:
+            tail, arc = previous[0][node]
+            arcs.append((tail, node, arc))
+            node = tail
+        arcs.reverse()
+        node = meeting
+        while node != target:
+            head, arc = previous[1][node]
+            arcs.append((node, head, arc))
+            node = head
+
+        nodes, edges = [source], []
+        for tail, head, arc in arcs:
+            self._unpack(tail, head, arc, nodes, edges)
+        return best, nodes, edges
+
+    def distance_matrix(
+        self, sources: Sequence[int], targets: Sequence[int]
+    ) -> np.ndarray:
+        """
+        Shortest path lengths from each source to each target, inf where a
+        target cannot be reached. Every node's upward search space is
+        searched once: the targets' spaces leave (column, length) entries in
+        buckets at the nodes they reach, which each source's upward search
+        then combines with its own lengths.
+        """
+        buckets: Dict[int, List[Tuple[int, float]]] = {}
+        for column, target in enumerate(targets):
+            for node, length in self._upward_search(target).items():
+                buckets.setdefault(node, []).append((column, length))
+
+        matrix = np.full((len(sources), len(targets)), np.inf)
+        for row, source in enumerate(sources):
+            lengths = [math.inf] * len(targets)
+            for node, length in self._upward_search(source).items():
+                for column, rest in buckets.get(node, ()):
+                    if length + rest < lengths[column]:
+                        lengths[column] = length + rest
+            matrix[row] = lengths
+        return matrix
+
+    def _upward_search(self, source: int) -> Dict[int, float]:
+        """
+        Lengths of the shortest upward paths from `source` to the nodes it
+        settles, leaving out nodes stalled as in shortest_path
+        """
+        indptr, indices, weights = self.indptr, self.indices, self.weights
+        distance = {source: 0.0}
+        settled = {}
+        heap = [(0.0, source)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > distance[node] or node in settled:
+                continue
+            start, end = indptr.item(node), indptr.item(node + 1)
+            heads = indices[start:end].tolist()
+            lengths = weights[start:end].tolist()
+            if any(
+                distance.get(head, math.inf) + weight < d
+                for head, weight in zip(heads, lengths)
+            ):
+                continue
+            settled[node] = d
+            for head, weight in zip(heads, lengths):
+                length = d + weight
+                if length < distance.get(head, math.inf):
+                    distance[head] = length
+                    heapq.heappush(heap, (length, head))
+        return settled
+
+    def _unpack(
+        self, tail: int, head: int, arc: int, nodes: List[int], edges: List[int]
+    ) -> None:
+        """Append the nodes after `tail` and the graph edges of an arc"""
+        stack = [(tail, head, arc)]
+        while stack:
+            tail, head, arc = stack.pop()
+            middle = self.middle.item(arc)
+            if middle < 0:
+                nodes.append(head)
+                edges.append(self.edges.item(arc))
+                continue
+            stack.append((middle, head, self._arc(middle, head)))
+            stack.append((tail, middle, self._arc(tail, middle)))
+
+    def _arc(self, a: int, b: int) -> int:
+        """The arc between two nodes, stored with the lower-ranked one"""
+        if self.rank.item(a) > self.rank.item(b):
+            a, b = b, a
+        start, end = self.indptr.item(a), self.indptr.item(a + 1)
+        return start + self.indices[start:end].tolist().index(b)
+
+
+def contract(graph: Graph, settle_limit: int = WITNESS_SETTLE_LIMIT) -> Hierarchy:
+    """
+    Build a contraction hierarchy by contracting nodes one at a time, the
+    node that adds the fewest shortcuts relative to its degree first (see
+    priority).
+    Contracting a node joins each pair of its remaining neighbours by a
+    shortcut unless a witness search finds a path between them at most as
+    long that avoids it. Priorities are updated lazily, when a node comes
+    up for contraction.
+    """
+    node_count = graph.node_count
+    indptr = graph.indptr.tolist()
+    indices = graph.indices.tolist()
+    weights = graph.weights.tolist()
+    arc_edges = graph.arc_edges.tolist()
+
+    # Arcs between nodes not yet contracted, the shortest of parallel ones
+    adjacency: List[Dict[int, _Arc]] = [{} for _ in range(node_count)]
+    for node in range(node_count):
+        arcs = adjacency[node]
+        for k in range(indptr[node], indptr[node + 1]):
+            head = indices[k]
+            if head != node and (head not in arcs or weights[k] < arcs[head][0]):
+                arcs[head] = (weights[k], -1, arc_edges[k])
+
+    contracted_neighbours = [0] * node_count
+    # Length of the longest chain of contracted nodes below each node
+    level = [0] * node_count
+
+    def shortcuts(node: int) -> List[Tuple[int, int, float]]:
+        neighbours = [(head, arc[0]) for head, arc in adjacency[node].items()]
+        needed = []
+        for i, (tail, tail_length) in enumerate(neighbours):
+            lengths = {
+                head: tail_length + length for head, length in neighbours[i + 1 :]
+            }
+            if not lengths:
+                continue
+            witness = _witness_search(adjacency, tail, node, lengths, settle_limit)
+            needed.extend(
+                (tail, head, length)
+                for head, length in lengths.items()
+                if witness.get(head, math.inf) > length
+            )
+        return needed
+
+    def priority(node: int, added: List) -> int:
+        # Favour nodes that thin out the graph, spread evenly over it and
+        # keep the hierarchy shallow
+        edge_difference = len(added) - len(adjacency[node])
+        return 2 * edge_difference + contracted_neighbours[node] + level[node]
+
+    heap = [(priority(node, shortcuts(node)), node) for node in range(node_count)]
+    heapq.heapify(heap)
+    rank = np.empty(node_count, dtype=np.int32)
+    upward: List[Dict[int, _Arc]] = [{} for _ in range(node_count)]
+    order = 0
+    while heap:
+        _, node = heapq.heappop(heap)
+        added = shortcuts(node)
+        current = priority(node, added)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, node))
+            continue
+
+        rank[node] = order
+        order += 1
+        # Every remaining neighbour will be ranked higher
+        upward[node] = adjacency[node]
+        adjacency[node] = {}
+        for head in upward[node]:
+            del adjacency[head][node]
+            contracted_neighbours[head] += 1
+            level[head] = max(level[head], level[node] + 1)
+        for tail, head, length in added:
+            existing = adjacency[tail].get(head)
+            if existing is None or length < existing[0]:
+                adjacency[tail][head] = (length, node, -1)
+                adjacency[head][tail] = (length, node, -1)
+
+    counts = np.fromiter((len(arcs) for arcs in upward), np.int64, node_count)
+    hierarchy_indptr = np.zeros(node_count + 1, dtype=np.int64)
+    np.cumsum(counts, out=hierarchy_indptr[1:])
+    arcs = [(head, *arc) for node_arcs in upward for head, arc in node_arcs.items()]
+    return Hierarchy(
+        node_ids=graph.node_ids.copy(),
+        rank=rank,
+        indptr=hierarchy_indptr,
+        indices=np.array([arc[0] for arc in arcs], dtype=np.int32),
+        weights=np.array([arc[1] for arc in arcs], dtype=np.float64),
+        middle=np.array([arc[2] for arc in arcs], dtype=np.int32),
+        edges=np.array([arc[3] for arc in arcs], dtype=np.int32),
+    )
+
+
+def _witness_search(
+    adjacency: List[Dict[int, _Arc]],
+    source: int,
+    excluded: int,
+    lengths: Dict[int, float],
+    settle_limit: int,
+) -> Dict[int, float]:
+    """
+    Lengths of paths from `source` that avoid `excluded`, searched until
+    every node in `lengths` is settled or further than its length, or
+    `settle_limit` nodes are settled. Any length found is a real path, so
+    a search cut short only makes shortcuts more likely.
+    """
+    max_length = max(lengths.values())
+    remaining = len(lengths)
+    distance = {source: 0.0}
+    settled = 0
+    heap = [(0.0, source)]
+    while heap and settled < settle_limit:
+        d, node = heapq.heappop(heap)
+        if d > max_length:
+            break
+        if d > distance[node]:
+            continue
+        settled += 1
+        if node in lengths:
+            remaining -= 1
+            if not remaining:
+                break
+        for head, arc in adjacency[node].items():
+            length = d + arc[0]
+            if head != excluded and length < distance.get(head, math.inf):
+                distance[head] = length
+                heapq.heappush(heap, (length, head))
+    return distance
+
+
+class HierarchyStore:
+    """
+    Contraction hierarchies on local disk, one directory of .npy arrays per
+    network version. Hierarchies are written to a temporary directory and
+    renamed, so readers never see a partial one, and opened memory-mapped.
+    Up to `max_open` opened hierarchies are kept for reuse.
+    """
+
+    def __init__(self, directory: str, max_open: int = 64):
+        self.directory = directory
+        self._open = LRUCache(max_bytes=max_open, sizeof=lambda _: 1)
+        self._lock = threading.Lock()
+
+    def path(self, network_id: int, version_number: int) -> str:
+        return os.path.join(
+            self.directory, f"network-{network_id}", f"version-{version_number}"
+        )
+
+    def exists(self, network_id: int, version_number: int) -> bool:
+        return os.path.isdir(self.path(network_id, version_number))
+
+    def get(self, network_id: int, version_number: int) -> Optional[Hierarchy]:
+        """The hierarchy of a version, or None if none has been built"""
+        key = (network_id, version_number)
+        hierarchy = self._open.get(key)
+        if hierarchy is None and self.exists(network_id, version_number):
+            try:
+                hierarchy = Hierarchy.load(self.path(network_id, version_number))
+            except FileNotFoundError:
+                # Pruned since the check
+                return None
+            self._open.put(key, hierarchy)
+        return hierarchy
+
+    def write(self, network_id: int, version_number: int, hierarchy: Hierarchy) -> None:
+        parent = os.path.join(self.directory, f"network-{network_id}")
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=parent, suffix=".tmp")
+        try:
+            hierarchy.save(tmp)
+            with self._lock:
+                target = self.path(network_id, version_number)
+                if os.path.isdir(target):
+                    shutil.rmtree(target)
+                os.replace(tmp, target)
+        finally:
+            if os.path.isdir(tmp):
+                shutil.rmtree(tmp)
+
+    def clear(self) -> None:
+        """Delete every hierarchy"""
+        with self._lock:
+            if os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    shutil.rmtree(os.path.join(self.directory, name))
+            self._open.clear()
+
+    def prune(self, network_id: int, before: int) -> int:
+        """Delete the hierarchies of a network's versions numbered below `before`"""
+        parent = os.path.join(self.directory, f"network-{network_id}")
+        removed = 0
+        if not os.path.isdir(parent):
+            return removed
+        with self._lock:
+            for name in os.listdir(parent):
+                prefix, _, number = name.partition("-")
+                if prefix == "version" and number.isdigit() and int(number) < before:
+                    shutil.rmtree(os.path.join(parent, name))
+                    removed += 1
+            self._open.invalidate(lambda key: key[0] == network_id and key[1] < before)
+        return removed
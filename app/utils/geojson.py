@@ -1,13 +1,143 @@
+import hashlib
+import json
+import math
 import uuid
-from typing import Any, Dict, List, Tuple
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import ijson
+import numpy as np
+from shapely.errors import GEOSException
+from shapely.geometry import shape
+
+WGS84_SRID = 4326
+
+# minx, miny, maxx, maxy
+BBox = Tuple[float, float, float, float]
+
+# A node id, or a lon/lat position to be snapped to the nearest node
+Waypoint = Union[int, Tuple[float, float]]
+
+
+def point_ewkt(coordinates: Sequence[float], srid: int = WGS84_SRID) -> str:
+    """Encode a GeoJSON Point coordinate pair as EWKT"""
+    return f"SRID={srid};POINT({float(coordinates[0])!r} {float(coordinates[1])!r})"
+
+
+def linestring_ewkt(
+    coordinates: Sequence[Sequence[float]], srid: int = WGS84_SRID
+) -> str:
+    """Encode GeoJSON LineString coordinates as EWKT"""
+    points = ",".join(f"{float(c[0])!r} {float(c[1])!r}" for c in coordinates)
+    return f"SRID={srid};LINESTRING({points})"
+
+
+def parse_bbox(value: str) -> BBox:
+    """Parse a "minx,miny,maxx,maxy" bounding box"""
+    parts = value.split(",")
+    if len(parts) != 4:
+        raise ValueError("Invalid bbox: expected minx,miny,maxx,maxy")
+    try:
+        minx, miny, maxx, maxy = (float(part) for part in parts)
+    except ValueError:
+        raise ValueError("Invalid bbox: coordinates must be numbers")
+    if not all(math.isfinite(c) for c in (minx, miny, maxx, maxy)):
+        raise ValueError("Invalid bbox: coordinates must be finite")
+    if minx > maxx or miny > maxy:
+        raise ValueError("Invalid bbox: min must not be greater than max")
+    return minx, miny, maxx, maxy
+
+
+def parse_waypoint(value: str) -> Waypoint:
+    """Parse a node id or a "lon,lat" position"""
+    parts = value.split(",")
+    if len(parts) == 1:
+        try:
+            return int(parts[0])
+        except ValueError:
+            raise ValueError(f"Invalid location {value!r}: expected node id or lon,lat")
+    if len(parts) != 2:
+        raise ValueError(f"Invalid location {value!r}: expected node id or lon,lat")
+    try:
+        lon, lat = (float(part) for part in parts)
+    except ValueError:
+        raise ValueError(f"Invalid location {value!r}: coordinates must be numbers")
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValueError(f"Invalid location {value!r}: not a WGS84 lon/lat pair")
+    return lon, lat
+
+
+def zoom_tolerance(zoom: int, tile_size: int = 256) -> float:
+    """
+    Simplification tolerance in degrees for drawing at a web map zoom level:
+    the width of one pixel at the equator, so removed vertices move by less
+    than a pixel on screen
+    """
+    return 360.0 / (tile_size * 2**zoom)
+
+
+def parse_fields(value: str, max_fields: int = 50) -> List[str]:
+    """Parse a comma-separated list of feature property names"""
+    fields = list(dict.fromkeys(name.strip() for name in value.split(",")))
+    if any(not name or len(name) > 100 for name in fields):
+        raise ValueError("Invalid fields: expected comma-separated property names")
+    if len(fields) > max_fields:
+        raise ValueError(f"Invalid fields: at most {max_fields} may be requested")
+    return fields
+
+
+def polygon_ewkt(value: str, srid: int = WGS84_SRID) -> str:
+    """Validate a GeoJSON Polygon or MultiPolygon geometry and encode it as EWKT"""
+    try:
+        geometry = shape(json.loads(value))
+    except (ValueError, TypeError, KeyError, AttributeError, GEOSException) as exc:
+        raise ValueError(f"Invalid polygon: {exc}") from exc
+    if geometry.geom_type not in ("Polygon", "MultiPolygon"):
+        raise ValueError("Invalid polygon: expected a Polygon or MultiPolygon")
+    if geometry.is_empty or not geometry.is_valid:
+        raise ValueError("Invalid polygon: geometry is empty or not valid")
+    return f"SRID={srid};{geometry.wkt}"
+
+
+def edge_content_hash(
+    coordinates: Sequence[Sequence[float]], properties: Optional[Dict[str, Any]]
+) -> str:
+    """
+    Hash an edge's geometry and properties. Coordinates are compared as
+    floats and property keys are sorted, so equal content hashes equally
+    whether it comes from a request body or from the database.
+    """
+    payload = json.dumps(
+        {
+            "coordinates": [[float(c[0]), float(c[1])] for c in coordinates],
+            "properties": properties or {},
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.md5(payload.encode()).hexdigest()
 
 
 def extract_nodes_and_edges(
-    geojson_data: Dict[str, Any]
+    geojson_data: Dict[str, Any],
+    snap_tolerance: Optional[float] = None,
 ) -> Tuple[Dict[str, Dict], Dict[str, Tuple]]:
     """
     Extract nodes and edges from a GeoJSON FeatureCollection.
     For LineString features (edges), identify or create nodes at start and end points.
+    Endpoints are matched exactly, or on a grid of `snap_tolerance` coordinate
+    units when given. Matching is vectorized with NumPy over all endpoints.
     Returns:
     - Dictionary of nodes: {node_id: node_feature}
     - Dictionary of edges: {edge_id: (edge_feature, source_node_id, target_node_id)}
@@ -17,53 +147,277 @@ def extract_nodes_and_edges(
 
     features = geojson_data.get("features", [])
 
-    nodes = {}
-    node_coordinates = {} 
-
+    points = []
+    lines = []
     for feature in features:
-        if feature.get("geometry", {}).get("type") == "Point":
-            node_id = feature.get("properties", {}).get("id") or str(uuid.uuid4())
-            nodes[node_id] = feature
+        geometry = feature.get("geometry", {})
+        geometry_type = geometry.get("type")
+        if geometry_type == "LineString" and len(geometry["coordinates"]) >= 2:
+            lines.append(feature)
+        elif geometry_type == "Point":
+            points.append(feature)
 
-            coords = tuple(feature["geometry"]["coordinates"])
-            node_coordinates[coords] = node_id
+    # Rows: every Point, then the start and end of each line, interleaved
+    line_coordinates = [f["geometry"]["coordinates"] for f in lines]
+    endpoint_xy = np.empty((len(lines), 2, 2), dtype=np.float64)
+    endpoint_xy[:, 0] = _xy_array([c[0] for c in line_coordinates])
+    endpoint_xy[:, 1] = _xy_array([c[-1] for c in line_coordinates])
+    point_xy = _xy_array([f["geometry"]["coordinates"] for f in points])
+    all_xy = np.concatenate([point_xy, endpoint_xy.reshape(-1, 2)])
 
-    edges = {}
-    for feature in features:
-        if feature.get("geometry", {}).get("type") == "LineString":
-            edge_id = feature.get("properties", {}).get("id") or str(uuid.uuid4())
-
-            coords = feature["geometry"]["coordinates"]
-            if len(coords) < 2:
-                continue 
-
-            start_coords = tuple(coords[0])
-            end_coords = tuple(coords[-1])
-
-            if start_coords in node_coordinates:
-                source_node_id = node_coordinates[start_coords]
-            else:
-                source_node_id = str(uuid.uuid4())
-                node_feature = {
-                    "type": "Feature",
-                    "geometry": {"type": "Point", "coordinates": list(start_coords)},
-                    "properties": {"id": source_node_id, "type": "auto_generated"},
-                }
-                nodes[source_node_id] = node_feature
-                node_coordinates[start_coords] = source_node_id
-
-            if end_coords in node_coordinates:
-                target_node_id = node_coordinates[end_coords]
-            else:
-                target_node_id = str(uuid.uuid4())
-                node_feature = {
-                    "type": "Feature",
-                    "geometry": {"type": "Point", "coordinates": list(end_coords)},
-                    "properties": {"id": target_node_id, "type": "auto_generated"},
-                }
-                nodes[target_node_id] = node_feature
-                node_coordinates[end_coords] = target_node_id
-
-            edges[edge_id] = (feature, source_node_id, target_node_id)
+    # One node per distinct key; `inverse` maps every coordinate to its node
+    first_index, inverse = _unique_rows(_node_keys(all_xy, snap_tolerance))
+
+    point_count = len(points)
+    id_prefix = uuid.uuid4().hex
+
+    # Point features own their location; the last Point at a location wins
+    owner = np.full(len(first_index), -1, dtype=np.int64)
+    np.maximum.at(owner, inverse[:point_count], np.arange(point_count))
+
+    # Ids are strings however the GeoJSON gives them, so they match the
+    # external ids read back from the database
+    point_ids = [
+        _feature_id(feature) or f"{id_prefix}-n{index}"
+        for index, feature in enumerate(points)
+    ]
+    nodes = dict(zip(point_ids, points))
+
+    node_ids = np.empty(len(first_index), dtype=object)
+    owned = owner >= 0
+    node_ids[owned] = np.array(point_ids, dtype=object)[owner[owned]]
+
+    # Remaining locations become auto-generated nodes, in order of appearance
+    auto = np.flatnonzero(~owned)
+    auto = auto[np.argsort(first_index[auto], kind="stable")]
+    auto_ids = [f"{id_prefix}-{group}" for group in auto.tolist()]
+    node_ids[auto] = auto_ids
+    for node_id, coordinates in zip(auto_ids, all_xy[first_index[auto]].tolist()):
+        nodes[node_id] = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": coordinates},
+            "properties": {"id": node_id, "type": "auto_generated"},
+        }
+
+    sources = node_ids[inverse[point_count::2]].tolist()
+    targets = node_ids[inverse[point_count + 1 :: 2]].tolist()
+    edge_ids = [
+        _feature_id(feature) or f"{id_prefix}-e{index}"
+        for index, feature in enumerate(lines)
+    ]
+
+    edges = {
+        edge_id: edge for edge_id, edge in zip(edge_ids, zip(lines, sources, targets))
+    }
 
     return nodes, edges
+
+
+def validate_feature_collection_stream(stream: BinaryIO) -> None:
+    """Check the top-level "type" of a GeoJSON document without loading it"""
+    stream.seek(0)
+    try:
+        for prefix, event, value in ijson.parse(stream):
+            if prefix == "type":
+                if event == "string" and value == "FeatureCollection":
+                    return
+                break
+    except ijson.JSONError as exc:
+        raise ValueError(f"Invalid GeoJSON data: {exc}") from exc
+    raise ValueError("Invalid GeoJSON data: Expected a FeatureCollection")
+
+
+def iter_features(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """Yield the features of a GeoJSON FeatureCollection one at a time"""
+    stream.seek(0)
+    try:
+        yield from ijson.items(stream, "features.item", use_float=True)
+    except ijson.JSONError as exc:
+        raise ValueError(f"Invalid GeoJSON data: {exc}") from exc
+
+
+def extract_nodes_from_stream(
+    stream: BinaryIO, snap_tolerance: Optional[float] = None
+) -> Tuple[Dict[str, Dict], Dict[Tuple, str], int]:
+    """
+    Streaming counterpart of the node half of extract_nodes_and_edges.
+    Reads the stream twice: once for Point features and once for LineString
+    endpoints, so only nodes are held in memory.
+    Returns:
+    - Dictionary of nodes: {node_id: node_feature}
+    - Dictionary of node coordinate keys: {(x, y): node_id}
+    - Number of features in the collection
+    """
+    nodes = {}
+    node_coordinates = {}
+    feature_count = 0
+
+    for feature in iter_features(stream):
+        _add_point_node(feature, nodes, node_coordinates, snap_tolerance)
+        feature_count += 1
+
+    for feature in iter_features(stream):
+        _resolve_edge(feature, nodes, node_coordinates, snap_tolerance)
+
+    return nodes, node_coordinates, feature_count
+
+
+def iter_edges_from_stream(
+    stream: BinaryIO,
+    node_coordinates: Dict[Tuple, str],
+    snap_tolerance: Optional[float] = None,
+) -> Iterator[Tuple[str, Dict, str, str]]:
+    """
+    Yield (edge_id, edge_feature, source_node_id, target_node_id) for every
+    LineString in the stream. Every endpoint must already be present in
+    `node_coordinates` (see extract_nodes_from_stream).
+    """
+    nodes = {}
+    for feature in iter_features(stream):
+        edge = _resolve_edge(feature, nodes, node_coordinates, snap_tolerance)
+        if edge:
+            edge_id, source_node_id, target_node_id = edge
+            yield edge_id, feature, source_node_id, target_node_id
+
+
+def match_existing_nodes(
+    nodes: Dict[str, Dict],
+    existing: Iterable[Tuple[int, float, float, Optional[Dict[str, Any]]]],
+    snap_tolerance: Optional[float] = None,
+) -> Dict[str, int]:
+    """
+    Map extracted nodes onto (id, x, y, properties) rows of stored nodes.
+    A node is reused when it sits at the same location with the same
+    properties; auto-generated nodes only need to match on location since
+    their ids are regenerated on every upload.
+    Returns {node_id: existing_id} for the nodes that matched.
+    """
+    index = {}
+    for node_id, x, y, properties in existing:
+        key = (_coordinate_key((x, y), snap_tolerance), _node_signature(properties))
+        index.setdefault(key, node_id)
+
+    matches = {}
+    for node_id, feature in nodes.items():
+        key = (
+            _coordinate_key(feature["geometry"]["coordinates"], snap_tolerance),
+            _node_signature(feature.get("properties")),
+        )
+        if key in index:
+            matches[node_id] = index[key]
+    return matches
+
+
+def _node_signature(properties: Optional[Dict[str, Any]]) -> str:
+    properties = properties or {}
+    if properties.get("type") == "auto_generated":
+        return "auto_generated"
+    return json.dumps(properties, sort_keys=True, default=str)
+
+
+def _add_point_node(
+    feature: Dict[str, Any],
+    nodes: Dict[str, Dict],
+    node_coordinates: Dict,
+    snap_tolerance: Optional[float] = None,
+) -> None:
+    if feature.get("geometry", {}).get("type") == "Point":
+        node_id = _feature_id(feature) or str(uuid.uuid4())
+        nodes[node_id] = feature
+
+        coords = feature["geometry"]["coordinates"]
+        node_coordinates[_coordinate_key(coords, snap_tolerance)] = node_id
+
+
+def _resolve_edge(
+    feature: Dict[str, Any],
+    nodes: Dict[str, Dict],
+    node_coordinates: Dict,
+    snap_tolerance: Optional[float] = None,
+) -> Optional[Tuple[str, str, str]]:
+    """
+    Return (edge_id, source_node_id, target_node_id) for a LineString feature,
+    creating nodes for endpoints that do not match a known node yet.
+    """
+    if feature.get("geometry", {}).get("type") != "LineString":
+        return None
+
+    edge_id = _feature_id(feature) or str(uuid.uuid4())
+
+    coords = feature["geometry"]["coordinates"]
+    if len(coords) < 2:
+        return None
+
+    source_node_id = _endpoint_node(coords[0], nodes, node_coordinates, snap_tolerance)
+    target_node_id = _endpoint_node(coords[-1], nodes, node_coordinates, snap_tolerance)
+    return edge_id, source_node_id, target_node_id
+
+
+def _feature_id(feature: Dict[str, Any]) -> Optional[str]:
+    """The feature's "id" property as a string, or None if it has none"""
+    feature_id = (feature.get("properties") or {}).get("id")
+    return None if feature_id is None or feature_id == "" else str(feature_id)
+
+
+def _endpoint_node(
+    coords: Sequence[float],
+    nodes: Dict[str, Dict],
+    node_coordinates: Dict,
+    snap_tolerance: Optional[float] = None,
+) -> str:
+    key = _coordinate_key(coords, snap_tolerance)
+    if key in node_coordinates:
+        return node_coordinates[key]
+
+    node_id = str(uuid.uuid4())
+    nodes[node_id] = {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": list(coords)},
+        "properties": {"id": node_id, "type": "auto_generated"},
+    }
+    node_coordinates[key] = node_id
+    return node_id
+
+
+def _coordinate_key(
+    coords: Sequence[float], snap_tolerance: Optional[float] = None
+) -> Tuple:
+    """Node matching key; rounds like the vectorized path in extract_nodes_and_edges"""
+    if snap_tolerance:
+        return (
+            round(float(coords[0]) / snap_tolerance),
+            round(float(coords[1]) / snap_tolerance),
+        )
+    return (float(coords[0]), float(coords[1]))
+
+
+def _xy_array(coordinates: List[Sequence[float]]) -> np.ndarray:
+    if not coordinates:
+        return np.empty((0, 2), dtype=np.float64)
+    try:
+        return np.array(coordinates, dtype=np.float64)[:, :2]
+    except ValueError:
+        # Mixed 2D/3D positions
+        return np.array([(c[0], c[1]) for c in coordinates], dtype=np.float64)
+
+
+def _node_keys(xy: np.ndarray, snap_tolerance: Optional[float]) -> np.ndarray:
+    """Vectorized _coordinate_key: exact coordinates or snapping grid cells"""
+    if snap_tolerance:
+        return np.round(xy / snap_tolerance).astype(np.int64)
+    # Adding 0.0 folds -0.0 into 0.0 so both compare equal byte-wise
+    return xy + 0.0
+
+
+def _unique_rows(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group identical (x, y) key rows. Returns the first row index of every
+    group and the group index of every row.
+    """
+    if not len(keys):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    # Sorting 16-byte records is much faster than np.unique(axis=0)
+    records = np.ascontiguousarray(keys).view(np.dtype((np.void, 16))).ravel()
+    _, first_index, inverse = np.unique(records, return_index=True, return_inverse=True)
+    return first_index, inverse.reshape(-1)
@@ -0,0 +1,134 @@
+from typing import Optional
+
+import numpy as np
+
+
+class Graph:
+    """
+    Compressed sparse row adjacency of a network version. Nodes are numbered
+    0..n-1 in the order of their sorted database ids; the arcs leaving node
+    i are indices[indptr[i]:indptr[i + 1]], with their lengths in metres in
+    `weights` and the position of the edge they run along in `edge_ids` in
+    `arc_edges`. Edges carry no direction, so each one is stored as an arc
+    both ways.
+    """
+
+    def __init__(
+        self,
+        node_ids: np.ndarray,
+        lon: np.ndarray,
+        lat: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        weights: np.ndarray,
+        arc_edges: np.ndarray,
+        edge_ids: np.ndarray,
+        version: Optional[int] = None,
+    ):
+        self.node_ids = node_ids
+        self.lon = lon
+        self.lat = lat
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.arc_edges = arc_edges
+        self.edge_ids = edge_ids
+        self.version = version
+
+    @classmethod
+    def from_arrays(
+        cls,
+        node_ids: np.ndarray,
+        lon: np.ndarray,
+        lat: np.ndarray,
+        edge_ids: np.ndarray,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        lengths: np.ndarray,
+        version: Optional[int] = None,
+    ) -> "Graph":
+        """
+        Build the adjacency from node (id, lon, lat) and edge (id, source
+        node id, target node id, length) columns. Raises ValueError if an
+        edge ends at a node that is not given.
+        """
+        order = np.argsort(node_ids, kind="stable")
+        node_ids = np.asarray(node_ids, dtype=np.int64)[order]
+        lon = np.asarray(lon, dtype=np.float64)[order]
+        lat = np.asarray(lat, dtype=np.float64)[order]
+        node_count = len(node_ids)
+
+        graph = cls(
+            node_ids=node_ids,
+            lon=lon,
+            lat=lat,
+            indptr=np.zeros(node_count + 1, dtype=np.int64),
+            indices=np.empty(0, dtype=np.int32),
+            weights=np.empty(0, dtype=np.float64),
+            arc_edges=np.empty(0, dtype=np.int32),
+            edge_ids=np.asarray(edge_ids, dtype=np.int64),
+            version=version,
+        )
+        source_index = graph.node_index(sources)
+        target_index = graph.node_index(targets)
+        if (source_index < 0).any() or (target_index < 0).any():
+            raise ValueError("Edge endpoint is not a node of the graph")
+
+        tails = np.concatenate([source_index, target_index])
+        heads = np.concatenate([target_index, source_index])
+        edge_count = len(graph.edge_ids)
+        arc_edges = np.tile(np.arange(edge_count, dtype=np.int32), 2)
+        weights = np.tile(np.asarray(lengths, dtype=np.float64), 2)
+
+        # Group the arcs by tail node: a node's arcs along edges it starts
+        # come first, then those along edges it ends, each in edge order
+        arc_order = np.argsort(tails, kind="stable")
+        np.cumsum(np.bincount(tails, minlength=node_count), out=graph.indptr[1:])
+        graph.indices = heads[arc_order].astype(np.int32)
+        graph.weights = weights[arc_order]
+        graph.arc_edges = arc_edges[arc_order]
+        return graph
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the graph's arrays"""
+        return sum(
+            array.nbytes
+            for array in (
+                self.node_ids,
+                self.lon,
+                self.lat,
+                self.indptr,
+                self.indices,
+                self.weights,
+                self.arc_edges,
+                self.edge_ids,
+            )
+        )
+
+    def node_index(self, node_ids) -> np.ndarray:
+        """Positions of database node ids in the graph, -1 for unknown ids"""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        if self.node_count == 0:
+            return np.full(node_ids.shape, -1, dtype=np.int64)
+        index = np.minimum(
+            np.searchsorted(self.node_ids, node_ids), self.node_count - 1
+        )
+        return np.where(self.node_ids[index] == node_ids, index, -1)
+
+    def neighbours(self, node: int):
+        """(head nodes, lengths, edge positions) of the arcs leaving `node`"""
+        start, end = self.indptr[node], self.indptr[node + 1]
+        return (
+            self.indices[start:end],
+            self.weights[start:end],
+            self.arc_edges[start:end],
+        )
@@ -0,0 +1,49 @@
+import hashlib
+import json
+from typing import Any, Iterable, List, Optional
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong entity tag derived from JSON-serializable `parts`"""
+    key = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header value matches `etag`. As RFC 9110
+    requires for If-None-Match, the comparison is weak: W/ prefixes are ignored.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def accepted_encodings(
+    accept_encoding: Optional[str], supported: Iterable[str]
+) -> List[str]:
+    """
+    The `supported` content codings (in their order of preference) that an
+    Accept-Encoding header allows, i.e. lists or matches with "*" at q > 0
+    """
+    qualities = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.strip().lower()] = quality
+    wildcard = qualities.get("*", 0.0)
+    return [coding for coding in supported if qualities.get(coding, wildcard) > 0]
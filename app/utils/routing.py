@@ -0,0 +1,194 @@
+import heapq
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.graph import Graph
+
+# Mean earth radius in metres
+EARTH_RADIUS = 6371008.8
+
+# Haversine distances on the mean sphere exceed spheroid lengths by up to
+# about 0.5%; scaled down, the A* estimate never overestimates a path
+HEURISTIC_SCALE = 0.99
+
+# Length in metres, graph node indexes from source to target and the
+# positions in graph.edge_ids of the edges between them
+Path = Tuple[float, List[int], List[int]]
+
+# Position in graph.edge_ids of a reached edge, the graph node it is
+# reached from and the fraction of its length reached, 1 for all of it
+Stretch = Tuple[int, int, float]
+
+
+def haversine(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    """Great-circle distance in metres between two lon/lat positions"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def shortest_path(graph: Graph, source: int, target: int) -> Optional[Path]:
+    """
+    Shortest path between two graph nodes by A*, guided by the straight-line
+    distance to `target`, so only nodes in the direction of the target are
+    settled. Returns None if `target` cannot be reached.
+    """
+    lon, lat = graph.lon, graph.lat
+    target_lon = math.radians(lon.item(target))
+    target_lat = math.radians(lat.item(target))
+    cos_target_lat = math.cos(target_lat)
+    scale = 2 * EARTH_RADIUS * HEURISTIC_SCALE
+
+    def estimate(node: int) -> float:
+        # haversine() to the target, with the target's terms computed once
+        node_lat = math.radians(lat.item(node))
+        a = (
+            math.sin((target_lat - node_lat) / 2) ** 2
+            + math.cos(node_lat)
+            * cos_target_lat
+            * math.sin((target_lon - math.radians(lon.item(node))) / 2) ** 2
+        )
+        return scale * math.asin(min(1.0, math.sqrt(a)))
+
+    indptr, indices, weights, arc_edges = (
+        graph.indptr,
+        graph.indices,
+        graph.weights,
+        graph.arc_edges,
+    )
+    distance = {source: 0.0}
+    # Node -> (previous node, edge position) on the best known path
+    previous = {source: (-1, -1)}
+    settled = set()
+    # Ties on the estimated total go to the node furthest along, which on
+    # grid-like networks settles far fewer nodes of equal estimate
+    heap = [(estimate(source), -0.0, source)]
+    while heap:
+        # Entries hold the negated length so far, for the tie-break above
+        _, negative_length, node = heapq.heappop(heap)
+        if node == target:
+            break
+        if node in settled:
+            continue
+        settled.add(node)
+        start, end = indptr.item(node), indptr.item(node + 1)
+        for head, weight, edge in zip(
+            indices[start:end].tolist(),
+            weights[start:end].tolist(),
+            arc_edges[start:end].tolist(),
+        ):
+            length = weight - negative_length
+            if length < distance.get(head, math.inf):
+                distance[head] = length
+                previous[head] = (node, edge)
+                heapq.heappush(heap, (length + estimate(head), -length, head))
+    else:
+        return None
+
+    nodes, edges = [target], []
+    node, edge = previous[target]
+    while node != -1:
+        nodes.append(node)
+        edges.append(edge)
+        node, edge = previous[node]
+    nodes.reverse()
+    edges.reverse()
+    return distance[target], nodes, edges
+
+
+def distance_matrix(
+    graph: Graph, sources: Sequence[int], targets: Sequence[int]
+) -> np.ndarray:
+    """
+    Shortest path lengths from each source to each target, inf where a
+    target cannot be reached. One Dijkstra search per source settles nodes
+    until every target is settled, so it serves all targets at once.
+    """
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    matrix = np.full((len(sources), len(targets)), np.inf)
+    columns: Dict[int, List[int]] = {}
+    for column, target in enumerate(targets):
+        columns.setdefault(target, []).append(column)
+
+    for row, source in enumerate(sources):
+        distance = {source: 0.0}
+        settled = set()
+        remaining = len(columns)
+        heap = [(0.0, source)]
+        while heap and remaining:
+            d, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            if node in columns:
+                matrix[row, columns[node]] = d
+                remaining -= 1
+            start, end = indptr.item(node), indptr.item(node + 1)
+            for head, weight in zip(
+                indices[start:end].tolist(), weights[start:end].tolist()
+            ):
+                length = d + weight
+                if length < distance.get(head, math.inf):
+                    distance[head] = length
+                    heapq.heappush(heap, (length, head))
+    return matrix
+
+
+def reachable(
+    graph: Graph, source: int, max_length: float
+) -> Tuple[Dict[int, float], List[Stretch]]:
+    """
+    Everything within `max_length` metres of `source`: the path lengths of
+    the nodes a Dijkstra search settles before it passes `max_length`, and
+    the edges they reach. An edge is reached in full when it can be
+    travelled end to end, or when the stretches reached from both of its
+    ends meet; else each reached end gives a partial stretch. Only the
+    reached nodes and their arcs are visited, however large the graph.
+    """
+    indptr, indices, weights, arc_edges = (
+        graph.indptr,
+        graph.indices,
+        graph.weights,
+        graph.arc_edges,
+    )
+    distance = {source: 0.0}
+    settled: Dict[int, float] = {}
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled[node] = d
+        start, end = indptr.item(node), indptr.item(node + 1)
+        for head, weight in zip(
+            indices[start:end].tolist(), weights[start:end].tolist()
+        ):
+            length = d + weight
+            if length <= max_length and length < distance.get(head, math.inf):
+                distance[head] = length
+                heapq.heappush(heap, (length, head))
+
+    # Edge position -> (node, fraction reached from it) for each reached end
+    ends: Dict[int, List[Tuple[int, float]]] = {}
+    for node, d in settled.items():
+        start, end = indptr.item(node), indptr.item(node + 1)
+        for weight, edge in zip(
+            weights[start:end].tolist(), arc_edges[start:end].tolist()
+        ):
+            left = max_length - d
+            fraction = 1.0 if weight <= left else left / weight
+            if fraction > 0:
+                ends.setdefault(edge, []).append((node, fraction))
+
+    stretches = []
+    for edge, reached in ends.items():
+        if sum(fraction for _, fraction in reached) >= 1:
+            stretches.append((edge, reached[0][0], 1.0))
+        else:
+            stretches.extend((edge, node, fraction) for node, fraction in reached)
+    return settled, stretches
@@ -0,0 +1,77 @@
+import gzip
+import os
+import tempfile
+from typing import Callable, Iterable, Optional, Sequence, Tuple
+
+import zstandard
+
+# Content-Encoding -> file suffix, in order of preference when serving
+SNAPSHOT_ENCODINGS = {"zstd": ".zst", "gzip": ".gz"}
+
+
+class SnapshotStore:
+    """
+    Pre-compressed FeatureCollections on local disk, one gzip and one zstd
+    file per key. Files are written to a temporary name and renamed, so
+    readers never see a partial snapshot.
+    """
+
+    def __init__(self, directory: str, gzip_level: int = 6, zstd_level: int = 10):
+        self.directory = directory
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    def path(self, key: str, encoding: str) -> str:
+        return os.path.join(
+            self.directory, key + ".json" + SNAPSHOT_ENCODINGS[encoding]
+        )
+
+    def get(self, key: str, encodings: Sequence[str]) -> Optional[Tuple[str, str]]:
+        """The (path, encoding) of the first of `encodings` stored for `key`"""
+        for encoding in encodings:
+            path = self.path(key, encoding)
+            if os.path.exists(path):
+                return path, encoding
+        return None
+
+    def write(self, key: str, chunks: Iterable[str]) -> None:
+        """Compress the text `chunks` into every encoding in one pass"""
+        os.makedirs(self.directory, exist_ok=True)
+        gz_fd, gz_tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        zst_fd, zst_tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(gz_fd, "wb") as gz_raw, os.fdopen(zst_fd, "wb") as zst_raw:
+                with gzip.GzipFile(
+                    fileobj=gz_raw, mode="wb", compresslevel=self.gzip_level, mtime=0
+                ) as gz, zstandard.ZstdCompressor(level=self.zstd_level).stream_writer(
+                    zst_raw, closefd=False
+                ) as zst:
+                    for chunk in chunks:
+                        data = chunk.encode("utf-8")
+                        gz.write(data)
+                        zst.write(data)
+            os.replace(gz_tmp, self.path(key, "gzip"))
+            os.replace(zst_tmp, self.path(key, "zstd"))
+        finally:
+            for tmp in (gz_tmp, zst_tmp):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def clear(self) -> int:
+        """Delete every snapshot; returns how many files were removed"""
+        return self.prune("", keep=lambda key: False)
+
+    def prune(self, prefix: str, keep: Callable[[str], bool]) -> int:
+        """
+        Delete the snapshots whose key starts with `prefix`, except those
+        whose key `keep` accepts
+        """
+        removed = 0
+        if not os.path.isdir(self.directory):
+            return removed
+        for name in os.listdir(self.directory):
+            key = name.split(".", 1)[0]
+            if key.startswith(prefix) and not keep(key) and not name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
+                removed += 1
+        return removed
@@ -0,0 +1,58 @@
+from typing import Dict, List, Optional, Sequence
+
+from app.utils.geojson import BBox
+
+# Grid size of quantized TopoJSON coordinates along each axis
+DEFAULT_QUANTIZATION = 1_000_000
+
+
+def quantize_transform(
+    bbox: Optional[BBox], quantization: int = DEFAULT_QUANTIZATION
+) -> Dict[str, List[float]]:
+    """
+    TopoJSON transform mapping `bbox` onto a grid of `quantization` x
+    `quantization` integer positions. An empty or degenerate extent gets a
+    unit scale, so every coordinate is still representable.
+    """
+    minx, miny, maxx, maxy = bbox or (0.0, 0.0, 0.0, 0.0)
+    kx = (maxx - minx) / (quantization - 1) if maxx > minx else 1.0
+    ky = (maxy - miny) / (quantization - 1) if maxy > miny else 1.0
+    return {"scale": [kx, ky], "translate": [minx, miny]}
+
+
+def encode_arc(
+    coordinates: Sequence[Sequence[float]], transform: Dict[str, List[float]]
+) -> List[List[int]]:
+    """
+    Quantize a line's coordinates with `transform` and delta-encode them:
+    the first position is absolute, each following one relative to the
+    previous. Consecutive positions that fall on the same grid point are
+    dropped, except that an arc always keeps both of its endpoints.
+    """
+    kx, ky = transform["scale"]
+    dx, dy = transform["translate"]
+    arc = []
+    x0 = y0 = 0
+    for i, position in enumerate(coordinates):
+        x = round((position[0] - dx) / kx)
+        y = round((position[1] - dy) / ky)
+        if arc and x == x0 and y == y0 and i < len(coordinates) - 1:
+            continue
+        arc.append([x - x0, y - y0])
+        x0, y0 = x, y
+    return arc
+
+
+def decode_arc(
+    arc: Sequence[Sequence[int]], transform: Dict[str, List[float]]
+) -> List[List[float]]:
+    """Inverse of encode_arc, up to the quantization error"""
+    kx, ky = transform["scale"]
+    dx, dy = transform["translate"]
+    coordinates = []
+    x = y = 0
+    for delta_x, delta_y in arc:
+        x += delta_x
+        y += delta_y
+        coordinates.append([x * kx + dx, y * ky + dy])
+    return coordinates
@@ -0,0 +1,107 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run against the database in DATABASE_URL, e.g.
+
+    docker compose exec api python -m benchmarks.ingest --edges 200000
+
+Every benchmark works under a throwaway customer that is removed, together
+with all of its networks, when the benchmark finishes.
+"""
+
+import math
+import secrets
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.customer import Customer
+
+
+def grid_feature_collection(
+    edge_count: int, origin=(11.0, 47.5), spacing: float = 0.001
+) -> Dict[str, Any]:
+    """
+    Build a square street grid with roughly `edge_count` LineString edges.
+    Each edge is a two-segment road between neighbouring grid junctions.
+    """
+    side = max(2, int(math.sqrt(edge_count / 2)) + 1)
+    x0, y0 = origin
+    features = []
+
+    def road(a, b, name):
+        mid = [(a[0] + b[0]) / 2, (a[1] + b[1]) / 2 + spacing / 10]
+        return {
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": [a, mid, b]},
+            "properties": {
+                "id": name,
+                "name": name,
+                "highway": "residential",
+                "length": spacing * 111_000,
+            },
+        }
+
+    for row in range(side):
+        for col in range(side):
+            here = [x0 + col * spacing, y0 + row * spacing]
+            if col + 1 < side:
+                right = [x0 + (col + 1) * spacing, y0 + row * spacing]
+                features.append(road(here, right, f"h-{row}-{col}"))
+            if row + 1 < side:
+                up = [x0 + col * spacing, y0 + (row + 1) * spacing]
+                features.append(road(here, up, f"v-{row}-{col}"))
+            if len(features) >= edge_count:
+                return {"type": "FeatureCollection", "features": features}
+
+    return {"type": "FeatureCollection", "features": features}
+
+
+@contextmanager
+def benchmark_customer() -> Iterator[tuple]:
+    """Yield (session, customer) and drop everything the customer created"""
+    db: Session = SessionLocal()
+    customer = Customer(name="benchmark", api_key=f"bench_{secrets.token_hex(16)}")
+    db.add(customer)
+    db.commit()
+    try:
+        yield db, customer
+    finally:
+        db.rollback()
+        params = {"customer_id": customer.id}
+        networks = "SELECT id FROM networks WHERE customer_id = :customer_id"
+        db.execute(text(f"DELETE FROM edges WHERE network_id IN ({networks})"), params)
+        db.execute(text(f"DELETE FROM nodes WHERE network_id IN ({networks})"), params)
+        db.execute(
+            text(f"DELETE FROM network_versions WHERE network_id IN ({networks})"),
+            params,
+        )
+        db.execute(
+            text("DELETE FROM networks WHERE customer_id = :customer_id"), params
+        )
+        db.execute(text("DELETE FROM customers WHERE id = :customer_id"), params)
+        db.commit()
+        db.close()
+
+
+def timed(fn: Callable[[], Any], repeat: int = 1) -> List[float]:
+    """Run `fn` `repeat` times and return the wall-clock seconds of each run"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: List[float], unit: str = "s") -> None:
+    scale = 1000.0 if unit == "ms" else 1.0
+    values = [t * scale for t in timings]
+    print(
+        f"{label:<32} median {statistics.median(values):10.2f}{unit}  "
+        f"min {min(values):10.2f}{unit}  max {max(values):10.2f}{unit}"
+    )
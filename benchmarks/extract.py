@@ -0,0 +1,54 @@
+"""Time node/edge extraction: vectorized extract_nodes_and_edges against the
+per-feature dict matching that the streaming upload path uses.
+
+    python -m benchmarks.extract --edges 1000000
+"""
+
+import argparse
+
+from app.utils.geojson import (
+    _add_point_node,
+    _resolve_edge,
+    extract_nodes_and_edges,
+)
+from benchmarks.common import grid_feature_collection, report, timed
+
+
+def extract_per_feature(geojson_data, snap_tolerance=None):
+    nodes = {}
+    node_coordinates = {}
+    features = geojson_data["features"]
+    for feature in features:
+        _add_point_node(feature, nodes, node_coordinates, snap_tolerance)
+    edges = {}
+    for feature in features:
+        edge = _resolve_edge(feature, nodes, node_coordinates, snap_tolerance)
+        if edge:
+            edge_id, source, target = edge
+            edges[edge_id] = (feature, source, target)
+    return nodes, edges
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--snap-tolerance", type=float, default=None)
+    args = parser.parse_args()
+
+    data = grid_feature_collection(args.edges)
+    print(f"Extracting {len(data['features'])} edges")
+
+    for label, extract in (
+        ("per-feature dict", extract_per_feature),
+        ("vectorized", extract_nodes_and_edges),
+    ):
+        timings = timed(
+            lambda: extract(data, snap_tolerance=args.snap_tolerance),
+            repeat=args.repeat,
+        )
+        report(label, timings)
+
+
+if __name__ == "__main__":
+    main()
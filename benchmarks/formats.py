@@ -0,0 +1,75 @@
+"""Compare the export formats of a whole network version: GeoJSON at full
+precision, GeoJSON with encoded polyline geometries, quantized TopoJSON and
+Arrow IPC, by encoding time and by size, raw and gzip-compressed.
+
+    python -m benchmarks.formats --edges 100000
+"""
+
+import argparse
+import gzip
+
+from app.repositories.edge import EdgeRepository
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.schemas.network import NetworkCreate
+from app.services.network import NetworkService
+from benchmarks.common import (
+    benchmark_customer,
+    grid_feature_collection,
+    report,
+    timed,
+)
+
+
+def _body(chunks) -> bytes:
+    return b"".join(
+        chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = grid_feature_collection(args.edges)
+    service = NetworkService(
+        network_repo=NetworkRepository(),
+        node_repo=NodeRepository(),
+        edge_repo=EdgeRepository(),
+    )
+
+    with benchmark_customer() as (db, customer):
+        network = service.create(
+            db=db,
+            obj_in=NetworkCreate(name="bench-formats", data=data),
+            customer_id=customer.id,
+        )
+        print(f"Exporting {network.edge_count} edges")
+
+        for label, export in (
+            ("geojson", lambda: service.export_edges(db=db, network_id=network.id)),
+            (
+                "geojson + encoded polylines",
+                lambda: service.export_edges(
+                    db=db, network_id=network.id, polyline=True
+                ),
+            ),
+            (
+                "topojson",
+                lambda: service.export_topology(db=db, network_id=network.id),
+            ),
+            ("arrow", lambda: service.export_arrow(db=db, network_id=network.id)),
+        ):
+            bodies = []
+            timings = timed(lambda: bodies.append(_body(export())), args.repeat)
+            report(label, timings, unit="ms")
+            print(
+                f"{'':<32} {len(bodies[0]) / 1024:10.1f} KiB, "
+                f"{len(gzip.compress(bodies[0])) / 1024:10.1f} KiB gzipped"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compare network ingest throughput across the INGEST_MODE write paths.
+
+python -m benchmarks.ingest --edges 200000 --modes copy insert orm
+"""
+
+import argparse
+
+from app.repositories.edge import EdgeRepository
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.schemas.network import NetworkCreate
+from app.services.network import INGEST_MODES, NetworkService
+from benchmarks.common import (
+    benchmark_customer,
+    grid_feature_collection,
+    report,
+    timed,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", default=list(INGEST_MODES))
+    args = parser.parse_args()
+
+    data = grid_feature_collection(args.edges)
+    print(f"Ingesting {len(data['features'])} edges per run")
+
+    with benchmark_customer() as (db, customer):
+        for mode in args.modes:
+            service = NetworkService(
+                network_repo=NetworkRepository(),
+                node_repo=NodeRepository(),
+                edge_repo=EdgeRepository(),
+                ingest_mode=mode,
+            )
+            obj_in = NetworkCreate(name=f"bench-{mode}", data=data)
+            timings = timed(
+                lambda: service.create(db=db, obj_in=obj_in, customer_id=customer.id),
+                repeat=args.repeat,
+            )
+            report(f"create ({mode})", timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Compare snapping GPS points to a network one query per point with a single
+set-based KNN query over all points.
+
+    python -m benchmarks.nearest --edges 100000 --points 5000
+"""
+
+import argparse
+import random
+
+from app.repositories.edge import EdgeRepository
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.schemas.network import NetworkCreate
+from app.services.network import NetworkService
+from benchmarks.common import (
+    benchmark_customer,
+    grid_feature_collection,
+    report,
+    timed,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=100000)
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = grid_feature_collection(args.edges)
+    edge_repo = EdgeRepository()
+    network_repo = NetworkRepository()
+    service = NetworkService(
+        network_repo=network_repo, node_repo=NodeRepository(), edge_repo=edge_repo
+    )
+    rng = random.Random(42)
+
+    with benchmark_customer() as (db, customer):
+        network = service.create(
+            db=db,
+            obj_in=NetworkCreate(name="bench-nearest", data=data),
+            customer_id=customer.id,
+        )
+        version = network_repo.get_latest_version(db=db, network_id=network.id)
+        coordinates = [
+            position
+            for feature in data["features"]
+            for position in feature["geometry"]["coordinates"]
+        ]
+        points = []
+        for _ in range(args.points):
+            x, y = rng.choice(coordinates)
+            points.append((x + rng.uniform(-1e-4, 1e-4), y + rng.uniform(-1e-4, 1e-4)))
+        print(f"Snapping {len(points)} points to {network.edge_count} edges")
+
+        def per_point():
+            for point in points:
+                edge_repo.get_nearest(
+                    db=db, network_id=network.id, version_id=version.id, points=[point]
+                )
+
+        def set_based():
+            edge_repo.get_nearest(
+                db=db, network_id=network.id, version_id=version.id, points=points
+            )
+
+        report("one query per point", timed(per_point, args.repeat), unit="ms")
+        report("one set-based query", timed(set_based, args.repeat), unit="ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Compare per-page latency of the edges endpoint's read path: ORM rows decoded
+with shapely and re-encoded in Python, against Feature JSON built by PostGIS
+and passed through as text. Then compare full-precision pages with pages
+simplified and quantized for an overview map.
+
+    python -m benchmarks.read --edges 100000 --limit 1000
+"""
+
+import argparse
+import json
+
+from geoalchemy2.shape import to_shape
+
+from app.repositories.edge import EdgeRepository
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.schemas.network import NetworkCreate
+from app.services.network import NetworkService
+from app.utils.geojson import zoom_tolerance
+from benchmarks.common import (
+    benchmark_customer,
+    grid_feature_collection,
+    report,
+    timed,
+)
+
+
+def shapely_page(db, edge_repo, network_id, version_id, cursor, limit):
+    edges, next_cursor, total_count = edge_repo.get_paginated_edges_by_network_version(
+        db=db, network_id=network_id, version_id=version_id, cursor=cursor, limit=limit
+    )
+    features = []
+    for edge in edges:
+        geom = to_shape(edge.geometry)
+        features.append(
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [list(coord) for coord in geom.coords],
+                },
+                "properties": {
+                    "id": edge.id,
+                    "external_id": edge.external_id,
+                    "source_node_id": edge.source_node_id,
+                    "target_node_id": edge.target_node_id,
+                    "is_current": edge.is_current,
+                    "valid_from": edge.valid_from.isoformat(),
+                    "valid_to": edge.valid_to.isoformat() if edge.valid_to else None,
+                    **edge.properties,
+                },
+            }
+        )
+    body = json.dumps(
+        {
+            "type": "FeatureCollection",
+            "features": features,
+            "next_cursor": next_cursor,
+            "total_count": total_count,
+        }
+    )
+    return body, next_cursor
+
+
+def postgis_page(db, edge_repo, network_id, version_id, cursor, limit, **options):
+    features, next_cursor, total_count = edge_repo.get_paginated_features(
+        db=db,
+        network_id=network_id,
+        version_id=version_id,
+        cursor=cursor,
+        limit=limit,
+        **options,
+    )
+    body = (
+        '{"type": "FeatureCollection", "features": ['
+        + ",".join(features)
+        + f'], "next_cursor": {json.dumps(next_cursor)}, "total_count": {total_count}}}'
+    )
+    return body, next_cursor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--zoom", type=int, default=8)
+    parser.add_argument("--precision", type=int, default=5)
+    args = parser.parse_args()
+
+    data = grid_feature_collection(args.edges)
+    edge_repo = EdgeRepository()
+    network_repo = NetworkRepository()
+    service = NetworkService(
+        network_repo=network_repo, node_repo=NodeRepository(), edge_repo=edge_repo
+    )
+
+    with benchmark_customer() as (db, customer):
+        network = service.create(
+            db=db,
+            obj_in=NetworkCreate(name="bench-read", data=data),
+            customer_id=customer.id,
+        )
+        version = network_repo.get_latest_version(db=db, network_id=network.id)
+        print(
+            f"Reading {args.pages} pages of {args.limit} from {network.edge_count} edges"
+        )
+
+        for label, read_page in (
+            ("shapely + json.dumps", shapely_page),
+            ("PostGIS json_build_object", postgis_page),
+        ):
+            timings = []
+            pages = [(None, None)]
+            for _ in range(args.pages):
+                cursor = pages[-1][1]
+                timings += timed(
+                    lambda: pages.append(
+                        read_page(
+                            db, edge_repo, network.id, version.id, cursor, args.limit
+                        )
+                    )
+                )
+                db.expunge_all()
+                if pages[-1][1] is None:
+                    break
+            report(label, timings, unit="ms")
+
+        print(f"Payload per page at zoom {args.zoom} with {args.precision} decimals")
+        for label, options in (
+            ("full precision", {}),
+            (
+                "simplified + quantized",
+                {"tolerance": zoom_tolerance(args.zoom), "precision": args.precision},
+            ),
+        ):
+            timings = []
+            pages = []
+            for _ in range(args.pages):
+                cursor = pages[-1][1] if pages else None
+                timings += timed(
+                    lambda: pages.append(
+                        postgis_page(
+                            db,
+                            edge_repo,
+                            network.id,
+                            version.id,
+                            cursor,
+                            args.limit,
+                            **options,
+                        )
+                    )
+                )
+                if pages[-1][1] is None:
+                    break
+            size = sum(len(body) for body, _ in pages) / len(pages)
+            report(label, timings, unit="ms")
+            print(f"{'':<32} {size / 1024:10.1f} KiB per page")
+
+
+if __name__ == "__main__":
+    main()
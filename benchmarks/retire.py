@@ -0,0 +1,84 @@
+"""Compare retiring the current edges of a network row by row (load every edge,
+then mark_as_outdated each one) with the single-statement EdgeRepository.retire,
+and time a full-replacement network update end to end.
+
+    python -m benchmarks.retire --edges 100000
+"""
+
+import argparse
+from datetime import datetime, timezone
+
+from app.repositories.edge import EdgeRepository
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.schemas.network import NetworkCreate, NetworkUpdate
+from app.services.network import NetworkService
+from benchmarks.common import (
+    benchmark_customer,
+    grid_feature_collection,
+    report,
+    timed,
+)
+
+
+def retire_per_row(db, edge_repo: EdgeRepository, network_id: int) -> None:
+    timestamp = datetime.now(timezone.utc)
+    for edge in edge_repo.get_current_by_network(db=db, network_id=network_id):
+        edge_repo.mark_as_outdated(db=db, edge_id=edge.id, timestamp=timestamp)
+
+
+def retire_set_based(db, edge_repo: EdgeRepository, network_id: int) -> None:
+    edge_repo.retire(db=db, network_id=network_id, timestamp=datetime.now(timezone.utc))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = grid_feature_collection(args.edges)
+    edge_repo = EdgeRepository()
+    service = NetworkService(
+        network_repo=NetworkRepository(),
+        node_repo=NodeRepository(),
+        edge_repo=edge_repo,
+    )
+
+    with benchmark_customer() as (db, customer):
+        network = service.create(
+            db=db,
+            obj_in=NetworkCreate(name="bench-retire", data=data),
+            customer_id=customer.id,
+        )
+        print(f"Retiring {network.edge_count} current edges")
+
+        for label, retire in (
+            ("per-row mark_as_outdated", retire_per_row),
+            ("set-based retire", retire_set_based),
+        ):
+
+            def run():
+                retire(db, edge_repo, network.id)
+                db.flush()
+
+            # Each run is rolled back so every strategy retires the same edges
+            timings = []
+            for _ in range(args.repeat):
+                timings += timed(run)
+                db.rollback()
+            report(label, timings, unit="ms")
+
+        # Every edge changes, so the update retires the whole network
+        for feature in data["features"]:
+            feature["properties"]["highway"] = "primary"
+        timings = timed(
+            lambda: service.update(
+                db=db, network_id=network.id, obj_in=NetworkUpdate(data=data)
+            )
+        )
+        report("update (all edges modified)", timings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Time shortest-path queries between random nodes of a network version:
+building the routing graph once, then routing on the cached graph with A*
+and on its contraction hierarchy, and computing a distance matrix.
+
+    python -m benchmarks.routing --edges 1000000 --routes 200
+"""
+
+import argparse
+import random
+
+from app.repositories.edge import EdgeRepository
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.schemas.network import NetworkCreate
+from app.services.graph import GraphCache
+from app.services.network import NetworkService
+from app.utils.contraction import contract
+from app.utils.routing import shortest_path
+from benchmarks.common import (
+    benchmark_customer,
+    grid_feature_collection,
+    report,
+    timed,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=100000)
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--matrix", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = grid_feature_collection(args.edges)
+    cache = GraphCache(max_bytes=1024 * 1024 * 1024)
+    service = NetworkService(
+        network_repo=NetworkRepository(),
+        node_repo=NodeRepository(),
+        edge_repo=EdgeRepository(),
+        graph_cache=cache,
+    )
+    rng = random.Random(42)
+
+    with benchmark_customer() as (db, customer):
+        network = service.create(
+            db=db,
+            obj_in=NetworkCreate(name="bench-routing", data=data),
+            customer_id=customer.id,
+        )
+
+        def build():
+            cache.clear()
+            service.get_graph(db=db, network_id=network.id)
+
+        report("build graph", timed(build, args.repeat), unit="ms")
+        graph = service.get_graph(db=db, network_id=network.id)
+        print(
+            f"{graph.node_count} nodes, {graph.edge_count} edges, "
+            f"{graph.nbytes / 1024 / 1024:.1f} MiB"
+        )
+
+        pairs = [
+            (rng.randrange(graph.node_count), rng.randrange(graph.node_count))
+            for _ in range(args.routes)
+        ]
+        timings = timed(
+            lambda: [shortest_path(graph, a, b) for a, b in pairs], args.repeat
+        )
+        report("route (A*)", [t / len(pairs) for t in timings], unit="ms")
+
+        report("contract", timed(lambda: contract(graph), 1), unit="ms")
+        hierarchy = contract(graph)
+        timings = timed(
+            lambda: [hierarchy.shortest_path(a, b) for a, b in pairs], args.repeat
+        )
+        report("route (hierarchy)", [t / len(pairs) for t in timings], unit="ms")
+
+        node_ids = graph.node_ids[[a for a, _ in pairs[:20]]].tolist()
+        routes = timed(
+            lambda: [
+                service.get_route(db=db, network_id=network.id, origin=a, destination=b)
+                for a, b in zip(node_ids, reversed(node_ids))
+            ],
+            args.repeat,
+        )
+        report("route with geometry", [t / 20 for t in routes], unit="ms")
+
+        locations = rng.sample(graph.node_ids.tolist(), args.matrix)
+        matrices = timed(
+            lambda: service.get_matrix(
+                db=db, network_id=network.id, origins=locations, destinations=locations
+            ),
+            args.repeat,
+        )
+        report(f"{args.matrix}x{args.matrix} matrix", matrices, unit="ms")
+        print(cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Compare point-in-time edge reads written as separate valid_from/valid_to
+comparisons with the tstzrange containment that ix_edges_network_validity
+serves, across several networks with many versions each.
+
+    python -m benchmarks.timetravel --networks 20 --versions 10 --edges 5000
+"""
+
+import argparse
+import random
+
+from sqlalchemy import func, or_
+
+from app.models.edge import Edge
+from app.repositories.edge import EdgeRepository, valid_at
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.schemas.network import NetworkCreate, NetworkUpdate
+from app.services.network import NetworkService
+from benchmarks.common import (
+    benchmark_customer,
+    grid_feature_collection,
+    report,
+    timed,
+)
+
+
+def count_by_comparisons(db, network_id, timestamp) -> int:
+    return (
+        db.query(func.count(Edge.id))
+        .filter(
+            Edge.network_id == network_id,
+            Edge.valid_from <= timestamp,
+            or_(Edge.valid_to > timestamp, Edge.valid_to.is_(None)),
+        )
+        .scalar()
+    )
+
+
+def count_by_range(db, network_id, timestamp) -> int:
+    return (
+        db.query(func.count(Edge.id))
+        .filter(Edge.network_id == network_id, valid_at(timestamp))
+        .scalar()
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--networks", type=int, default=20)
+    parser.add_argument("--versions", type=int, default=10)
+    parser.add_argument("--edges", type=int, default=5000)
+    parser.add_argument("--changed", type=float, default=0.1)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    network_repo = NetworkRepository()
+    service = NetworkService(
+        network_repo=network_repo,
+        node_repo=NodeRepository(),
+        edge_repo=EdgeRepository(),
+    )
+    rng = random.Random(42)
+
+    with benchmark_customer() as (db, customer):
+        # Each version changes a share of the edges, retiring their old rows
+        points = []
+        for n in range(args.networks):
+            data = grid_feature_collection(args.edges, origin=(11.0 + n, 47.5))
+            network = service.create(
+                db=db,
+                obj_in=NetworkCreate(name=f"bench-timetravel-{n}", data=data),
+                customer_id=customer.id,
+            )
+            for version in range(2, args.versions + 1):
+                changed = rng.sample(
+                    data["features"], int(len(data["features"]) * args.changed)
+                )
+                for feature in changed:
+                    feature["properties"]["revision"] = version
+                service.update(
+                    db=db, network_id=network.id, obj_in=NetworkUpdate(data=data)
+                )
+            for version in range(1, args.versions + 1):
+                created_at = network_repo.get_version(
+                    db=db, network_id=network.id, version_number=version
+                ).created_at
+                points.append((network.id, created_at))
+
+        total = db.query(func.count(Edge.id)).scalar()
+        print(
+            f"Reading {args.queries} points in time from {args.networks} networks "
+            f"x {args.versions} versions ({total} edge rows in the table)"
+        )
+        queries = [rng.choice(points) for _ in range(args.queries)]
+        for label, count in (
+            ("valid_from/valid_to comparisons", count_by_comparisons),
+            ("tstzrange @> (GiST)", count_by_range),
+        ):
+            timings = []
+            for network_id, timestamp in queries:
+                timings += timed(lambda: count(db, network_id, timestamp))
+            report(label, timings, unit="ms")
+
+
+if __name__ == "__main__":
+    main()
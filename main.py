@@ -1,16 +1,38 @@
 import os
+import threading
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.endpoints import customers, networks
+from app.api.endpoints import customers, jobs, networks
 from app.core.config import settings
+from app.db.session import get_session_factory
+from app.services.job import monitor_jobs
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keeps this process's ingest jobs alive and fails those of stopped ones
+    session_factory = app.dependency_overrides.get(
+        get_session_factory, get_session_factory
+    )()
+    stop = threading.Event()
+    monitor = threading.Thread(
+        target=monitor_jobs, args=(session_factory, stop), name="job-monitor"
+    )
+    monitor.start()
+    yield
+    stop.set()
+    monitor.join()
+
 
 app = FastAPI(
     title=settings.API_TITLE,
     version=settings.API_VERSION,
     description="API for managing road networks with versioning support",
+    lifespan=lifespan,
 )
 
 
@@ -25,6 +47,7 @@ app.add_middleware(
 
 app.include_router(customers.router, prefix="/api/customers", tags=["customers"])
 app.include_router(networks.router, prefix="/api/networks", tags=["networks"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
 
 
 @app.get("/")
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+from fastapi import Depends
+
+from app.api.dependencies import get_ingest_job_service, get_network_service
+from app.models.customer import Customer
+from app.repositories.job import IngestJobRepository
+from app.services.job import IngestJobService
+from app.services.network import NetworkService
+from main import app
+from tests.conftest import TestingSessionLocal
+
+SAMPLE_GEOJSON = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "LineString",
+                "coordinates": [[10.0, 47.0], [10.1, 47.1], [10.2, 47.2]],
+            },
+            "properties": {"name": "Test Road", "highway": "residential"},
+        }
+    ],
+}
+
+
+class InlineExecutor:
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+
+@pytest.fixture
+def auth_customer(db):
+    customer = Customer(name="Job Customer", api_key="test_job_key")
+    db.add(customer)
+    db.commit()
+    db.refresh(customer)
+    return customer
+
+
+@pytest.fixture
+def inline_jobs(client):
+    def override(network_service: NetworkService = Depends(get_network_service)):
+        return IngestJobService(
+            repository=IngestJobRepository(),
+            network_service=network_service,
+            session_factory=TestingSessionLocal,
+            executor=InlineExecutor(),
+        )
+
+    app.dependency_overrides[get_ingest_job_service] = override
+    yield
+    app.dependency_overrides.pop(get_ingest_job_service, None)
+
+
+def test_background_create_returns_job(client, auth_customer, inline_jobs):
+    headers = {"X-API-Key": auth_customer.api_key}
+
+    response = client.post(
+        "/api/networks/?background=true",
+        json={"name": "Queued Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+
+    assert response.status_code == 202
+    job = response.json()
+    assert job["operation"] == "create"
+    assert response.headers["location"] == f"/api/jobs/{job['id']}"
+
+    response = client.get(f"/api/jobs/{job['id']}", headers=headers)
+
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status"] == "succeeded"
+    assert job["features_parsed"] == 1
+    assert job["nodes_written"] == 2
+    assert job["edges_written"] == 1
+    assert job["result"]["name"] == "Queued Network"
+    assert job["network_id"] == job["result"]["id"]
+
+
+def test_background_streaming_update(client, auth_customer, inline_jobs):
+    headers = {"X-API-Key": auth_customer.api_key}
+    network_id = client.post(
+        "/api/networks/",
+        json={"name": "Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    ).json()["id"]
+
+    response = client.put(
+        f"/api/networks/{network_id}?background=true",
+        content=json.dumps(SAMPLE_GEOJSON),
+        headers={**headers, "Content-Type": "application/geo+json"},
+    )
+
+    assert response.status_code == 202
+    job = client.get(f"/api/jobs/{response.json()['id']}", headers=headers).json()
+    assert job["status"] == "succeeded"
+    assert job["result"]["version"] == 2
+
+
+def test_get_job_of_other_customer_is_forbidden(client, auth_customer, db, inline_jobs):
+    response = client.post(
+        "/api/networks/?background=true",
+        json={"name": "Queued Network", "data": SAMPLE_GEOJSON},
+        headers={"X-API-Key": auth_customer.api_key},
+    )
+    other = Customer(name="Other Customer", api_key="other_job_key")
+    db.add(other)
+    db.commit()
+
+    response = client.get(
+        f"/api/jobs/{response.json()['id']}", headers={"X-API-Key": "other_job_key"}
+    )
+
+    assert response.status_code == 403
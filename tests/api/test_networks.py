@@ -1,9 +1,23 @@
 import json
+from concurrent.futures import ThreadPoolExecutor
 
+import pyarrow as pa
 import pytest
 from fastapi.testclient import TestClient
 
+from app.api.dependencies import get_ingest_job_service, get_network_service
+from app.core.config import settings
+from app.db.session import get_session_factory
 from app.models.customer import Customer
+from app.repositories.edge import EdgeRepository
+from app.repositories.job import IngestJobRepository
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.services.job import IngestJobService
+from app.services.network import NetworkService
+from app.utils.snapshot import SnapshotStore
+from main import app
+from tests.conftest import TestingSessionLocal
 
 SAMPLE_GEOJSON = {
     "type": "FeatureCollection",
@@ -129,6 +143,45 @@ def test_update_network(client, auth_customer):
     assert data["version"] == 2 
 
 
+
+def test_update_network_reports_changes(client, auth_customer):
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Diff Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+
+    response = client.put(
+        f"/api/networks/{network_id}", json={"data": SAMPLE_GEOJSON}, headers=headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["version"] == 2
+    assert data["edge_count"] == 1
+    assert data["changes"] == {"added": 0, "removed": 0, "modified": 0, "unchanged": 1}
+
+    feature = json.loads(json.dumps(SAMPLE_GEOJSON["features"][0]))
+    feature["properties"]["highway"] = "primary"
+    response = client.put(
+        f"/api/networks/{network_id}",
+        json={"data": {"type": "FeatureCollection", "features": [feature]}},
+        headers=headers,
+    )
+    data = response.json()
+    assert data["version"] == 3
+    assert data["changes"] == {"added": 1, "removed": 1, "modified": 0, "unchanged": 0}
+
+    # Earlier versions still resolve to the edges they were created with
+    response = client.get(
+        f"/api/networks/{network_id}/edges?version=1", headers=headers
+    )
+    features = response.json()["features"]
+    assert len(features) == 1
+    assert features[0]["properties"]["highway"] == "residential"
+
+
 def test_get_network_edges(client, auth_customer):
     create_response = client.post(
         "/api/networks/",
@@ -184,3 +237,446 @@ def test_get_network_edges_with_pagination(client, auth_customer):
             headers={"X-API-Key": auth_customer.api_key},
         )
         assert next_response.status_code == 200
+
+
+def test_get_network_edges_total_count(client, auth_customer):
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Count Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+
+    response = client.get(f"/api/networks/{network_id}/edges?limit=10", headers=headers)
+    assert response.json()["total_count"] == 1
+
+    response = client.get(
+        f"/api/networks/{network_id}/edges?limit=10&include_total=false",
+        headers=headers,
+    )
+    data = response.json()
+    assert data["total_count"] is None
+    assert len(data["features"]) == 1
+
+def test_get_network_edges_in_bbox(client, auth_customer):
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Bbox Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+
+    response = client.get(
+        f"/api/networks/{network_id}/edges?bbox=10.05,47.05,10.15,47.15",
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert len(response.json()["features"]) == 1
+
+    response = client.get(
+        f"/api/networks/{network_id}/edges?bbox=11,48,12,49", headers=headers
+    )
+    assert response.json()["features"] == []
+    assert response.json()["total_count"] == 0
+
+    response = client.get(
+        f"/api/networks/{network_id}/edges?bbox=11,48,12", headers=headers
+    )
+    assert response.status_code == 400
+
+def test_create_and_update_network_streaming(client, auth_customer):
+    headers = {
+        "X-API-Key": auth_customer.api_key,
+        "Content-Type": "application/geo+json",
+    }
+
+    response = client.post(
+        "/api/networks/?name=Streamed%20Network&description=Raw%20upload",
+        content=json.dumps(SAMPLE_GEOJSON),
+        headers=headers,
+    )
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["name"] == "Streamed Network"
+    assert data["description"] == "Raw upload"
+    assert data["version"] == 1
+    assert data["node_count"] == 2
+    assert data["edge_count"] == 1
+
+    response = client.put(
+        f"/api/networks/{data['id']}",
+        content=json.dumps(SAMPLE_GEOJSON),
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+
+    response = client.post(
+        "/api/networks/?name=Broken",
+        content=b'{"type": "Feature"}',
+        headers=headers,
+    )
+    assert response.status_code == 400
+
+
+def test_export_network_edges(client, auth_customer):
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Export Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+
+    response = client.get(f"/api/networks/{network_id}/edges/export", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/geo+json"
+    data = response.json()
+    assert data["type"] == "FeatureCollection"
+    assert data["version"] == 1
+    assert len(data["features"]) == 1
+    assert data["features"][0]["properties"]["name"] == "Test Road"
+
+    response = client.get(
+        f"/api/networks/{network_id}/edges/export?version=5", headers=headers
+    )
+    assert response.status_code == 404
+
+
+def test_get_network_tile(client, auth_customer):
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Tile Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+
+    response = client.get(
+        f"/api/networks/{network_id}/tiles/6/33/22.mvt?version=1", headers=headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+    assert b"Test Road" in response.content
+
+    response = client.get(
+        f"/api/networks/{network_id}/tiles/6/0/0.mvt", headers=headers
+    )
+    assert response.status_code == 200
+    assert response.content == b""
+
+    response = client.get(
+        f"/api/networks/{network_id}/tiles/1/2/0.mvt", headers=headers
+    )
+    assert response.status_code == 400
+
+
+def test_get_network_edges_not_modified(client, auth_customer):
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "ETag Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+    url = f"/api/networks/{network_id}/edges?version=1"
+
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Writing version 2 retires the edges of version 1, changing the body
+    client.put(
+        f"/api/networks/{network_id}",
+        json={"data": {"type": "FeatureCollection", "features": []}},
+        headers=headers,
+    )
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+
+    response = client.get(
+        f"/api/networks/{network_id}/tiles/6/33/22.mvt?version=1", headers=headers
+    )
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_export_network_edges_from_snapshot(
+    client, auth_customer, tmp_path, monkeypatch
+):
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+    network_service = NetworkService(
+        NetworkRepository(),
+        NodeRepository(),
+        EdgeRepository(),
+        snapshots=SnapshotStore(str(tmp_path)),
+    )
+    app.dependency_overrides[get_network_service] = lambda: network_service
+    monkeypatch.setattr(settings, "SNAPSHOT_DIR", str(tmp_path))
+    snapshot_executor = ThreadPoolExecutor(max_workers=1)
+    app.dependency_overrides[get_ingest_job_service] = lambda: IngestJobService(
+        repository=IngestJobRepository(),
+        network_service=network_service,
+        session_factory=TestingSessionLocal,
+        snapshot_executor=snapshot_executor,
+    )
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Snapshot Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+    # Written in the background after the ingest
+    snapshot_executor.shutdown(wait=True)
+    assert (tmp_path / f"network-{network_id}-v1-l1.json.gz").exists()
+
+    for _ in range(2):
+        response = client.get(
+            f"/api/networks/{network_id}/edges/export",
+            headers={**headers, "Accept-Encoding": "gzip"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["features"][0]["properties"]["name"] == "Test Road"
+
+
+def test_get_network_edges_sparse_fields(client, auth_customer):
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Fields Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+
+    response = client.get(
+        f"/api/networks/{network_id}/edges?fields=source_node_id,target_node_id,name"
+        "&geometry=false",
+        headers=headers,
+    )
+    assert response.status_code == 200
+    feature = response.json()["features"][0]
+    assert feature["geometry"] is None
+    assert set(feature["properties"]) == {"source_node_id", "target_node_id", "name"}
+    assert feature["properties"]["name"] == "Test Road"
+
+    response = client.get(f"/api/networks/{network_id}/edges?fields=", headers=headers)
+    assert response.status_code == 400
+
+
+def test_export_network_edges_compact_formats(client, auth_customer):
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Compact Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+    url = f"/api/networks/{network_id}/edges/export"
+
+    response = client.get(f"{url}?format=topojson&quantization=3", headers=headers)
+    assert response.status_code == 200
+    topology = response.json()
+    assert topology["type"] == "Topology"
+    assert topology["bbox"] == pytest.approx([10.0, 47.0, 10.2, 47.2])
+    assert topology["arcs"] == [[[0, 0], [1, 1], [1, 1]]]
+    (edge,) = topology["objects"]["edges"]["geometries"]
+    assert edge["arcs"] == [0]
+    assert edge["properties"]["name"] == "Test Road"
+
+    response = client.get(f"{url}?format=polyline", headers=headers)
+    assert response.status_code == 200
+    geometry = response.json()["features"][0]["geometry"]
+    assert geometry["type"] == "EncodedPolyline"
+    assert geometry["polyline"] == "_uz}G_c`|@_pR_pR_pR_pR"
+
+    response = client.get(f"{url}?format=topojson&geometry=false", headers=headers)
+    assert response.status_code == 400
+    response = client.get(f"{url}?format=polyline&precision=7", headers=headers)
+    assert response.status_code == 400
+    response = client.get(f"{url}?format=wkb", headers=headers)
+    assert response.status_code == 422
+
+
+def test_export_network_edges_arrow(client, auth_customer):
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Arrow Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+
+    response = client.get(
+        f"/api/networks/{network_id}/edges/export?format=arrow", headers=headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == 1
+    assert table.schema.field("source_node_id").type == pa.int64()
+    assert table.column("properties.name").to_pylist() == ["Test Road"]
+    assert table.column("properties.length").to_pylist() == [100.5]
+    assert table.schema.field("geometry").type == pa.binary()
+
+
+def test_get_network_nearest(client, auth_customer):
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Nearest Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+    url = f"/api/networks/{network_id}/nearest"
+
+    response = client.post(
+        url, json={"points": [[10.1, 47.1005], [0.0, 0.0]]}, headers=headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["version"] == 1
+    assert data["target"] == "edge"
+    match = data["matches"][0]
+    assert match["location"] == pytest.approx([10.10025, 47.10025], abs=1e-4)
+    assert 0 < match["distance"] < 50
+    assert match["fraction"] == pytest.approx(0.5, abs=0.01)
+    assert data["matches"][1]["distance"] > 1_000_000
+
+    response = client.post(
+        url,
+        json={"points": [[10.2, 47.2]], "target": "node", "max_distance": 10},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["matches"][0]["location"] == [10.2, 47.2]
+
+    response = client.post(url, json={"points": [[10.0, 95.0]]}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_get_network_route(client, auth_customer):
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Route Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+    url = f"/api/networks/{network_id}/route"
+
+    response = client.get(f"{url}?from=10.2,47.2001&to=10.0,47.0", headers=headers)
+    assert response.status_code == 200
+    route = response.json()
+    assert route["version"] == 1
+    assert len(route["edge_ids"]) == 1
+    assert len(route["node_ids"]) == 2
+    # Travelled against the edge's direction
+    assert route["geometry"] == {
+        "type": "LineString",
+        "coordinates": [[10.2, 47.2], [10.1, 47.1], [10.0, 47.0]],
+    }
+    assert route["distance"] == pytest.approx(27000, rel=0.05)
+
+    source, target = route["node_ids"]
+    response = client.get(f"{url}?from={target}&to={source}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["node_ids"] == [target, source]
+
+    response = client.get(f"{url}?from=0&to={source}", headers=headers)
+    assert response.status_code == 400
+    response = client.get(f"{url}?from=10.0,95.0&to={source}", headers=headers)
+    assert response.status_code == 400
+    response = client.get(f"{url}?from={source}&to={target}&version=9", headers=headers)
+    assert response.status_code == 404
+
+
+def test_get_network_matrix(client, auth_customer):
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Matrix Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+    url = f"/api/networks/{network_id}/matrix"
+    body = {"origins": [[10.0, 47.0], [10.2, 47.2001]], "destinations": [[10.2, 47.2]]}
+
+    response = client.post(url, json=body, headers=headers)
+    assert response.status_code == 200
+    matrix = response.json()
+    assert matrix["version"] == 1
+    assert len(matrix["origin_node_ids"]) == 2
+    assert matrix["destination_node_ids"] == matrix["origin_node_ids"][1:]
+    assert matrix["distances"][0][0] == pytest.approx(27000, rel=0.05)
+    assert matrix["distances"][1] == [0.0]
+
+    response = client.post(f"{url}?format=arrow", json=body, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("origin_node_id").to_pylist() == matrix["origin_node_ids"]
+    assert table.column("distances").to_pylist() == matrix["distances"]
+    assert json.loads(table.schema.metadata[b"destination_node_ids"]) == (
+        matrix["destination_node_ids"]
+    )
+
+    response = client.post(
+        url, json={"origins": [0], "destinations": [[10.2, 47.2]]}, headers=headers
+    )
+    assert response.status_code == 400
+    response = client.post(
+        url, json={"origins": [[10.0, 95.0]], "destinations": [0]}, headers=headers
+    )
+    assert response.status_code == 422
+
+
+def test_get_network_isochrone(client, auth_customer):
+    headers = {"X-API-Key": auth_customer.api_key}
+    create_response = client.post(
+        "/api/networks/",
+        json={"name": "Isochrone Network", "data": SAMPLE_GEOJSON},
+        headers=headers,
+    )
+    network_id = create_response.json()["id"]
+    url = f"/api/networks/{network_id}/isochrone?from=10.0,47.0"
+
+    response = client.get(f"{url}&distance=50000&output=lines", headers=headers)
+    assert response.status_code == 200
+    isochrone = response.json()
+    assert isochrone["version"] == 1
+    assert len(isochrone["edge_ids"]) == 1
+    assert isochrone["geometry"] == {
+        "type": "MultiLineString",
+        "coordinates": [[[10.0, 47.0], [10.1, 47.1], [10.2, 47.2]]],
+    }
+
+    # 1 km of the 27 km edge
+    response = client.get(f"{url}&minutes=1&speed=60&output=lines", headers=headers)
+    assert response.status_code == 200
+    isochrone = response.json()
+    assert isochrone["distance"] == pytest.approx(1000)
+    (line,) = isochrone["geometry"]["coordinates"]
+    assert line[0] == [10.0, 47.0]
+    assert line[-1][0] == pytest.approx(10.0074, abs=1e-3)
+
+    response = client.get(f"{url}&distance=50000&output=polygon", headers=headers)
+    assert response.status_code == 200
+
+    response = client.get(url, headers=headers)
+    assert response.status_code == 400
+    response = client.get(f"{url}&distance=10&minutes=1", headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,647 @@
+import json
+from datetime import timedelta
+
+import pytest
+from geoalchemy2 import WKBElement
+from geoalchemy2.shape import to_shape
+
+from app.models.customer import Customer
+from app.models.network import Network
+from app.models.network_version import NetworkVersion
+from app.repositories.edge import EdgeRepository
+from app.repositories.node import NodeRepository
+from app.utils.geojson import edge_content_hash
+
+
+@pytest.fixture
+def network_version(db):
+    customer = Customer(name="Test Customer", api_key="test_key_edges")
+    db.add(customer)
+    db.flush()
+
+    network = Network(name="Test Network", customer_id=customer.id)
+    db.add(network)
+    db.flush()
+
+    version = NetworkVersion(network_id=network.id, version_number=1)
+    db.add(version)
+    db.flush()
+    db.refresh(version)
+    return network, version
+
+
+def _point(x, y):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [x, y]},
+        "properties": {},
+    }
+
+
+@pytest.mark.parametrize("method", ["copy", "insert"])
+def test_bulk_create_edges_from_geojson(db, network_version, method):
+    network, version = network_version
+    node_map = NodeRepository().bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[("a", _point(10.0, 47.0)), ("b", _point(10.2, 47.2))],
+        method=method,
+    )
+
+    feature = {
+        "type": "Feature",
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [[10.0, 47.0], [10.1, 47.1], [10.2, 47.2]],
+        },
+        "properties": {"name": "Test Road", "lanes": 2},
+    }
+    repo = EdgeRepository()
+    written = repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[("road_1", feature, node_map["a"], node_map["b"])],
+        valid_from=version.created_at,
+        method=method,
+    )
+
+    assert written == 1
+
+    edges = repo.get_by_network_version(
+        db=db, network_id=network.id, version_id=version.id
+    )
+    assert len(edges) == 1
+    edge = edges[0]
+    assert edge.external_id == "road_1"
+    assert edge.source_node_id == node_map["a"]
+    assert edge.target_node_id == node_map["b"]
+    assert edge.is_current is True
+    assert edge.properties == {"name": "Test Road", "lanes": 2}
+    assert edge.content_hash == edge_content_hash(
+        feature["geometry"]["coordinates"], feature["properties"]
+    )
+    assert list(to_shape(edge.geometry).coords) == [
+        (10.0, 47.0),
+        (10.1, 47.1),
+        (10.2, 47.2),
+    ]
+
+
+def test_retire_edges(db, network_version):
+    network, version = network_version
+    node_map = NodeRepository().bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[("a", _point(10.0, 47.0)), ("b", _point(10.2, 47.2))],
+    )
+    feature = {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": [[10.0, 47.0], [10.2, 47.2]]},
+        "properties": {},
+    }
+    repo = EdgeRepository()
+    repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[(f"road_{i}", feature, node_map["a"], node_map["b"]) for i in range(3)],
+        valid_from=version.created_at,
+    )
+    retired_at = version.created_at + timedelta(minutes=1)
+
+    assert (
+        repo.retire(
+            db=db, network_id=network.id, timestamp=retired_at, external_ids=["road_0"]
+        )
+        == 1
+    )
+    assert repo.retire(db=db, network_id=network.id, timestamp=retired_at) == 2
+
+    edges = repo.get_by_network_version(
+        db=db, network_id=network.id, version_id=version.id
+    )
+    assert len(edges) == 3
+    assert all(edge.valid_to == retired_at for edge in edges)
+    assert all(edge.is_current is False for edge in edges)
+
+
+def test_get_by_timestamp_uses_half_open_validity(db, network_version):
+    network, version = network_version
+    node_map = NodeRepository().bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[("a", _point(10.0, 47.0)), ("b", _point(10.2, 47.2))],
+    )
+    feature = {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": [[10.0, 47.0], [10.2, 47.2]]},
+        "properties": {},
+    }
+    repo = EdgeRepository()
+    repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[("road_0", feature, node_map["a"], node_map["b"])],
+        valid_from=version.created_at,
+    )
+    retired_at = version.created_at + timedelta(minutes=1)
+    repo.retire(db=db, network_id=network.id, timestamp=retired_at)
+
+    def at(timestamp):
+        return repo.get_by_timestamp(db=db, network_id=network.id, timestamp=timestamp)
+
+    assert at(version.created_at - timedelta(seconds=1)) == []
+    assert [edge.external_id for edge in at(version.created_at)] == ["road_0"]
+    assert len(at(retired_at - timedelta(microseconds=1))) == 1
+    assert at(retired_at) == []
+
+
+def test_paginated_features_by_network_version(db, network_version):
+    network, version = network_version
+    node_map = NodeRepository().bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[("a", _point(10.0, 47.0)), ("b", _point(10.2, 47.2))],
+    )
+    coordinates = [[10.0, 47.0], [10.123456789012, 47.1], [10.2, 47.2]]
+    feature = {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": coordinates},
+        "properties": {"name": "Test Road", "lanes": 2},
+    }
+    repo = EdgeRepository()
+    repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[(f"road_{i}", feature, node_map["a"], node_map["b"]) for i in range(3)],
+        valid_from=version.created_at,
+    )
+
+    features, next_cursor, total_count = repo.get_paginated_features(
+        db=db, network_id=network.id, version_id=version.id, limit=2
+    )
+
+    assert total_count == 3
+    assert len(features) == 2
+    assert next_cursor is not None
+    first = json.loads(features[0])
+    assert first["type"] == "Feature"
+    assert first["geometry"] == {"type": "LineString", "coordinates": coordinates}
+    assert first["properties"]["external_id"] == "road_0"
+    assert first["properties"]["source_node_id"] == node_map["a"]
+    assert first["properties"]["name"] == "Test Road"
+    assert first["properties"]["valid_to"] is None
+
+    features, next_cursor, _ = repo.get_paginated_features(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        cursor=next_cursor,
+        limit=2,
+    )
+    assert [json.loads(f)["properties"]["external_id"] for f in features] == ["road_2"]
+    assert next_cursor is None
+
+    features, _, _ = repo.get_paginated_features(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        fields=["source_node_id", "lanes", "missing"],
+        geometry=False,
+        limit=1,
+    )
+    assert json.loads(features[0]) == {
+        "type": "Feature",
+        "geometry": None,
+        "properties": {"source_node_id": node_map["a"], "lanes": 2, "missing": None},
+    }
+
+    features, _, _ = repo.get_paginated_features(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        tolerance=0.05,
+        precision=1,
+        limit=1,
+    )
+    # The middle vertex is within the tolerance of the straight line
+    assert json.loads(features[0])["geometry"]["coordinates"] == [
+        [10.0, 47.0],
+        [10.2, 47.2],
+    ]
+
+
+def test_sparse_fields_prefer_stored_properties(db, network_version):
+    network, version = network_version
+    node_map = NodeRepository().bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[("a", _point(10.0, 47.0)), ("b", _point(10.2, 47.2))],
+    )
+    feature = {
+        "type": "Feature",
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [[10.0, 47.0], [10.2, 47.2]],
+        },
+        "properties": {"id": "road-1", "lanes": 2},
+    }
+    repo = EdgeRepository()
+    repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[("road-1", feature, node_map["a"], node_map["b"])],
+        valid_from=version.created_at,
+    )
+
+    (full,), _, _ = repo.get_paginated_features(
+        db=db, network_id=network.id, version_id=version.id, geometry=False
+    )
+    (sparse,), _, _ = repo.get_paginated_features(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        fields=["id", "source_node_id"],
+        geometry=False,
+    )
+
+    # As in full features, a stored property shadows the attribute
+    assert json.loads(full)["properties"]["id"] == "road-1"
+    assert json.loads(sparse)["properties"] == {
+        "id": "road-1",
+        "source_node_id": node_map["a"],
+    }
+
+
+def test_paginated_features_within_area(db, network_version):
+    network, version = network_version
+    node_map = NodeRepository().bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[(str(i), _point(10.0 + i, 47.0)) for i in range(5)],
+    )
+
+    def road(i):
+        coordinates = [[10.0 + i, 47.0], [10.5 + i, 47.0]]
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": coordinates},
+            "properties": {},
+        }
+        return f"road_{i}", feature, node_map[str(i)], node_map[str(i)]
+
+    repo = EdgeRepository()
+    repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[road(i) for i in range(5)],
+        valid_from=version.created_at,
+    )
+
+    def external_ids(features):
+        return [json.loads(f)["properties"]["external_id"] for f in features]
+
+    features, next_cursor, total_count = repo.get_paginated_features(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        bbox=(10.9, 46.9, 13.1, 47.1),
+        limit=2,
+    )
+    assert total_count == 3
+    assert external_ids(features) == ["road_1", "road_2"]
+
+    features, next_cursor, _ = repo.get_paginated_features(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        bbox=(10.9, 46.9, 13.1, 47.1),
+        cursor=next_cursor,
+        limit=2,
+    )
+    assert external_ids(features) == ["road_3"]
+    assert next_cursor is None
+
+    features, _, _ = repo.get_paginated_features(
+        db=db,
+        network_id=network.id,
+        timestamp=version.created_at,
+        polygon="SRID=4326;POLYGON((14.2 46, 15 46, 15 48, 14.2 48, 14.2 46))",
+    )
+    assert external_ids(features) == ["road_4"]
+
+
+def test_get_tile(db, network_version):
+    network, version = network_version
+    node_map = NodeRepository().bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[("a", _point(10.0, 47.0)), ("b", _point(10.2, 47.2))],
+    )
+    feature = {
+        "type": "Feature",
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [[10.0, 47.0], [10.1, 47.1], [10.2, 47.2]],
+        },
+        "properties": {"name": "Test Road"},
+    }
+    repo = EdgeRepository()
+    repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[("road_1", feature, node_map["a"], node_map["b"])],
+        valid_from=version.created_at,
+    )
+
+    tile = repo.get_tile(
+        db=db, network_id=network.id, version_id=version.id, z=6, x=33, y=22
+    )
+    assert b"edges" in tile
+    assert b"Test Road" in tile
+
+    empty = repo.get_tile(
+        db=db, network_id=network.id, version_id=version.id, z=6, x=0, y=0
+    )
+    assert empty == b""
+
+
+def test_polyline_features_extent_and_shapes(db, network_version):
+    network, version = network_version
+    node_map = NodeRepository().bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[("a", _point(10.0, 47.0)), ("b", _point(10.2, 47.2))],
+    )
+    feature = {
+        "type": "Feature",
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [[10.0, 47.0], [10.1, 47.1], [10.2, 47.2]],
+        },
+        "properties": {"name": "Test Road"},
+    }
+    repo = EdgeRepository()
+    repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[("road_1", feature, node_map["a"], node_map["b"])],
+        valid_from=version.created_at,
+    )
+
+    (encoded,) = repo.stream_features(
+        db=db, network_id=network.id, version_id=version.id, polyline=True
+    )
+    geometry = json.loads(encoded)["geometry"]
+    # Google's encoding of (lat, lng) 47,10 47.1,10.1 47.2,10.2 at 5 decimals
+    assert geometry == {
+        "type": "EncodedPolyline",
+        "precision": 5,
+        "polyline": "_uz}G_c`|@_pR_pR_pR_pR",
+    }
+
+    assert repo.get_extent(
+        db=db, network_id=network.id, version_id=version.id
+    ) == pytest.approx((10.0, 47.0, 10.2, 47.2))
+    assert (
+        repo.get_extent(db=db, network_id=network.id, bbox=(0.0, 0.0, 1.0, 1.0)) is None
+    )
+
+    ((geometry, properties),) = repo.stream_shapes(
+        db=db, network_id=network.id, version_id=version.id, fields=["name"]
+    )
+    assert json.loads(geometry)["coordinates"] == feature["geometry"]["coordinates"]
+    assert json.loads(properties) == {"name": "Test Road"}
+
+
+def test_property_types_and_row_batches(db, network_version):
+    network, version = network_version
+    node_map = NodeRepository().bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[("a", _point(10.0, 47.0)), ("b", _point(10.1, 47.1))],
+    )
+    coordinates = [[10.0, 47.0], [10.1, 47.1]]
+    features = [
+        ("road_1", {"lanes": 2, "name": "Main", "ref": "A1", "external_id": "main"}),
+        ("road_2", {"lanes": None, "name": "Side", "ref": 7}),
+        ("road_3", {"lanes": 1}),
+    ]
+    repo = EdgeRepository()
+    repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[
+            (
+                external_id,
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "LineString", "coordinates": coordinates},
+                    "properties": properties,
+                },
+                node_map["a"],
+                node_map["b"],
+            )
+            for external_id, properties in features
+        ],
+        valid_from=version.created_at,
+    )
+
+    types = repo.get_property_types(db=db, network_id=network.id, version_id=version.id)
+    assert types == {
+        "external_id": ["string"],
+        "lanes": ["null", "number"],
+        "name": ["string"],
+        "ref": ["number", "string"],
+    }
+    assert list(
+        repo.get_property_types(
+            db=db, network_id=network.id, version_id=version.id, names=["name"]
+        )
+    ) == ["name"]
+
+    batches = list(
+        repo.stream_row_batches(
+            db=db,
+            network_id=network.id,
+            version_id=version.id,
+            attributes=["external_id"],
+            properties={"lanes": "number", "ref": "json"},
+            batch_size=2,
+        )
+    )
+    assert [len(batch) for batch in batches] == [2, 1]
+    rows = [row for batch in batches for row in batch]
+    assert [(row[0], row[2], row[3]) for row in rows] == [
+        ("road_1", 2.0, '"A1"'),
+        ("road_2", None, "7"),
+        ("road_3", 1.0, None),
+    ]
+    assert to_shape(WKBElement(bytes(rows[0][1]))).coords[:] == [
+        (10.0, 47.0),
+        (10.1, 47.1),
+    ]
+
+    # A stored property shadows the attribute of its name
+    batches = repo.stream_row_batches(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        attributes=[],
+        geometry=False,
+        properties={"external_id": "string"},
+    )
+    assert [row for batch in batches for row in batch] == [
+        ("main",),
+        ("road_2",),
+        ("road_3",),
+    ]
+
+
+def test_get_nearest_edges(db, network_version):
+    network, version = network_version
+    node_map = NodeRepository().bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[("a", _point(10.0, 47.0)), ("b", _point(10.1, 47.0))],
+    )
+    feature = {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": [[10.0, 47.0], [10.1, 47.0]]},
+        "properties": {},
+    }
+    repo = EdgeRepository()
+    repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[("road_1", feature, node_map["a"], node_map["b"])],
+        valid_from=version.created_at,
+    )
+
+    rows = repo.get_nearest(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        points=[(10.025, 47.001), (20.0, 47.0)],
+        max_distance=500,
+    )
+
+    edge_id, external_id, x, y, distance, fraction = rows[0]
+    assert external_id == "road_1"
+    assert (x, y) == pytest.approx((10.025, 47.0))
+    # 0.001 degrees of latitude
+    assert distance == pytest.approx(111.2, abs=0.5)
+    assert fraction == pytest.approx(0.25)
+    assert rows[1] == (None,) * 6
+
+
+def test_graph_arrays(db, network_version):
+    network, version = network_version
+    nodes = NodeRepository()
+    node_map = nodes.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[
+            ("a", _point(10.0, 47.0)),
+            ("b", _point(10.0, 47.01)),
+            ("c", _point(10.01, 47.01)),
+        ],
+    )
+    repo = EdgeRepository()
+    repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        edges=[
+            (
+                "north",
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": [[10.0, 47.0], [10.0, 47.01]],
+                    },
+                    "properties": {},
+                },
+                node_map["a"],
+                node_map["b"],
+            ),
+            (
+                "east",
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": [[10.0, 47.01], [10.01, 47.01]],
+                    },
+                    "properties": {},
+                },
+                node_map["b"],
+                node_map["c"],
+            ),
+        ],
+        valid_from=version.created_at,
+    )
+
+    ids, sources, targets, lengths = repo.get_graph_arrays(
+        db=db, network_id=network.id, version_id=version.id
+    )
+    assert list(ids) == sorted(ids)
+    assert list(sources) == [node_map["a"], node_map["b"]]
+    assert list(targets) == [node_map["b"], node_map["c"]]
+    # 0.01 degrees of latitude, and of longitude at 47 degrees north
+    assert lengths == pytest.approx([1111.7, 760.4], abs=0.5)
+
+    node_ids, xs, ys = nodes.get_coordinate_arrays(
+        db=db, network_id=network.id, version_id=version.id
+    )
+    assert list(node_ids) == sorted(node_map.values())
+    assert list(zip(xs, ys)) == [(10.0, 47.0), (10.0, 47.01), (10.01, 47.01)]
+
+    lines = repo.get_lines(db=db, network_id=network.id, ids=[int(ids[1])])
+    assert lines == {int(ids[1]): (node_map["b"], [(10.0, 47.01), (10.01, 47.01)])}
+
+    # All of the first edge, and the half of the second nearest its target
+    reached = repo.get_reached_geometry(
+        db=db,
+        network_id=network.id,
+        stretches=[
+            (int(ids[0]), node_map["a"], 1.0),
+            (int(ids[1]), node_map["c"], 0.5),
+        ],
+    )
+    assert reached["type"] == "MultiLineString"
+    assert sorted(reached["coordinates"]) == [
+        [[10.0, 47.0], [10.0, 47.01]],
+        [[10.005, 47.01], [10.01, 47.01]],
+    ]
+    hull = repo.get_reached_geometry(
+        db=db,
+        network_id=network.id,
+        stretches=[
+            (int(ids[0]), node_map["a"], 1.0),
+            (int(ids[1]), node_map["b"], 1.0),
+        ],
+        concavity=1.0,
+    )
+    assert hull["type"] == "Polygon"
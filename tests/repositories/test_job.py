@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from sqlalchemy import func
+
+from app.models.customer import Customer
+from app.models.ingest_job import IngestJob
+from app.repositories.job import IngestJobRepository
+from app.schemas.job import IngestJobCreate
+
+
+def test_fail_unfinished_jobs(db):
+    customer = Customer(name="Test Customer", api_key="test_key_job")
+    db.add(customer)
+    db.commit()
+
+    repo = IngestJobRepository()
+    jobs = [
+        repo.create(
+            db=db, obj_in=IngestJobCreate(operation="create", customer_id=customer.id)
+        )
+        for _ in range(3)
+    ]
+    pending, running, succeeded = (job.id for job in jobs)
+    repo.mark_running(db, id=running)
+    repo.mark_succeeded(db, id=succeeded, result={"id": None})
+
+    # Jobs updated recently may still be running in another process
+    stale_after = timedelta(minutes=5)
+    assert repo.fail_unfinished(db, error="Interrupted", stale_after=stale_after) == 0
+
+    db.query(IngestJob).update(
+        {"updated_at": func.now() - timedelta(minutes=10)}, synchronize_session=False
+    )
+    db.commit()
+    repo.touch(db, ids=[pending])
+    assert repo.fail_unfinished(db, error="Interrupted", stale_after=stale_after) == 1
+
+    db.expire_all()
+    assert repo.get(db=db, id=pending).status == "pending"
+    assert repo.get(db=db, id=running).error == "Interrupted"
+    assert repo.get(db=db, id=running).finished_at is not None
+    assert repo.get(db=db, id=succeeded).status == "succeeded"
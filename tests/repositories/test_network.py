@@ -1,8 +1,12 @@
 import pytest
 
 from app.models.customer import Customer
+from app.models.network_version import NetworkVersion
+from app.repositories.edge import EdgeRepository
 from app.repositories.network import NetworkRepository
-from app.schemas.network import NetworkCreate
+from app.repositories.node import NodeRepository
+from app.schemas.network import NetworkBase, NetworkCreate, NetworkUpdate
+from app.services.network import NetworkService
 
 
 def test_create_network_with_version(db):
@@ -29,3 +33,37 @@ def test_create_network_with_version(db):
     version = repo.get_latest_version(db=db, network_id=network.id)
     assert version is not None
     assert version.version_number == 1
+
+
+def test_failed_version_write_leaves_no_version(db, monkeypatch):
+    customer = Customer(name="Test Customer", api_key="test_key_failed_version")
+    db.add(customer)
+    db.commit()
+    repo = NetworkRepository()
+    network = repo.create_with_version(
+        db=db, obj_in=NetworkBase(name="Test Network"), customer_id=customer.id
+    )
+    db.commit()
+    service = NetworkService(repo, NodeRepository(), EdgeRepository())
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("Write failed")
+
+    monkeypatch.setattr(EdgeRepository, "bulk_create_from_geojson", fail)
+    road = {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": [[10.0, 47.0], [10.1, 47.1]]},
+        "properties": {"id": "road-1"},
+    }
+    with pytest.raises(RuntimeError):
+        service.update(
+            db=db,
+            network_id=network.id,
+            obj_in=NetworkUpdate(
+                data={"type": "FeatureCollection", "features": [road]}
+            ),
+        )
+    db.rollback()
+
+    versions = db.query(NetworkVersion).filter_by(network_id=network.id).all()
+    assert [version.version_number for version in versions] == [1]
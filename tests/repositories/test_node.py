@@ -47,3 +47,104 @@ def test_create_node_from_geojson(db):
 
     assert node.properties["name"] == "Test Node"
     assert node.properties["type"] == "junction"
+
+
+@pytest.mark.parametrize("method", ["copy", "insert"])
+def test_bulk_create_nodes_from_geojson(db, method):
+    repo = NodeRepository()
+
+    customer = Customer(name="Test Customer", api_key="test_key_bulk")
+    db.add(customer)
+    db.flush()
+
+    network = Network(name="Test Network", customer_id=customer.id)
+    db.add(network)
+    db.flush()
+
+    version = NetworkVersion(network_id=network.id, version_number=1)
+    db.add(version)
+    db.flush()
+
+    nodes = [
+        (
+            f"node_{i}",
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [10.0 + i, 47.5]},
+                "properties": {"name": f"Node {i}", "note": 'quoted "text", too'},
+            },
+        )
+        for i in range(5)
+    ]
+
+    node_map = repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=nodes,
+        method=method,
+        batch_size=2,
+    )
+
+    assert set(node_map) == {f"node_{i}" for i in range(5)}
+
+    node = repo.get(db=db, id=node_map["node_3"])
+    point = to_shape(node.geometry)
+    assert point.x == 13.0
+    assert point.y == 47.5
+    assert node.properties["note"] == 'quoted "text", too'
+
+
+def test_get_nearest_nodes(db):
+    repo = NodeRepository()
+
+    customer = Customer(name="Test Customer", api_key="test_key_nearest")
+    db.add(customer)
+    db.flush()
+
+    network = Network(name="Test Network", customer_id=customer.id)
+    db.add(network)
+    db.flush()
+
+    version = NetworkVersion(network_id=network.id, version_number=1)
+    db.add(version)
+    db.flush()
+
+    node_map = repo.bulk_create_from_geojson(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        nodes=[
+            (
+                f"node_{i}",
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "Point",
+                        "coordinates": [10.0 + i * 0.01, 47.0],
+                    },
+                },
+            )
+            for i in range(5)
+        ],
+    )
+
+    points = [(10.031, 47.0), (9.0, 47.0), (10.0, 47.0)]
+    rows = repo.get_nearest(
+        db=db, network_id=network.id, version_id=version.id, points=points
+    )
+    assert [row[1] for row in rows] == ["node_3", "node_0", "node_0"]
+    assert rows[0][0] == node_map["node_3"]
+    assert rows[0][2:4] == (10.03, 47.0)
+    # 0.001 degrees of longitude at 47 degrees north, on the spheroid
+    assert rows[0][4] == pytest.approx(76.0, abs=1.0)
+    assert rows[2][4] == 0
+
+    rows = repo.get_nearest(
+        db=db,
+        network_id=network.id,
+        version_id=version.id,
+        points=points,
+        max_distance=1000,
+    )
+    assert rows[1] == (None, None, None, None, None)
@@ -0,0 +1,188 @@
+"""
+Query plan regression tests: every hot repository query must be answerable
+from an index. Each query is captured while the repository method runs and
+EXPLAINed with sequential scans disabled, so a plan that still scans a table
+means no usable index exists.
+"""
+
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, text
+
+from app.models.customer import Customer
+from app.repositories.customer import CustomerRepository
+from app.repositories.edge import EdgeRepository
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.schemas.network import NetworkCreate, NetworkUpdate
+from app.services.network import NetworkService
+
+TABLES = ("customers", "networks", "network_versions", "nodes", "edges")
+
+CUSTOMERS = CustomerRepository()
+NETWORKS = NetworkRepository()
+NODES = NodeRepository()
+EDGES = EdgeRepository()
+
+
+def _road(i, lanes=1):
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [[10.0 + i * 0.01, 47.0], [10.01 + i * 0.01, 47.0]],
+        },
+        "properties": {"id": f"road_{i}", "lanes": lanes},
+    }
+
+
+@pytest.fixture
+def seeded(db):
+    customer = Customer(name="Plan Customer", api_key="test_key_plans")
+    db.add(customer)
+    db.commit()
+
+    service = NetworkService(NETWORKS, NODES, EDGES)
+    roads = [_road(i) for i in range(20)]
+    network = service.create(
+        db=db,
+        obj_in=NetworkCreate(
+            name="Plan Network", data={"type": "FeatureCollection", "features": roads}
+        ),
+        customer_id=customer.id,
+    )
+    roads[:5] = [_road(i, lanes=2) for i in range(5)]
+    service.update(
+        db=db,
+        network_id=network.id,
+        obj_in=NetworkUpdate(data={"type": "FeatureCollection", "features": roads}),
+    )
+    version = NETWORKS.get_latest_version(db=db, network_id=network.id)
+    return customer, network, version
+
+
+@contextmanager
+def _captured(db):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(
+            ("SELECT", "UPDATE", "WITH")
+        ):
+            statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def _scanned_tables(plan):
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _scanned_tables(child)
+
+
+QUERIES = {
+    "customer by api key": lambda db, c, n, v: CUSTOMERS.get_by_api_key(
+        db=db, api_key=c.api_key
+    ),
+    "networks by customer": lambda db, c, n, v: NETWORKS.get_by_customer(
+        db=db, customer_id=c.id
+    ),
+    "latest version": lambda db, c, n, v: NETWORKS.get_latest_version(
+        db=db, network_id=n
+    ),
+    "version by number": lambda db, c, n, v: NETWORKS.get_version(
+        db=db, network_id=n, version_number=1
+    ),
+    "version at timestamp": lambda db, c, n, v: NETWORKS.get_version_at(
+        db=db, network_id=n, timestamp=v.created_at
+    ),
+    "edges by version": lambda db, c, n, v: EDGES.get_by_network_version(
+        db=db, network_id=n, version_id=v.id
+    ),
+    "edges at timestamp": lambda db, c, n, v: EDGES.get_by_timestamp(
+        db=db, network_id=n, timestamp=v.created_at
+    ),
+    "current edge hashes": lambda db, c, n, v: EDGES.get_current_hashes(
+        db=db, network_id=n
+    ),
+    "edge page of version": lambda db, c, n, v: EDGES.get_paginated_features(
+        db=db, network_id=n, version_id=v.id, cursor="MQ==", limit=5
+    ),
+    "edge page of current edges": lambda db, c, n, v: EDGES.get_paginated_features(
+        db=db, network_id=n, limit=5
+    ),
+    "edge page in bbox": lambda db, c, n, v: EDGES.get_paginated_features(
+        db=db, network_id=n, version_id=v.id, bbox=(10.0, 46.9, 10.05, 47.1)
+    ),
+    "edge extent": lambda db, c, n, v: EDGES.get_extent(
+        db=db, network_id=n, version_id=v.id
+    ),
+    "edge export": lambda db, c, n, v: list(
+        EDGES.stream_features(db=db, network_id=n, version_id=v.id)
+    ),
+    "edge property types": lambda db, c, n, v: EDGES.get_property_types(
+        db=db, network_id=n, version_id=v.id
+    ),
+    "edge row batches": lambda db, c, n, v: list(
+        EDGES.stream_row_batches(
+            db=db, network_id=n, version_id=v.id, properties={"lanes": "number"}
+        )
+    ),
+    "edge graph arrays": lambda db, c, n, v: EDGES.get_graph_arrays(
+        db=db, network_id=n, version_id=v.id
+    ),
+    "edge lines": lambda db, c, n, v: EDGES.get_lines(
+        db=db, network_id=n, ids=[1, 2, 3]
+    ),
+    "edge reached geometry": lambda db, c, n, v: EDGES.get_reached_geometry(
+        db=db, network_id=n, stretches=[(1, 1, 1.0), (2, 3, 0.5)], concavity=0.5
+    ),
+    "edge tile": lambda db, c, n, v: EDGES.get_tile(
+        db=db, network_id=n, version_id=v.id, z=6, x=33, y=22
+    ),
+    "nearest edges": lambda db, c, n, v: EDGES.get_nearest(
+        db=db, network_id=n, version_id=v.id, points=[(10.05, 47.001), (10.1, 47.0)]
+    ),
+    "retire edges": lambda db, c, n, v: EDGES.retire(
+        db=db, network_id=n, timestamp=v.created_at
+    ),
+    "nodes by version": lambda db, c, n, v: NODES.get_by_network_version(
+        db=db, network_id=n, version_id=v.id
+    ),
+    "nearest nodes": lambda db, c, n, v: NODES.get_nearest(
+        db=db, network_id=n, version_id=v.id, points=[(10.05, 47.001), (10.1, 47.0)]
+    ),
+    "node coordinate arrays": lambda db, c, n, v: NODES.get_coordinate_arrays(
+        db=db, network_id=n, version_id=v.id
+    ),
+    "node locations": lambda db, c, n, v: NODES.get_locations_by_network_version(
+        db=db, network_id=n, version_id=v.id
+    ),
+}
+
+
+@pytest.mark.parametrize("name", list(QUERIES))
+def test_query_uses_indexes(db, seeded, name):
+    customer, network, version = seeded
+
+    with _captured(db) as statements:
+        QUERIES[name](db, customer, network.id, version)
+    assert statements, f"{name} ran no queries"
+
+    db.execute(text("SET LOCAL enable_seqscan = off"))
+    for statement, parameters in statements:
+        plan = (
+            db.connection()
+            .exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            .scalar()[0]["Plan"]
+        )
+        scanned = [table for table in _scanned_tables(plan) if table in TABLES]
+        assert not scanned, f"{name} scans {scanned}:\n{statement}"
+    db.rollback()
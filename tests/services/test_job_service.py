@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core.config import settings
+from app.repositories.job import IngestJobRepository
+from app.schemas.network import NetworkCreate, NetworkUpdate, NetworkWithVersion
+from app.services import job as job_module
+from app.services.job import IngestJobService
+from app.services.network import NetworkService
+
+
+class InlineExecutor:
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+
+def _db_job(**overrides):
+    now = datetime.now(timezone.utc)
+    job = dict(
+        id=7,
+        customer_id=1,
+        network_id=None,
+        operation="create",
+        status="pending",
+        features_parsed=0,
+        nodes_written=0,
+        edges_written=0,
+        result=None,
+        error=None,
+        created_at=now,
+        updated_at=now,
+        finished_at=None,
+    )
+    job.update(overrides)
+    return MagicMock(**job)
+
+
+def _network():
+    now = datetime.now(timezone.utc)
+    return NetworkWithVersion(
+        id=3,
+        name="Network",
+        customer_id=1,
+        created_at=now,
+        updated_at=now,
+        version=1,
+        node_count=2,
+        edge_count=1,
+    )
+
+
+@pytest.fixture
+def job_service():
+    repository = MagicMock(spec=IngestJobRepository)
+    repository.create.return_value = _db_job()
+    network_service = MagicMock(spec=NetworkService)
+    service = IngestJobService(
+        repository=repository,
+        network_service=network_service,
+        session_factory=MagicMock(),
+        executor=InlineExecutor(),
+    )
+    return service, repository, network_service
+
+
+def test_submit_create_runs_ingest_and_records_result(job_service):
+    service, repository, network_service = job_service
+
+    def create(db, obj_in, customer_id, progress):
+        progress(features_parsed=1)
+        progress(nodes_written=2)
+        progress(edges_written=1)
+        return _network()
+
+    network_service.create.side_effect = create
+    obj_in = NetworkCreate(name="Network", data={"type": "FeatureCollection"})
+
+    job = service.submit_create(db=MagicMock(), customer_id=1, obj_in=obj_in)
+
+    assert job.id == 7
+    assert job.status == "pending"
+    assert repository.create.call_args[1]["obj_in"].operation == "create"
+
+    repository.mark_running.assert_called_once()
+    progress_calls = [c[1] for c in repository.update_progress.call_args_list]
+    assert {"id": 7, "edges_written": 1} in progress_calls
+    result = repository.mark_succeeded.call_args[1]["result"]
+    assert result["id"] == 3
+    assert result["edge_count"] == 1
+    repository.mark_failed.assert_not_called()
+
+
+def test_failed_update_closes_stream_and_records_error(job_service):
+    service, repository, network_service = job_service
+    repository.create.return_value = _db_job(operation="update", network_id=3)
+    network_service.update_from_stream.side_effect = ValueError("Invalid GeoJSON")
+    stream = MagicMock()
+
+    service.submit_update(
+        db=MagicMock(),
+        customer_id=1,
+        network_id=3,
+        obj_in=NetworkUpdate(),
+        stream=stream,
+    )
+
+    repository.mark_succeeded.assert_not_called()
+    assert repository.mark_failed.call_args[1]["error"] == "Invalid GeoJSON"
+    stream.close.assert_called_once()
+
+
+def test_successful_ingest_queues_hierarchy_build(job_service, monkeypatch, tmp_path):
+    _, repository, network_service = job_service
+    network_service.create.return_value = _network()
+    built = []
+    monkeypatch.setattr(settings, "HIERARCHY_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        job_module, "build_hierarchy", lambda *args: built.append(args) or True
+    )
+    service = IngestJobService(
+        repository=repository,
+        network_service=network_service,
+        session_factory=MagicMock(),
+        executor=InlineExecutor(),
+        hierarchy_executor=InlineExecutor(),
+    )
+
+    service.submit_create(
+        db=MagicMock(),
+        customer_id=1,
+        obj_in=NetworkCreate(name="Network", data={"type": "FeatureCollection"}),
+    )
+    assert built == [(3, 1)]
+
+    monkeypatch.setattr(settings, "HIERARCHY_DIR", "")
+    service.submit_hierarchy(network_id=3, version_number=2)
+    assert built == [(3, 1)]
+
+
+def test_successful_ingest_queues_snapshot(job_service, monkeypatch, tmp_path):
+    _, repository, network_service = job_service
+    network_service.create.return_value = _network()
+    session = MagicMock()
+    monkeypatch.setattr(settings, "SNAPSHOT_DIR", str(tmp_path))
+    service = IngestJobService(
+        repository=repository,
+        network_service=network_service,
+        session_factory=lambda: session,
+        executor=InlineExecutor(),
+        snapshot_executor=InlineExecutor(),
+    )
+
+    service.submit_create(
+        db=MagicMock(),
+        customer_id=1,
+        obj_in=NetworkCreate(name="Network", data={"type": "FeatureCollection"}),
+    )
+    network_service.write_edges_snapshot.assert_called_once_with(
+        db=session, network_id=3, version_number=1
+    )
+
+    # A failed snapshot is logged, not raised
+    network_service.write_edges_snapshot.side_effect = OSError("Disk full")
+    service.submit_snapshot(network_id=3, version_number=2)
+
+    monkeypatch.setattr(settings, "SNAPSHOT_DIR", "")
+    service.submit_snapshot(network_id=3, version_number=3)
+    assert network_service.write_edges_snapshot.call_count == 2
+
+
+def test_fail_orphaned_jobs_keeps_own_jobs_alive(job_service, monkeypatch):
+    service, repository, network_service = job_service
+    touched, failed = [], []
+    monkeypatch.setattr(
+        IngestJobRepository,
+        "touch",
+        lambda self, db, ids: touched.append(sorted(ids)),
+    )
+    monkeypatch.setattr(
+        IngestJobRepository,
+        "fail_unfinished",
+        lambda self, db, error, stale_after: failed.append(stale_after) or 2,
+    )
+    monkeypatch.setattr(settings, "JOB_STALE_AFTER", 60)
+    session = MagicMock()
+
+    def create(db, obj_in, customer_id, progress):
+        # While the job runs, the heartbeat marks it as alive
+        job_module.fail_orphaned_jobs(lambda: session)
+        return _network()
+
+    network_service.create.side_effect = create
+    service.submit_create(
+        db=MagicMock(),
+        customer_id=1,
+        obj_in=NetworkCreate(name="Network", data={"type": "FeatureCollection"}),
+    )
+    assert job_module.fail_orphaned_jobs(lambda: session) == 2
+
+    assert touched == [[7]]
+    assert failed == [timedelta(seconds=60)] * 2
+    assert session.close.call_count == 2
@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import matrix as matrix_module
+from app.services.matrix import compute_matrix
+from app.utils.contraction import HierarchyStore, contract
+from app.utils.graph import Graph
+from app.utils.routing import distance_matrix
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.tasks = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.tasks.append(kwargs)
+        return super().submit(fn, *args, **kwargs)
+
+
+def _line_graph(node_count=6):
+    node_ids = np.arange(node_count)
+    return Graph.from_arrays(
+        node_ids=node_ids,
+        lon=10 + node_ids * 0.01,
+        lat=np.full(node_count, 47.0),
+        edge_ids=node_ids[:-1],
+        sources=node_ids[:-1],
+        targets=node_ids[1:],
+        lengths=np.full(node_count - 1, 100.0),
+    )
+
+
+@pytest.fixture(autouse=True)
+def worker_caches(monkeypatch):
+    monkeypatch.setattr(settings, "MATRIX_INLINE_MAX_CELLS", 0)
+    matrix_module._graphs.clear()
+    matrix_module._hierarchies.clear()
+
+
+def test_small_matrices_are_computed_in_the_request(monkeypatch):
+    monkeypatch.setattr(settings, "MATRIX_INLINE_MAX_CELLS", 100)
+    graph = _line_graph()
+    with RecordingExecutor() as executor:
+        matrix = compute_matrix(
+            graph, [0, 5], [1, 2, 3], executor=executor, workers=2, key=(3, 1)
+        )
+
+    assert executor.tasks == []
+    assert matrix.tolist() == [[100.0, 200.0, 300.0], [400.0, 300.0, 200.0]]
+
+
+def test_graph_is_sent_to_workers_once():
+    graph = _line_graph()
+    sources, targets = [0, 1, 2, 3], [4, 5]
+    expected = distance_matrix(graph, sources, targets)
+    with RecordingExecutor() as executor:
+        for _ in range(2):
+            matrix = compute_matrix(
+                graph, sources, targets, executor=executor, workers=2, key=(3, 1)
+            )
+            assert np.array_equal(matrix, expected)
+
+    # The first blocks find no graph and are sent it; later ones reuse it
+    sent = [task for task in executor.tasks if "router" in task]
+    assert len(executor.tasks) == 6
+    assert len(sent) == 2
+    assert all(task["router"] is graph for task in sent)
+
+
+def test_graphs_over_the_worker_budget_are_sent_every_time(monkeypatch):
+    graph = _line_graph()
+    monkeypatch.setattr(matrix_module._graphs, "max_bytes", graph.nbytes - 1)
+    with RecordingExecutor() as executor:
+        for _ in range(2):
+            compute_matrix(
+                graph, [0, 1, 2, 3], [4, 5], executor=executor, workers=2, key=(3, 1)
+            )
+
+    sent = [task for task in executor.tasks if "router" in task]
+    assert len(sent) == 4
+    assert len(matrix_module._graphs) == 0
+
+
+def test_workers_open_hierarchies_by_path(tmp_path):
+    graph = _line_graph()
+    store = HierarchyStore(str(tmp_path))
+    store.write(3, 1, contract(graph))
+    hierarchy = store.get(3, 1)
+    with RecordingExecutor() as executor:
+        matrix = compute_matrix(
+            hierarchy,
+            [0, 5, 0],
+            [5, 0],
+            executor=executor,
+            workers=2,
+            key=(3, 1),
+            path=store.path(3, 1),
+        )
+
+    assert executor.tasks == [{}, {}]
+    assert isinstance(matrix_module._hierarchies.get((3, 1)).rank, np.memmap)
+    assert matrix.tolist() == [[500.0, 0.0], [0.0, 500.0], [500.0, 0.0]]
+
+
+def test_versions_being_written_are_computed_in_the_request():
+    graph = _line_graph()
+    with RecordingExecutor() as executor:
+        compute_matrix(graph, [0, 1, 2], [5], executor=executor, workers=2)
+
+    assert executor.tasks == []
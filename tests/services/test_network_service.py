@@ -0,0 +1,1018 @@
+import gzip
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pyarrow as pa
+import pytest
+import zstandard
+
+from app.core.config import settings
+from app.repositories.edge import EdgeRepository
+from app.repositories.network import NetworkRepository
+from app.repositories.node import NodeRepository
+from app.schemas.network import NetworkBase, NetworkUpdate
+from app.services.graph import GraphCache
+from app.services.network import NetworkService
+from app.utils.cache import LRUCache
+from app.utils.contraction import HierarchyStore
+from app.utils.geojson import edge_content_hash
+from app.utils.graph import Graph
+from app.utils.snapshot import SnapshotStore
+
+VERSION_CREATED_AT = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _line(edge_id, coordinates, **properties):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": coordinates},
+        "properties": {"id": edge_id, **properties},
+    }
+
+
+ROAD_1 = _line("road_1", [[10.0, 47.0], [10.1, 47.1]], lanes=2)
+ROAD_2 = _line("road_2", [[10.1, 47.1], [10.2, 47.2]], lanes=1)
+ROAD_3 = _line("road_3", [[10.2, 47.2], [10.3, 47.3]], lanes=1)
+
+
+def _hash(feature):
+    return edge_content_hash(feature["geometry"]["coordinates"], feature["properties"])
+
+
+@pytest.fixture
+def repos():
+    network_repo = MagicMock(spec=NetworkRepository)
+    network_repo.get.return_value = MagicMock(
+        id=3,
+        customer_id=1,
+        description=None,
+        created_at=VERSION_CREATED_AT,
+        updated_at=VERSION_CREATED_AT,
+    )
+    network_repo.get.return_value.name = "Network"
+    network_repo.get_latest_version.return_value = MagicMock(id=1, version_number=1)
+    network_repo.create_new_version.return_value = MagicMock(
+        id=2, version_number=2, created_at=VERSION_CREATED_AT
+    )
+
+    node_repo = MagicMock(spec=NodeRepository)
+    auto = {"type": "auto_generated"}
+    node_repo.get_locations_by_network_version.return_value = [
+        (11, 10.0, 47.0, {"id": "old-1", **auto}),
+        (12, 10.1, 47.1, {"id": "old-2", **auto}),
+        (13, 10.2, 47.2, {"id": "old-3", **auto}),
+        (14, 10.3, 47.3, {"id": "old-4", **auto}),
+    ]
+    node_repo.written = []
+
+    def write_nodes(db, *, nodes, **kwargs):
+        nodes = list(nodes)
+        node_repo.written.extend(nodes)
+        return {str(node_id): 100 + i for i, (node_id, _) in enumerate(nodes)}
+
+    node_repo.bulk_create_from_geojson.side_effect = write_nodes
+
+    edge_repo = MagicMock(spec=EdgeRepository)
+    edge_repo.get_current_hashes.return_value = [
+        (101, "road_1", _hash(ROAD_1)),
+        (102, "road_2", _hash(ROAD_2)),
+        (103, "road_3", _hash(ROAD_3)),
+    ]
+    edge_repo.written = []
+
+    def write_edges(db, *, edges, **kwargs):
+        edges = list(edges)
+        edge_repo.written.extend(edges)
+        return len(edges)
+
+    edge_repo.bulk_create_from_geojson.side_effect = write_edges
+    return network_repo, node_repo, edge_repo
+
+
+def test_update_only_writes_changed_edges(repos):
+    network_repo, node_repo, edge_repo = repos
+    service = NetworkService(network_repo, node_repo, edge_repo, ingest_mode="copy")
+
+    modified_road_2 = _line("road_2", [[10.1, 47.1], [10.2, 47.2]], lanes=2)
+    new_road_4 = _line("road_4", [[10.2, 47.2], [10.4, 47.4]], lanes=1)
+    data = {
+        "type": "FeatureCollection",
+        "features": [ROAD_1, modified_road_2, new_road_4],
+    }
+
+    result = service.update(
+        db=MagicMock(), network_id=3, obj_in=NetworkUpdate(data=data)
+    )
+
+    assert result.version == 2
+    assert result.edge_count == 3
+    assert result.changes.model_dump() == {
+        "added": 1,
+        "removed": 1,
+        "modified": 1,
+        "unchanged": 1,
+    }
+
+    assert [edge[0] for edge in edge_repo.written] == ["road_2", "road_4"]
+    road_4 = edge_repo.written[1]
+    assert road_4[2] == 13
+    assert road_4[3] == 100
+
+    # Only the node at the end of the new road is written
+    assert len(node_repo.written) == 1
+    assert node_repo.written[0][1]["geometry"]["coordinates"] == [10.4, 47.4]
+
+    edge_repo.retire.assert_called_once()
+    retire_kwargs = edge_repo.retire.call_args.kwargs
+    assert sorted(retire_kwargs["edge_ids"]) == [102, 103]
+    assert retire_kwargs["timestamp"] == VERSION_CREATED_AT
+
+    edge_kwargs = edge_repo.bulk_create_from_geojson.call_args.kwargs
+    assert edge_kwargs["valid_from"] == VERSION_CREATED_AT
+    network_repo.record_changes.assert_called_once()
+    counts = network_repo.record_counts.call_args.kwargs
+    assert (counts["node_count"], counts["edge_count"]) == (4, 3)
+
+
+def test_update_locks_network_before_reading_latest_version(repos):
+    network_repo, node_repo, edge_repo = repos
+    calls = []
+    network_repo.lock.side_effect = lambda **kwargs: calls.append("lock")
+    network_repo.get_latest_version.side_effect = lambda **kwargs: calls.append(
+        "latest"
+    ) or MagicMock(id=1, version_number=1)
+    service = NetworkService(network_repo, node_repo, edge_repo, ingest_mode="copy")
+
+    data = {"type": "FeatureCollection", "features": [ROAD_1, ROAD_2, ROAD_3]}
+    service.update(db=MagicMock(), network_id=3, obj_in=NetworkUpdate(data=data))
+
+    assert calls[0] == "lock"
+    assert network_repo.lock.call_args.kwargs["id"] == 3
+
+
+def test_update_with_identical_data_writes_nothing(repos):
+    network_repo, node_repo, edge_repo = repos
+    service = NetworkService(network_repo, node_repo, edge_repo, ingest_mode="copy")
+
+    data = {"type": "FeatureCollection", "features": [ROAD_1, ROAD_2, ROAD_3]}
+    result = service.update(
+        db=MagicMock(), network_id=3, obj_in=NetworkUpdate(data=data)
+    )
+
+    assert result.changes.unchanged == 3
+    assert result.changes.added == result.changes.removed == 0
+    assert edge_repo.written == []
+    assert node_repo.written == []
+    edge_repo.retire.assert_not_called()
+
+
+def test_update_replacing_every_edge_retires_whole_network(repos):
+    network_repo, node_repo, edge_repo = repos
+    service = NetworkService(network_repo, node_repo, edge_repo, ingest_mode="copy")
+
+    road = _line("road_9", [[11.0, 48.0], [11.1, 48.1]])
+    data = {"type": "FeatureCollection", "features": [road]}
+    result = service.update(
+        db=MagicMock(), network_id=3, obj_in=NetworkUpdate(data=data)
+    )
+
+    assert result.changes.removed == 3
+    assert edge_repo.retire.call_args.kwargs["edge_ids"] is None
+
+
+def _point(node_id, coordinates):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": coordinates},
+        "properties": {"id": node_id},
+    }
+
+
+def test_only_large_loads_are_analyzed(repos, monkeypatch):
+    network_repo, node_repo, edge_repo = repos
+    service = NetworkService(network_repo, node_repo, edge_repo, ingest_mode="copy")
+    new_road_4 = _line("road_4", [[10.3, 47.3], [10.4, 47.4]])
+    data = {
+        "type": "FeatureCollection",
+        "features": [ROAD_1, ROAD_2, ROAD_3, new_road_4],
+    }
+
+    monkeypatch.setattr(settings, "ANALYZE_MIN_ROWS", 2)
+    service.update(db=MagicMock(), network_id=3, obj_in=NetworkUpdate(data=data))
+    node_repo.analyze.assert_not_called()
+    edge_repo.analyze.assert_not_called()
+
+    monkeypatch.setattr(settings, "ANALYZE_MIN_ROWS", 1)
+    service.update(db=MagicMock(), network_id=3, obj_in=NetworkUpdate(data=data))
+    node_repo.analyze.assert_called_once()
+    edge_repo.analyze.assert_called_once()
+
+
+def test_update_rewrites_identical_edges_of_replaced_nodes(repos):
+    network_repo, node_repo, edge_repo = repos
+    service = NetworkService(network_repo, node_repo, edge_repo, ingest_mode="copy")
+
+    # A named junction replaces the auto-generated node between road 1 and 2
+    junction = _point("junction", [10.1, 47.1])
+    data = {
+        "type": "FeatureCollection",
+        "features": [junction, ROAD_1, ROAD_2, ROAD_3],
+    }
+    result = service.update(
+        db=MagicMock(), network_id=3, obj_in=NetworkUpdate(data=data)
+    )
+
+    assert result.changes.model_dump() == {
+        "added": 0,
+        "removed": 0,
+        "modified": 2,
+        "unchanged": 1,
+    }
+    assert [edge[0] for edge in edge_repo.written] == ["road_1", "road_2"]
+    # Both roads now meet at the one written junction node
+    assert [node[0] for node in node_repo.written] == ["junction"]
+    assert edge_repo.written[0][3] == edge_repo.written[1][2] == 100
+    assert sorted(edge_repo.retire.call_args.kwargs["edge_ids"]) == [101, 102]
+    assert result.node_count == 4
+
+
+def test_update_with_numeric_ids_shares_unchanged_edges(repos):
+    network_repo, node_repo, edge_repo = repos
+    node_repo.get_locations_by_network_version.return_value = [
+        (11, 10.0, 47.0, {"id": 1}),
+        (12, 10.1, 47.1, {"id": 2}),
+    ]
+    road = _line(10, [[10.0, 47.0], [10.1, 47.1]], lanes=2)
+    edge_repo.get_current_hashes.return_value = [(101, "10", _hash(road))]
+    service = NetworkService(network_repo, node_repo, edge_repo, ingest_mode="copy")
+
+    data = {
+        "type": "FeatureCollection",
+        "features": [_point(1, [10.0, 47.0]), _point(2, [10.1, 47.1]), road],
+    }
+    result = service.update(
+        db=MagicMock(), network_id=3, obj_in=NetworkUpdate(data=data)
+    )
+
+    assert result.changes.model_dump() == {
+        "added": 0,
+        "removed": 0,
+        "modified": 0,
+        "unchanged": 1,
+    }
+    assert edge_repo.written == node_repo.written == []
+    edge_repo.retire.assert_not_called()
+    assert (result.node_count, result.edge_count) == (2, 1)
+
+
+def test_update_rewrites_reused_isolated_nodes(repos):
+    network_repo, node_repo, edge_repo = repos
+    node_repo.get_locations_by_network_version.return_value.append(
+        (15, 10.5, 47.5, {"id": "depot"})
+    )
+    service = NetworkService(network_repo, node_repo, edge_repo, ingest_mode="copy")
+
+    data = {
+        "type": "FeatureCollection",
+        "features": [ROAD_1, ROAD_2, ROAD_3, _point("depot", [10.5, 47.5])],
+    }
+    result = service.update(
+        db=MagicMock(), network_id=3, obj_in=NetworkUpdate(data=data)
+    )
+
+    # No edge keeps the depot in the new version, so it is written again
+    assert result.changes.unchanged == 3
+    assert edge_repo.written == []
+    assert [node[0] for node in node_repo.written] == ["depot"]
+    counts = network_repo.record_counts.call_args.kwargs
+    assert (counts["node_count"], counts["edge_count"]) == (5, 3)
+
+
+def test_truncated_stream_creates_no_network(repos):
+    network_repo, node_repo, edge_repo = repos
+    service = NetworkService(network_repo, node_repo, edge_repo)
+    body = json.dumps({"type": "FeatureCollection", "features": [ROAD_1, ROAD_2]})
+    db = MagicMock()
+
+    with pytest.raises(ValueError, match="Invalid GeoJSON"):
+        service.create_from_stream(
+            db=db,
+            obj_in=NetworkBase(name="Network"),
+            stream=io.BytesIO(body[:-40].encode()),
+            customer_id=1,
+        )
+    network_repo.create_with_version.assert_not_called()
+    db.commit.assert_not_called()
+
+
+def test_truncated_stream_leaves_network_unchanged(repos):
+    network_repo, node_repo, edge_repo = repos
+    service = NetworkService(network_repo, node_repo, edge_repo)
+    body = json.dumps({"type": "FeatureCollection", "features": [ROAD_1, ROAD_2]})
+
+    with pytest.raises(ValueError, match="Invalid GeoJSON"):
+        service.update_from_stream(
+            db=MagicMock(),
+            network_id=3,
+            obj_in=NetworkUpdate(name="Renamed"),
+            stream=io.BytesIO(body[:-40].encode()),
+        )
+    network_repo.update.assert_not_called()
+    network_repo.create_new_version.assert_not_called()
+
+
+def _feature_json(edge_id, coordinates):
+    return json.dumps(
+        {
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": coordinates},
+            "properties": {"id": edge_id, "lanes": 1},
+        }
+    )
+
+
+def test_export_edges_streams_feature_collection(repos, monkeypatch):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = MagicMock(
+        id=1, version_number=1, created_at=VERSION_CREATED_AT
+    )
+    features = [_feature_json(i, [[10.0, 47.0 + i], [10.1, 47.1]]) for i in range(5)]
+    edge_repo.stream_features.return_value = iter(features)
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    chunks = list(service.export_edges(db=MagicMock(), network_id=3, version_id=1))
+
+    # Header, three chunks of at most two features and the closing brackets
+    assert len(chunks) == 5
+    collection = json.loads("".join(chunks))
+    assert collection["type"] == "FeatureCollection"
+    assert collection["version"] == 1
+    assert collection["timestamp"] == VERSION_CREATED_AT.isoformat()
+    assert [f["properties"]["id"] for f in collection["features"]] == list(range(5))
+    assert collection["features"][0]["geometry"]["coordinates"] == [
+        [10.0, 47.0],
+        [10.1, 47.1],
+    ]
+    assert edge_repo.stream_features.call_args.kwargs["version_id"] == 1
+
+
+def test_export_edges_unknown_version(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = None
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    assert service.export_edges(db=MagicMock(), network_id=3, version_id=9) is None
+
+
+def test_export_topology_streams_quantized_arcs(repos, monkeypatch):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = MagicMock(
+        id=1, version_number=1, created_at=VERSION_CREATED_AT
+    )
+    edge_repo.get_extent.return_value = (10.0, 47.0, 10.2, 47.2)
+    edge_repo.stream_shapes.return_value = iter(
+        (
+            json.dumps(feature["geometry"]),
+            json.dumps({"id": i, "source_node_id": i, "target_node_id": i + 1}),
+        )
+        for i, feature in enumerate([ROAD_1, ROAD_2])
+    )
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 1)
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    chunks = service.export_topology(
+        db=MagicMock(), network_id=3, version_id=1, quantization=3
+    )
+    topology = json.loads("".join(chunks))
+
+    assert topology["type"] == "Topology"
+    assert topology["version"] == 1
+    assert topology["bbox"] == [10.0, 47.0, 10.2, 47.2]
+    assert topology["transform"]["translate"] == [10.0, 47.0]
+    assert topology["arcs"] == [[[0, 0], [1, 1]], [[1, 1], [1, 1]]]
+    geometries = topology["objects"]["edges"]["geometries"]
+    assert [g["arcs"] for g in geometries] == [[0], [1]]
+    assert [g["properties"]["target_node_id"] for g in geometries] == [1, 2]
+    assert edge_repo.stream_shapes.call_args.kwargs["version_id"] == 1
+
+
+def test_export_arrow_flattens_properties(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = MagicMock(
+        id=1, version_number=1, created_at=VERSION_CREATED_AT
+    )
+    edge_repo.get_property_types.return_value = {"lanes": ["number"]}
+    edge_repo.stream_row_batches.return_value = iter(
+        [[(1, 2.0, None)], [(2, None, "[1]")]]
+    )
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    chunks = service.export_arrow(
+        db=MagicMock(),
+        network_id=3,
+        version_id=1,
+        fields=["id", "lanes", "surface"],
+        geometry=False,
+    )
+    reader = pa.ipc.open_stream(b"".join(chunks))
+    table = reader.read_all()
+
+    assert table.schema.names == ["id", "properties.lanes", "properties.surface"]
+    assert table.column("properties.lanes").to_pylist() == [2.0, None]
+    assert json.loads(table.schema.metadata[b"version"]) == 1
+    assert edge_repo.get_property_types.call_args.kwargs["names"] == [
+        "id",
+        "lanes",
+        "surface",
+    ]
+    kwargs = edge_repo.stream_row_batches.call_args.kwargs
+    assert kwargs["attributes"] == ["id"]
+    assert kwargs["properties"] == {"lanes": "number", "surface": "json"}
+
+
+def test_export_arrow_reads_stored_properties_over_attributes(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = MagicMock(
+        id=1, version_number=1, created_at=VERSION_CREATED_AT
+    )
+    edge_repo.get_property_types.return_value = {
+        "external_id": ["string"],
+        "source_node_id": ["string"],
+    }
+    edge_repo.stream_row_batches.return_value = iter([[(1, "main", "[1]")]])
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    chunks = service.export_arrow(
+        db=MagicMock(),
+        network_id=3,
+        version_id=1,
+        fields=["id", "external_id", "source_node_id"],
+        geometry=False,
+    )
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+
+    assert table.schema.names == [
+        "id",
+        "properties.external_id",
+        "properties.source_node_id",
+    ]
+    kwargs = edge_repo.stream_row_batches.call_args.kwargs
+    assert kwargs["attributes"] == ["id"]
+    # Values falling back to the attribute keep one type only if it matches
+    assert kwargs["properties"] == {"external_id": "string", "source_node_id": "json"}
+
+
+def test_nearest_snaps_points_of_latest_version(repos):
+    network_repo, node_repo, edge_repo = repos
+    edge_repo.get_nearest.return_value = [
+        (5, "road_1", 10.05, 47.05, 12.5, 0.5),
+        (None, None, None, None, None, None),
+    ]
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    result = service.get_nearest(
+        db=MagicMock(), network_id=3, points=[(10.05, 47.0501), (0.0, 0.0)]
+    )
+
+    assert result["version"] == 1
+    assert result["matches"] == [
+        {
+            "id": 5,
+            "external_id": "road_1",
+            "location": (10.05, 47.05),
+            "distance": 12.5,
+            "fraction": 0.5,
+        },
+        None,
+    ]
+    assert edge_repo.get_nearest.call_args.kwargs["version_id"] == 1
+    node_repo.get_nearest.assert_not_called()
+
+
+def test_nearest_nodes_of_unknown_version(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = None
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    assert (
+        service.get_nearest(
+            db=MagicMock(), network_id=3, points=[(10.0, 47.0)], version_id=9
+        )
+        is None
+    )
+    network_repo.get_version_at.return_value = None
+    result = service.get_nearest(
+        db=MagicMock(),
+        network_id=3,
+        points=[(10.0, 47.0)],
+        target="node",
+        timestamp=VERSION_CREATED_AT,
+    )
+    assert result == {
+        "network_id": 3,
+        "version": None,
+        "target": "node",
+        "matches": [None],
+    }
+
+
+def test_paginated_edges_use_stored_total(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = MagicMock(
+        id=1, version_number=1, node_count=3, edge_count=2
+    )
+    edge_repo.get_paginated_features.return_value = (
+        [_feature_json(1, [[10.0, 47.0], [10.1, 47.1]])],
+        "MQ==",
+        None,
+    )
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    page = json.loads(
+        service.get_paginated_edges_by_version(
+            db=MagicMock(), network_id=3, version_id=1, limit=1
+        )
+    )
+
+    assert page["next_cursor"] == "MQ=="
+    assert page["total_count"] == 2
+    assert page["features"][0]["properties"] == {"id": 1, "lanes": 1}
+    page_kwargs = edge_repo.get_paginated_features.call_args.kwargs
+    assert page_kwargs["count"] is False
+    edge_repo.count_by_network_version.assert_not_called()
+
+    page = json.loads(
+        service.get_paginated_edges_by_version(
+            db=MagicMock(), network_id=3, version_id=1, limit=1, include_total=False
+        )
+    )
+    assert page["total_count"] is None
+
+
+def test_paginated_edges_filtered_by_area_are_counted(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = MagicMock(
+        id=1, version_number=1, node_count=3, edge_count=2
+    )
+    edge_repo.get_paginated_features.return_value = ([], None, 0)
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    page = json.loads(
+        service.get_paginated_edges_by_version(
+            db=MagicMock(), network_id=3, version_id=1, bbox=(0.0, 0.0, 1.0, 1.0)
+        )
+    )
+
+    assert page["total_count"] == 0
+    page_kwargs = edge_repo.get_paginated_features.call_args.kwargs
+    assert page_kwargs["bbox"] == (0.0, 0.0, 1.0, 1.0)
+    assert page_kwargs["count"] is True
+
+
+def test_paginated_edges_at_timestamp(repos):
+    network_repo, node_repo, edge_repo = repos
+    edge_repo.get_paginated_features.return_value = ([], None, 0)
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    page = json.loads(
+        service.get_paginated_edges_by_version(
+            db=MagicMock(), network_id=3, timestamp=VERSION_CREATED_AT
+        )
+    )
+
+    assert page["timestamp"] == VERSION_CREATED_AT.isoformat()
+    page_kwargs = edge_repo.get_paginated_features.call_args.kwargs
+    assert page_kwargs["version_id"] is None
+    assert page_kwargs["timestamp"] == VERSION_CREATED_AT
+    network_repo.get_latest_version.assert_not_called()
+
+
+def test_tiles_of_committed_versions_are_cached(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = MagicMock(
+        id=7, version_number=1, node_count=3, edge_count=2
+    )
+    edge_repo.get_tile.return_value = b"tile"
+    cache = LRUCache(max_bytes=1024)
+    service = NetworkService(network_repo, node_repo, edge_repo, tile_cache=cache)
+
+    for _ in range(2):
+        tile = service.get_tile(
+            db=MagicMock(), network_id=3, z=12, x=2176, y=1436, version_id=1
+        )
+        assert tile == b"tile"
+
+    edge_repo.get_tile.assert_called_once()
+    assert edge_repo.get_tile.call_args.kwargs["version_id"] == 7
+    assert cache.get((3, 7, 12, 2176, 1436)) == b"tile"
+
+
+def test_tiles_of_versions_being_written_are_not_cached(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version_at.return_value = MagicMock(
+        id=8, version_number=2, node_count=None, edge_count=None
+    )
+    edge_repo.get_tile.return_value = b"partial"
+    cache = LRUCache(max_bytes=1024)
+    service = NetworkService(network_repo, node_repo, edge_repo, tile_cache=cache)
+
+    tile = service.get_tile(
+        db=MagicMock(), network_id=3, z=0, x=0, y=0, timestamp=VERSION_CREATED_AT
+    )
+
+    assert tile == b"partial"
+    assert len(cache) == 0
+    network_repo.get_version_at.assert_called_once()
+
+
+def test_etag_of_older_version_covers_latest_version(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_latest_version.return_value = MagicMock(
+        version_number=2, edge_count=5
+    )
+    network_repo.get_version.return_value = MagicMock(version_number=1, edge_count=4)
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    etag = service.get_etag(db=MagicMock(), network_id=3, version_id=1)
+    tile_etag = service.get_etag(
+        db=MagicMock(), network_id=3, version_id=1, per_version=True
+    )
+
+    # A third version retires edges of version 1, changing their valid_to
+    network_repo.get_latest_version.return_value = MagicMock(
+        version_number=3, edge_count=5
+    )
+    assert service.get_etag(db=MagicMock(), network_id=3, version_id=1) != etag
+    assert (
+        service.get_etag(db=MagicMock(), network_id=3, version_id=1, per_version=True)
+        == tile_etag
+    )
+    assert service.get_etag(
+        db=MagicMock(), network_id=3, version_id=1, params=["a"]
+    ) != service.get_etag(db=MagicMock(), network_id=3, version_id=1)
+    edge_repo.stream_features.assert_not_called()
+
+
+def test_no_etag_while_version_is_written(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_latest_version.return_value = MagicMock(
+        version_number=2, edge_count=None
+    )
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    assert service.get_etag(db=MagicMock(), network_id=3) is None
+
+
+def test_edges_snapshot_is_written_once_per_version(repos, tmp_path):
+    network_repo, node_repo, edge_repo = repos
+    latest = MagicMock(
+        id=1,
+        version_number=1,
+        node_count=2,
+        edge_count=1,
+        created_at=VERSION_CREATED_AT,
+    )
+    network_repo.get_latest_version.return_value = latest
+    network_repo.get_version.return_value = latest
+    edge_repo.stream_features.side_effect = lambda **kwargs: iter(
+        [_feature_json(1, [[10.0, 47.0], [10.1, 47.1]])]
+    )
+    service = NetworkService(
+        network_repo, node_repo, edge_repo, snapshots=SnapshotStore(str(tmp_path))
+    )
+
+    # Reads never write snapshots
+    assert service.get_edges_snapshot(db=MagicMock(), network_id=3) is None
+    assert service.write_edges_snapshot(db=MagicMock(), network_id=3, version_number=1)
+    assert service.write_edges_snapshot(db=MagicMock(), network_id=3, version_number=1)
+    edge_repo.stream_features.assert_called_once()
+
+    path, encoding = service.get_edges_snapshot(db=MagicMock(), network_id=3)
+    assert encoding == "zstd"
+    with open(path, "rb") as f:
+        collection = json.loads(zstandard.ZstdDecompressor().stream_reader(f).read())
+    assert collection["version"] == 1
+    assert collection["timestamp"] == VERSION_CREATED_AT.isoformat()
+    assert len(collection["features"]) == 1
+
+    path, encoding = service.get_edges_snapshot(
+        db=MagicMock(), network_id=3, version_id=1, encodings=["gzip"]
+    )
+    with gzip.open(path) as f:
+        assert json.load(f) == collection
+
+
+def test_new_edges_snapshot_prunes_only_outdated_ones(repos, tmp_path):
+    network_repo, node_repo, edge_repo = repos
+    latest = MagicMock(
+        id=2, version_number=2, edge_count=1, created_at=VERSION_CREATED_AT
+    )
+    network_repo.get_latest_version.return_value = latest
+    network_repo.get_version.return_value = latest
+    edge_repo.stream_features.side_effect = lambda **kwargs: iter([])
+    store = SnapshotStore(str(tmp_path))
+    for key in ("network-3-v1-l1", "network-3-v2-l1", "network-3-v1-l2"):
+        store.write(key, ["{}"])
+    store.write("network-33-v1-l1", ["{}"])
+    service = NetworkService(network_repo, node_repo, edge_repo, snapshots=store)
+
+    # Version 1 is no longer the latest
+    assert not service.write_edges_snapshot(
+        db=MagicMock(), network_id=3, version_number=1
+    )
+    assert service.write_edges_snapshot(db=MagicMock(), network_id=3, version_number=2)
+
+    # Snapshots taken at the latest version stay valid
+    assert sorted({p.name.split(".")[0] for p in tmp_path.iterdir()}) == [
+        "network-3-v1-l2",
+        "network-3-v2-l2",
+        "network-33-v1-l1",
+    ]
+
+
+def test_no_edges_snapshot_while_version_is_written(repos, tmp_path):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_latest_version.return_value = MagicMock(
+        version_number=2, edge_count=None
+    )
+    service = NetworkService(
+        network_repo, node_repo, edge_repo, snapshots=SnapshotStore(str(tmp_path))
+    )
+
+    assert service.get_edges_snapshot(db=MagicMock(), network_id=3) is None
+    assert not service.write_edges_snapshot(
+        db=MagicMock(), network_id=3, version_number=2
+    )
+    edge_repo.stream_features.assert_not_called()
+
+
+def _graph_arrays(edge_repo, node_repo):
+    edge_repo.get_graph_arrays.return_value = (
+        np.array([101, 102]),
+        np.array([11, 12]),
+        np.array([12, 13]),
+        np.array([150.0, 250.0]),
+    )
+    node_repo.get_coordinate_arrays.return_value = (
+        np.array([11, 12, 13]),
+        np.array([10.0, 10.1, 10.2]),
+        np.array([47.0, 47.1, 47.2]),
+    )
+
+
+def test_graphs_of_committed_versions_are_cached(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = MagicMock(
+        id=7, version_number=1, node_count=3, edge_count=2
+    )
+    _graph_arrays(edge_repo, node_repo)
+    cache = GraphCache(max_bytes=1024 * 1024)
+    service = NetworkService(network_repo, node_repo, edge_repo, graph_cache=cache)
+
+    graphs = [
+        service.get_graph(db=MagicMock(), network_id=3, version_id=1) for _ in range(2)
+    ]
+
+    assert graphs[0] is graphs[1]
+    assert (graphs[0].node_count, graphs[0].edge_count, graphs[0].version) == (3, 2, 1)
+    edge_repo.get_graph_arrays.assert_called_once()
+    assert edge_repo.get_graph_arrays.call_args.kwargs["version_id"] == 7
+    stats = cache.stats()
+    assert (stats["graphs"], stats["bytes"]) == (1, graphs[0].nbytes)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_graphs_of_versions_being_written_are_not_cached(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_latest_version.return_value = MagicMock(
+        id=8, version_number=2, node_count=None, edge_count=None
+    )
+    _graph_arrays(edge_repo, node_repo)
+    cache = GraphCache(max_bytes=1024 * 1024)
+    service = NetworkService(network_repo, node_repo, edge_repo, graph_cache=cache)
+
+    graph = service.get_graph(db=MagicMock(), network_id=3)
+
+    assert graph.edge_count == 2
+    assert len(cache) == 0
+
+
+def test_graph_of_unknown_version(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = None
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    assert service.get_graph(db=MagicMock(), network_id=3, version_id=9) is None
+    edge_repo.get_graph_arrays.assert_not_called()
+
+
+def test_new_version_invalidates_network_graphs(repos):
+    network_repo, node_repo, edge_repo = repos
+    cache = GraphCache(max_bytes=1024 * 1024)
+    cache.get_or_build(3, 1, lambda: Graph.from_arrays(*(np.array([]),) * 7))
+    cache.get_or_build(4, 1, lambda: Graph.from_arrays(*(np.array([]),) * 7))
+    service = NetworkService(network_repo, node_repo, edge_repo, graph_cache=cache)
+
+    service.update(
+        db=MagicMock(),
+        network_id=3,
+        obj_in=NetworkUpdate(
+            data={"type": "FeatureCollection", "features": [ROAD_1, ROAD_2]}
+        ),
+    )
+
+    assert len(cache) == 1
+    assert cache.get_or_build(4, 1, MagicMock()) is not None
+
+
+def test_route_snaps_positions_and_joins_edge_lines(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_latest_version.return_value = MagicMock(
+        id=7, version_number=1, node_count=3, edge_count=2
+    )
+    _graph_arrays(edge_repo, node_repo)
+    node_repo.get_nearest.return_value = [(13, None, 10.2, 47.2, 3.0)]
+    edge_repo.get_lines.return_value = {
+        101: (11, [(10.0, 47.0), (10.05, 47.06), (10.1, 47.1)]),
+        102: (12, [(10.1, 47.1), (10.2, 47.2)]),
+    }
+    service = NetworkService(
+        network_repo, node_repo, edge_repo, graph_cache=GraphCache(max_bytes=1024)
+    )
+
+    route = service.get_route(
+        db=MagicMock(), network_id=3, origin=(10.2, 47.2001), destination=11
+    )
+
+    assert node_repo.get_nearest.call_args.kwargs["points"] == [(10.2, 47.2001)]
+    assert route["version"] == 1
+    assert route["distance"] == 400.0
+    assert route["node_ids"] == [13, 12, 11]
+    assert route["edge_ids"] == [102, 101]
+    assert route["geometry"]["coordinates"] == [
+        [10.2, 47.2],
+        [10.1, 47.1],
+        [10.05, 47.06],
+        [10.0, 47.0],
+    ]
+
+
+def test_route_to_unknown_node(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_latest_version.return_value = MagicMock(
+        id=7, version_number=1, node_count=3, edge_count=2
+    )
+    _graph_arrays(edge_repo, node_repo)
+    service = NetworkService(
+        network_repo, node_repo, edge_repo, graph_cache=GraphCache(max_bytes=1024)
+    )
+
+    with pytest.raises(ValueError, match="Node 99"):
+        service.get_route(db=MagicMock(), network_id=3, origin=11, destination=99)
+    node_repo.get_nearest.assert_not_called()
+
+
+def test_matrix_of_node_ids_and_positions(repos, monkeypatch):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_latest_version.return_value = MagicMock(
+        id=7, version_number=1, node_count=4, edge_count=2
+    )
+    _graph_arrays(edge_repo, node_repo)
+    # Node 14 has no edges
+    node_repo.get_coordinate_arrays.return_value = (
+        np.array([11, 12, 13, 14]),
+        np.array([10.0, 10.1, 10.2, 10.3]),
+        np.array([47.0, 47.1, 47.2, 47.3]),
+    )
+    node_repo.get_nearest.return_value = [(13, None, 10.2, 47.2, 3.0)]
+    monkeypatch.setattr(settings, "MATRIX_WORKERS", 2)
+    monkeypatch.setattr(settings, "MATRIX_INLINE_MAX_CELLS", 0)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        service = NetworkService(
+            network_repo,
+            node_repo,
+            edge_repo,
+            graph_cache=GraphCache(max_bytes=1024 * 1024),
+            matrix_executor=executor,
+        )
+        matrix = service.get_matrix(
+            db=MagicMock(),
+            network_id=3,
+            origins=[11, (10.2, 47.2001), 11],
+            destinations=[13, 12, 14],
+        )
+
+    assert node_repo.get_nearest.call_args.kwargs["points"] == [(10.2, 47.2001)]
+    assert matrix["version"] == 1
+    assert matrix["origin_node_ids"] == [11, 13, 11]
+    assert matrix["destination_node_ids"] == [13, 12, 14]
+    assert matrix["distances"].tolist() == [
+        [400.0, 150.0, np.inf],
+        [0.0, 250.0, np.inf],
+        [400.0, 150.0, np.inf],
+    ]
+
+
+def test_isochrone_cuts_partly_reached_edges(repos):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_latest_version.return_value = MagicMock(
+        id=7, version_number=1, node_count=3, edge_count=2
+    )
+    _graph_arrays(edge_repo, node_repo)
+    node_repo.get_nearest.return_value = [(12, None, 10.1, 47.1, 3.0)]
+    edge_repo.get_reached_geometry.return_value = {"type": "Polygon"}
+    service = NetworkService(
+        network_repo, node_repo, edge_repo, graph_cache=GraphCache(max_bytes=1024)
+    )
+
+    isochrone = service.get_isochrone(
+        db=MagicMock(), network_id=3, origin=(10.1, 47.1), max_distance=200.0
+    )
+
+    assert isochrone["node_id"] == 12
+    assert isochrone["distance"] == 200.0
+    assert isochrone["edge_ids"] == [101, 102]
+    assert isochrone["geometry"] is None
+    edge_repo.get_reached_geometry.assert_not_called()
+
+    isochrone = service.get_isochrone(
+        db=MagicMock(),
+        network_id=3,
+        origin=11,
+        max_distance=200.0,
+        output="polygon",
+        concavity=0.3,
+    )
+
+    assert isochrone["edge_ids"] == [101, 102]
+    assert isochrone["geometry"] == {"type": "Polygon"}
+    kwargs = edge_repo.get_reached_geometry.call_args.kwargs
+    assert kwargs["concavity"] == 0.3
+    # Edge 101 (150 m) in full, then 50 of edge 102's 250 m from node 12
+    assert kwargs["stretches"] == [(101, 11, 1.0), (102, 12, 0.2)]
+
+
+def test_isochrone_of_unknown_output(repos):
+    network_repo, node_repo, edge_repo = repos
+    service = NetworkService(network_repo, node_repo, edge_repo)
+
+    with pytest.raises(ValueError, match="Unknown isochrone output"):
+        service.get_isochrone(
+            db=MagicMock(), network_id=3, origin=11, max_distance=1.0, output="hull"
+        )
+    network_repo.get.assert_not_called()
+
+
+def test_build_hierarchy_is_used_for_routing(repos, tmp_path):
+    network_repo, node_repo, edge_repo = repos
+    version = MagicMock(id=7, version_number=2, node_count=3, edge_count=2)
+    network_repo.get_version.return_value = version
+    network_repo.get_latest_version.return_value = version
+    _graph_arrays(edge_repo, node_repo)
+    edge_repo.get_lines.return_value = {
+        101: (11, [(10.0, 47.0), (10.1, 47.1)]),
+        102: (12, [(10.1, 47.1), (10.2, 47.2)]),
+    }
+    hierarchies = HierarchyStore(str(tmp_path))
+    hierarchies.write(3, 1, MagicMock())
+    service = NetworkService(
+        network_repo,
+        node_repo,
+        edge_repo,
+        graph_cache=GraphCache(max_bytes=1024),
+        hierarchies=hierarchies,
+    )
+
+    assert service.build_hierarchy(db=MagicMock(), network_id=3, version_number=2)
+    assert hierarchies.exists(3, 2)
+    assert not hierarchies.exists(3, 1)
+    # The graph is built for the hierarchy only, not cached
+    assert len(service.graph_cache) == 0
+
+    with patch("app.services.network.shortest_path") as a_star:
+        route = service.get_route(
+            db=MagicMock(), network_id=3, origin=11, destination=13
+        )
+    a_star.assert_not_called()
+    assert route["distance"] == 400.0
+    assert route["edge_ids"] == [101, 102]
+
+
+def test_no_hierarchy_while_version_is_written(repos, tmp_path):
+    network_repo, node_repo, edge_repo = repos
+    network_repo.get_version.return_value = MagicMock(
+        id=8, version_number=2, node_count=None, edge_count=None
+    )
+    hierarchies = HierarchyStore(str(tmp_path))
+    service = NetworkService(
+        network_repo, node_repo, edge_repo, hierarchies=hierarchies
+    )
+
+    assert not service.build_hierarchy(db=MagicMock(), network_id=3, version_number=2)
+    assert not hierarchies.exists(3, 2)
+    edge_repo.get_graph_arrays.assert_not_called()
@@ -27,6 +27,7 @@ def setup_test_db():
     cursor = conn.cursor()
 
     cursor.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
 
     conn.close()
     print("Test database set up successfully")
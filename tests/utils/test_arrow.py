@@ -0,0 +1,75 @@
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+
+from app.utils.arrow import edge_schema, ipc_stream, matrix_ipc, property_kind
+
+VALID_FROM = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def test_property_kind():
+    assert property_kind(["number"]) == "number"
+    assert property_kind(["null", "string"]) == "string"
+    assert property_kind(["number", "string"]) == "json"
+    assert property_kind(["object"]) == "json"
+    assert property_kind([]) == "json"
+
+
+def test_edge_schema_flattens_properties():
+    schema = edge_schema(
+        ["id", "valid_from"],
+        True,
+        {"lanes": "number", "tags": "json"},
+        {"version": "1"},
+    )
+    assert schema.names == [
+        "id",
+        "valid_from",
+        "geometry",
+        "properties.lanes",
+        "properties.tags",
+    ]
+    assert schema.field("valid_from").type == pa.timestamp("us", tz="UTC")
+    assert schema.field("geometry").metadata[b"ARROW:extension:name"] == b"geoarrow.wkb"
+    assert schema.metadata == {b"version": b"1"}
+
+
+def test_ipc_stream_writes_one_record_batch_per_list():
+    schema = edge_schema(["id", "valid_from"], True, {"lanes": "number"})
+    batches = [
+        [(1, VALID_FROM, b"\x01", 2.0), (2, VALID_FROM, memoryview(b"\x02"), None)],
+        [],
+        [(3, None, b"\x03", 1.0)],
+    ]
+
+    chunks = list(ipc_stream(schema, batches))
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+
+    reader = pa.ipc.open_stream(b"".join(chunks))
+    table = reader.read_all()
+    assert reader.schema.equals(schema)
+    assert len(table.to_batches()) == 2
+    assert table.column("id").to_pylist() == [1, 2, 3]
+    assert table.column("geometry").to_pylist() == [b"\x01", b"\x02", b"\x03"]
+    assert table.column("properties.lanes").to_pylist() == [2.0, None, 1.0]
+    assert table.column("valid_from").to_pylist()[2] is None
+
+
+def test_matrix_ipc_has_a_row_per_origin():
+    distances = np.array([[0.0, 150.0, np.inf], [400.0, 250.0, np.inf]])
+
+    table = pa.ipc.open_stream(
+        matrix_ipc([11, 13], [13, 12, 14], distances, metadata={"version": "1"})
+    ).read_all()
+
+    assert table.column("origin_node_id").to_pylist() == [11, 13]
+    assert table.schema.field("distances").type == pa.list_(pa.float64(), 3)
+    assert table.column("distances").to_pylist() == [
+        [0.0, 150.0, None],
+        [400.0, 250.0, None],
+    ]
+    metadata = table.schema.metadata
+    assert json.loads(metadata[b"destination_node_ids"]) == [13, 12, 14]
+    assert metadata[b"version"] == b"1"
@@ -0,0 +1,60 @@
+from app.utils.cache import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+
+    # "b" is now the least recently used entry
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa"
+    assert cache.get("c") == b"cccc"
+    assert cache.size == 8
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (3, 1, 1)
+
+
+def test_lru_cache_replaces_and_skips_oversized_values():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("a", b"aa")
+    assert cache.size == 2
+
+    cache.put("big", b"x" * 11)
+    assert cache.get("big") is None
+    assert cache.get("a") == b"aa"
+
+
+def test_lru_cache_get_or_create_and_invalidate():
+    cache = LRUCache(max_bytes=100)
+    calls = []
+
+    def create():
+        calls.append(1)
+        return b"tile"
+
+    assert cache.get_or_create((1, 2), create) == b"tile"
+    assert cache.get_or_create((1, 2), create) == b"tile"
+    assert len(calls) == 1
+
+    cache.put((2, 1), b"other")
+    assert cache.invalidate(lambda key: key[0] == 1) == 1
+    assert len(cache) == 1
+    assert cache.size == 5
+
+
+def test_lru_cache_sizes_values_with_sizeof():
+    cache = LRUCache(max_bytes=10, sizeof=lambda value: value["bytes"])
+    cache.put("a", {"bytes": 6})
+    cache.put("b", {"bytes": 6})
+    assert cache.get("a") is None
+    assert cache.get("b") == {"bytes": 6}
+    assert cache.size == 6
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hit_rate"] == 0.5
@@ -0,0 +1,113 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.utils.contraction import Hierarchy, HierarchyStore, contract
+from app.utils.graph import Graph
+from app.utils.routing import haversine, shortest_path
+
+
+def _random_graph(seed, node_count=60, edge_count=120):
+    rng = random.Random(seed)
+    lon = np.array([10 + rng.random() * 0.1 for _ in range(node_count)])
+    lat = np.array([47 + rng.random() * 0.1 for _ in range(node_count)])
+    ends = [
+        (rng.randrange(node_count), rng.randrange(node_count))
+        for _ in range(edge_count)
+    ]
+    # Roads are never shorter than the straight line between their ends
+    lengths = [
+        haversine(lon[a], lat[a], lon[b], lat[b]) * (1 + rng.random()) for a, b in ends
+    ]
+    node_ids = np.arange(100, 100 + node_count)
+    return Graph.from_arrays(
+        node_ids=node_ids,
+        lon=lon,
+        lat=lat,
+        edge_ids=np.arange(edge_count) * 10,
+        sources=node_ids[[a for a, _ in ends]],
+        targets=node_ids[[b for _, b in ends]],
+        lengths=np.array(lengths),
+    )
+
+
+def _path_length(graph, nodes, edges):
+    total = 0.0
+    for tail, head, edge in zip(nodes, nodes[1:], edges):
+        heads, lengths, arc_edges = graph.neighbours(tail)
+        total += min(
+            length
+            for h, length, e in zip(heads, lengths, arc_edges)
+            if h == head and e == edge
+        )
+    return total
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_hierarchy_routes_match_a_star(seed):
+    graph = _random_graph(seed)
+    hierarchy = contract(graph)
+    rng = random.Random(seed)
+
+    for _ in range(40):
+        source, target = rng.randrange(60), rng.randrange(60)
+        expected = shortest_path(graph, source, target)
+        path = hierarchy.shortest_path(source, target)
+        if expected is None:
+            assert path is None
+            continue
+        distance, nodes, edges = path
+        assert distance == pytest.approx(expected[0])
+        assert (nodes[0], nodes[-1]) == (source, target)
+        # Shortcuts unpack into a walk along real edges of the same length
+        assert _path_length(graph, nodes, edges) == pytest.approx(distance)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_hierarchy_distance_matrix_matches_a_star(seed):
+    graph = _random_graph(seed)
+    hierarchy = contract(graph)
+    rng = random.Random(seed)
+    sources = [rng.randrange(60) for _ in range(8)]
+    targets = [rng.randrange(60) for _ in range(6)] + sources[:1]
+
+    matrix = hierarchy.distance_matrix(sources, targets)
+
+    for row, source in enumerate(sources):
+        for column, target in enumerate(targets):
+            path = shortest_path(graph, source, target)
+            expected = np.inf if path is None else path[0]
+            assert matrix[row, column] == pytest.approx(expected)
+
+
+def test_hierarchy_saves_memory_mapped_arrays(tmp_path):
+    graph = _random_graph(7)
+    hierarchy = contract(graph)
+    hierarchy.save(str(tmp_path))
+
+    loaded = Hierarchy.load(str(tmp_path))
+    assert isinstance(loaded.indices, np.memmap)
+    assert loaded.node_count == graph.node_count
+    assert loaded.shortest_path(0, 5) == hierarchy.shortest_path(0, 5)
+
+
+def test_hierarchy_store_writes_and_prunes_versions(tmp_path):
+    store = HierarchyStore(str(tmp_path))
+    hierarchy = contract(_random_graph(1))
+    assert store.get(3, 1) is None
+
+    store.write(3, 1, hierarchy)
+    store.write(3, 2, hierarchy)
+    store.write(4, 1, hierarchy)
+    assert store.get(3, 1).node_count == 60
+    assert not any(path.suffix == ".tmp" for path in (tmp_path / "network-3").iterdir())
+
+    assert store.prune(3, before=2) == 1
+    assert store.get(3, 1) is None
+    assert store.exists(3, 2)
+    assert store.exists(4, 1)
+
+    store.clear()
+    assert store.get(3, 2) is None
+    assert list(tmp_path.iterdir()) == []
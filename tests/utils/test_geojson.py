@@ -0,0 +1,242 @@
+import io
+import json
+
+import pytest
+
+from app.utils.geojson import (
+    extract_nodes_and_edges,
+    extract_nodes_from_stream,
+    iter_edges_from_stream,
+    parse_bbox,
+    parse_fields,
+    parse_waypoint,
+    polygon_ewkt,
+    validate_feature_collection_stream,
+    zoom_tolerance,
+)
+
+SAMPLE_GEOJSON = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "LineString",
+                "coordinates": [[10.0, 47.0], [10.1, 47.1], [10.2, 47.2]],
+            },
+            "properties": {"id": "road-1", "name": "Test Road"},
+        },
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "LineString",
+                "coordinates": [[10.2, 47.2], [10.3, 47.2]],
+            },
+            "properties": {"id": "road-2", "name": "Other Road"},
+        },
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [10.0, 47.0]},
+            "properties": {"id": "node-1", "type": "junction"},
+        },
+    ],
+}
+
+
+def _stream(data):
+    return io.BytesIO(json.dumps(data).encode())
+
+
+def test_extract_nodes_and_edges():
+    nodes, edges = extract_nodes_and_edges(SAMPLE_GEOJSON)
+
+    assert len(nodes) == 3
+    assert set(edges) == {"road-1", "road-2"}
+
+    _, source, target = edges["road-1"]
+    assert source == "node-1"
+    assert edges["road-2"][1] == target
+
+
+def test_extract_nodes_and_edges_rejects_non_collections():
+    with pytest.raises(ValueError):
+        extract_nodes_and_edges({"type": "Feature"})
+
+
+def test_stream_extraction_matches_in_memory_extraction():
+    stream = _stream(SAMPLE_GEOJSON)
+
+    validate_feature_collection_stream(stream)
+    nodes, node_coordinates, feature_count = extract_nodes_from_stream(stream)
+    edges = list(iter_edges_from_stream(stream, node_coordinates))
+
+    expected_nodes, expected_edges = extract_nodes_and_edges(SAMPLE_GEOJSON)
+    assert feature_count == 3
+    assert len(nodes) == len(expected_nodes)
+    assert "node-1" in nodes
+    assert [edge_id for edge_id, *_ in edges] == list(expected_edges)
+
+    by_id = {edge_id: (source, target) for edge_id, _, source, target in edges}
+    assert by_id["road-1"][0] == "node-1"
+    assert by_id["road-1"][1] == by_id["road-2"][0]
+    assert all(node_id in nodes for pair in by_id.values() for node_id in pair)
+
+
+def test_numeric_ids_are_extracted_as_strings():
+    data = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [10.0, 47.0]},
+                "properties": {"id": 1},
+            },
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [10.1, 47.1]},
+                "properties": {"id": 2},
+            },
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [[10.0, 47.0], [10.1, 47.1]],
+                },
+                "properties": {"id": 10},
+            },
+        ],
+    }
+
+    nodes, edges = extract_nodes_and_edges(data)
+    assert set(nodes) == {"1", "2"}
+    assert edges["10"][1:] == ("1", "2")
+
+    stream = _stream(data)
+    nodes, node_coordinates, _ = extract_nodes_from_stream(stream)
+    assert set(nodes) == {"1", "2"}
+    assert [
+        (edge_id, source, target)
+        for edge_id, _, source, target in iter_edges_from_stream(
+            stream, node_coordinates
+        )
+    ] == [("10", "1", "2")]
+
+
+@pytest.mark.parametrize(
+    "body", [b'{"type": "Feature", "features": []}', b'{"type": "FeatureCol']
+)
+def test_validate_feature_collection_stream_rejects_invalid_input(body):
+    with pytest.raises(ValueError):
+        validate_feature_collection_stream(io.BytesIO(body))
+
+
+def _line(coordinates, **properties):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": coordinates},
+        "properties": properties,
+    }
+
+
+def test_extract_nodes_and_edges_snaps_endpoints():
+    data = {
+        "type": "FeatureCollection",
+        "features": [
+            _line([[10.0, 47.0], [10.1, 47.0]], id="a"),
+            _line([[10.1000004, 47.0000003], [10.2, 47.0]], id="b"),
+        ],
+    }
+
+    nodes, edges = extract_nodes_and_edges(data)
+    assert len(nodes) == 4
+    assert edges["a"][2] != edges["b"][1]
+
+    nodes, edges = extract_nodes_and_edges(data, snap_tolerance=1e-5)
+    assert len(nodes) == 3
+    assert edges["a"][2] == edges["b"][1]
+    assert nodes[edges["a"][2]]["geometry"]["coordinates"] == [10.1, 47.0]
+
+
+def test_extract_nodes_and_edges_matches_stream_extraction_on_grid():
+    def grid_point(row, col):
+        return [10.0 + col / 100, 47.0 + row / 100]
+
+    features = []
+    for row in range(20):
+        for col in range(20):
+            here = grid_point(row, col)
+            features.append(_line([here, grid_point(row, col + 1)]))
+            features.append(_line([here, grid_point(row + 1, col)]))
+    features.append(
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [10.05, 47.05]},
+            "properties": {"id": "junction"},
+        }
+    )
+    data = {"type": "FeatureCollection", "features": features}
+
+    nodes, edges = extract_nodes_and_edges(data)
+    stream_nodes, node_coordinates, _ = extract_nodes_from_stream(_stream(data))
+    stream_edges = list(iter_edges_from_stream(_stream(data), node_coordinates))
+
+    assert len(nodes) == len(stream_nodes) == 21 * 21 - 1
+    assert len(edges) == len(stream_edges) == 800
+
+    def endpoints(node_lookup, source, target):
+        coords = lambda n: tuple(node_lookup[n]["geometry"]["coordinates"])
+        return coords(source), coords(target)
+
+    expected = sorted(
+        endpoints(stream_nodes, source, target) for _, _, source, target in stream_edges
+    )
+    actual = sorted(
+        endpoints(nodes, source, target) for _, source, target in edges.values()
+    )
+    assert actual == expected
+    assert sum(1 for _, s, t in edges.values() if "junction" in (s, t)) == 4
+
+
+def test_parse_bbox():
+    assert parse_bbox("10,47,10.5,47.5") == (10.0, 47.0, 10.5, 47.5)
+    for value in ("10,47,10.5", "a,b,c,d", "10,47,9,47.5", "nan,47,10,48"):
+        with pytest.raises(ValueError):
+            parse_bbox(value)
+
+
+def test_parse_waypoint():
+    assert parse_waypoint("42") == 42
+    assert parse_waypoint("10.5,47") == (10.5, 47.0)
+    for value in ("", "a", "10,47,1", "10,x", "10,95", "nan,47"):
+        with pytest.raises(ValueError):
+            parse_waypoint(value)
+
+
+def test_parse_fields():
+    assert parse_fields("id, source_node_id,lanes,id") == [
+        "id",
+        "source_node_id",
+        "lanes",
+    ]
+    for value in ("", "id,,lanes", "x" * 101):
+        with pytest.raises(ValueError):
+            parse_fields(value)
+
+
+def test_zoom_tolerance():
+    assert zoom_tolerance(0) == pytest.approx(360 / 256)
+    assert zoom_tolerance(10) == pytest.approx(zoom_tolerance(9) / 2)
+
+
+def test_polygon_ewkt():
+    polygon = {
+        "type": "Polygon",
+        "coordinates": [[[10, 47], [11, 47], [11, 48], [10, 48], [10, 47]]],
+    }
+    assert polygon_ewkt(json.dumps(polygon)) == (
+        "SRID=4326;POLYGON ((10 47, 11 47, 11 48, 10 48, 10 47))"
+    )
+    with pytest.raises(ValueError):
+        polygon_ewkt(json.dumps({"type": "Point", "coordinates": [10, 47]}))
+    with pytest.raises(ValueError):
+        polygon_ewkt("not json")
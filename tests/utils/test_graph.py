@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from app.utils.graph import Graph
+
+
+def _triangle():
+    # Node ids are given out of database id order
+    return Graph.from_arrays(
+        node_ids=np.array([7, 3, 5]),
+        lon=np.array([10.2, 10.0, 10.1]),
+        lat=np.array([47.2, 47.0, 47.1]),
+        edge_ids=np.array([10, 20, 30]),
+        sources=np.array([3, 5, 3]),
+        targets=np.array([5, 7, 7]),
+        lengths=np.array([100.0, 200.0, 400.0]),
+        version=2,
+    )
+
+
+def test_graph_from_arrays_builds_csr_both_ways():
+    graph = _triangle()
+
+    assert list(graph.node_ids) == [3, 5, 7]
+    assert list(graph.lon) == [10.0, 10.1, 10.2]
+    assert (graph.node_count, graph.edge_count, graph.version) == (3, 3, 2)
+    assert list(graph.indptr) == [0, 2, 4, 6]
+
+    heads, lengths, edges = graph.neighbours(0)
+    assert list(heads) == [1, 2]
+    assert list(lengths) == [100.0, 400.0]
+    assert list(graph.edge_ids[edges]) == [10, 30]
+
+    heads, lengths, edges = graph.neighbours(2)
+    assert list(heads) == [1, 0]
+    assert list(graph.edge_ids[edges]) == [20, 30]
+
+    assert graph.nbytes == sum(
+        array.nbytes
+        for array in (
+            graph.node_ids,
+            graph.lon,
+            graph.lat,
+            graph.indptr,
+            graph.indices,
+            graph.weights,
+            graph.arc_edges,
+            graph.edge_ids,
+        )
+    )
+
+
+def test_graph_node_index():
+    graph = _triangle()
+    assert list(graph.node_index([7, 3, 4, 99])) == [2, 0, -1, -1]
+
+    empty = Graph.from_arrays(*(np.array([]) for _ in range(7)))
+    assert empty.node_count == 0
+    assert list(empty.indptr) == [0]
+    assert list(empty.node_index([1])) == [-1]
+
+
+def test_graph_rejects_edges_to_unknown_nodes():
+    with pytest.raises(ValueError):
+        Graph.from_arrays(
+            node_ids=np.array([1, 2]),
+            lon=np.zeros(2),
+            lat=np.zeros(2),
+            edge_ids=np.array([1]),
+            sources=np.array([1]),
+            targets=np.array([3]),
+            lengths=np.array([1.0]),
+        )
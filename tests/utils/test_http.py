@@ -0,0 +1,27 @@
+from app.utils.http import accepted_encodings, etag_matches, make_etag
+
+
+def test_make_etag_is_strong_and_stable():
+    etag = make_etag(1, 2, [("limit", "100")])
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag(1, 2, [("limit", "100")])
+    assert etag != make_etag(1, 3, [("limit", "100")])
+
+
+def test_etag_matches():
+    etag = make_etag(1)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_accepted_encodings():
+    supported = ("zstd", "gzip")
+    assert accepted_encodings("gzip, deflate, br, zstd", supported) == ["zstd", "gzip"]
+    assert accepted_encodings("gzip;q=0.5, zstd;q=0", supported) == ["gzip"]
+    assert accepted_encodings("*", supported) == ["zstd", "gzip"]
+    assert accepted_encodings("*, gzip;q=0", supported) == ["zstd"]
+    assert accepted_encodings("identity", supported) == []
+    assert accepted_encodings(None, supported) == []
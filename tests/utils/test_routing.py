@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from app.utils.graph import Graph
+from app.utils.routing import distance_matrix, haversine, reachable, shortest_path
+
+
+def _grid():
+    """
+    A 3 x 2 grid of nodes 0.01 degrees apart (ids 1-6, row by row) with a
+    long detour edge 90 from node 1 to node 3
+    """
+    lon = np.array([10.0, 10.01, 10.02, 10.0, 10.01, 10.02])
+    lat = np.array([47.0, 47.0, 47.0, 47.01, 47.01, 47.01])
+    ends = [(1, 2), (2, 3), (4, 5), (5, 6), (1, 4), (2, 5), (3, 6), (1, 3)]
+    lengths = [
+        haversine(lon[a - 1], lat[a - 1], lon[b - 1], lat[b - 1]) for a, b in ends
+    ]
+    lengths[-1] *= 5
+    return Graph.from_arrays(
+        node_ids=np.arange(1, 7),
+        lon=lon,
+        lat=lat,
+        edge_ids=np.array([10, 20, 30, 40, 50, 60, 70, 90]),
+        sources=np.array([a for a, _ in ends]),
+        targets=np.array([b for _, b in ends]),
+        lengths=np.array(lengths),
+    )
+
+
+def test_haversine():
+    # One degree of latitude on the mean sphere
+    assert haversine(0.0, 0.0, 0.0, 1.0) == pytest.approx(111195, abs=1)
+    assert haversine(10.0, 47.0, 10.0, 47.0) == 0.0
+
+
+def test_shortest_path_follows_shortest_edges():
+    graph = _grid()
+    distance, nodes, edges = shortest_path(graph, 0, 5)
+
+    assert graph.node_ids[nodes][[0, -1]].tolist() == [1, 6]
+    assert len(edges) == 3
+    assert 90 not in graph.edge_ids[edges].tolist()
+    assert distance == pytest.approx(
+        haversine(10.0, 47.0, 10.02, 47.0) + haversine(10.02, 47.0, 10.02, 47.01),
+        rel=1e-3,
+    )
+
+
+def test_shortest_path_against_edge_direction_and_to_itself():
+    graph = _grid()
+    distance, nodes, edges = shortest_path(graph, 2, 0)
+    assert graph.node_ids[nodes].tolist() == [3, 2, 1]
+    assert graph.edge_ids[edges].tolist() == [20, 10]
+
+    assert shortest_path(graph, 4, 4) == (0.0, [4], [])
+
+
+def test_shortest_path_between_unconnected_nodes():
+    graph = Graph.from_arrays(
+        node_ids=np.array([1, 2, 3]),
+        lon=np.array([10.0, 10.1, 10.2]),
+        lat=np.array([47.0, 47.0, 47.0]),
+        edge_ids=np.array([10]),
+        sources=np.array([1]),
+        targets=np.array([2]),
+        lengths=np.array([7600.0]),
+    )
+    assert shortest_path(graph, 0, 2) is None
+
+
+def test_distance_matrix_matches_shortest_paths():
+    graph = _grid()
+    sources, targets = [0, 2, 0], [5, 0, 3, 5]
+
+    matrix = distance_matrix(graph, sources, targets)
+
+    assert matrix.shape == (3, 4)
+    for row, source in enumerate(sources):
+        for column, target in enumerate(targets):
+            expected = shortest_path(graph, source, target)[0]
+            assert matrix[row, column] == pytest.approx(expected)
+
+
+def test_distance_matrix_between_unconnected_nodes():
+    graph = Graph.from_arrays(
+        node_ids=np.array([1, 2, 3]),
+        lon=np.array([10.0, 10.1, 10.2]),
+        lat=np.array([47.0, 47.0, 47.0]),
+        edge_ids=np.array([10]),
+        sources=np.array([1]),
+        targets=np.array([2]),
+        lengths=np.array([7600.0]),
+    )
+    assert distance_matrix(graph, [0, 2], [1, 2]).tolist() == [
+        [7600.0, np.inf],
+        [np.inf, 0.0],
+    ]
+
+
+def test_reachable_cuts_edges_at_max_length():
+    graph = _grid()
+    step = haversine(10.0, 47.0, 10.01, 47.0)
+
+    distance, stretches = reachable(graph, 0, step * 1.5)
+
+    # Nodes with ids 1, 2 and 4 are settled; the stretches from 2 and 4 stop
+    # part of the way along their edges
+    assert distance == {
+        0: 0.0,
+        1: pytest.approx(step),
+        3: pytest.approx(1111.95, abs=0.1),
+    }
+    reached = {
+        (graph.edge_ids[edge], graph.node_ids[node]): fraction
+        for edge, node, fraction in stretches
+    }
+    assert reached[10, 1] == 1.0
+    assert reached[50, 1] == 1.0
+    assert reached[20, 2] == pytest.approx(0.5)
+    assert reached[60, 2] == pytest.approx(step / 2 / 1111.95, rel=1e-3)
+    # The detour from node 1 is five steps long
+    assert reached[90, 1] == pytest.approx(0.15, rel=1e-3)
+    # Edges 10 and 50 are also reached back from their other ends, but once
+    # travelled in full they are given once
+    assert reached[30, 4] == pytest.approx(0.033, abs=1e-3)
+    assert len(stretches) == 6
@@ -0,0 +1,33 @@
+from app.utils.topojson import decode_arc, encode_arc, quantize_transform
+
+
+def test_quantize_transform_spans_bbox():
+    transform = quantize_transform((10.0, 47.0, 11.0, 47.5), quantization=1001)
+    assert transform["translate"] == [10.0, 47.0]
+    assert transform["scale"] == [0.001, 0.0005]
+
+
+def test_quantize_transform_of_degenerate_extent():
+    assert quantize_transform(None) == {"scale": [1.0, 1.0], "translate": [0.0, 0.0]}
+    transform = quantize_transform((10.0, 47.0, 10.0, 48.0), quantization=11)
+    assert transform["scale"] == [1.0, 0.1]
+
+
+def test_encode_arc_quantizes_and_delta_encodes():
+    transform = quantize_transform((10.0, 47.0, 11.0, 48.0), quantization=11)
+    arc = encode_arc([[10.0, 47.0], [10.5, 47.2], [11.0, 48.0]], transform)
+    assert arc == [[0, 0], [5, 2], [5, 8]]
+    assert decode_arc(arc, transform) == [
+        [10.0, 47.0],
+        [10.5, 47.2],
+        [11.0, 48.0],
+    ]
+
+
+def test_encode_arc_drops_repeated_grid_points_but_keeps_endpoints():
+    transform = quantize_transform((0.0, 0.0, 1.0, 1.0), quantization=11)
+    arc = encode_arc([[0.0, 0.0], [0.01, 0.01], [0.5, 0.5], [0.51, 0.5]], transform)
+    assert arc == [[0, 0], [5, 5], [0, 0]]
+
+    # A line shorter than one grid cell still has two positions
+    assert encode_arc([[0.0, 0.0], [0.01, 0.0]], transform) == [[0, 0], [0, 0]]